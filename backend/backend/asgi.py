@@ -5,6 +5,17 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve with e.g.
+
+    gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+or `uvicorn backend.asgi:application --workers 4`. Under ASGI the student
+self-service endpoints run as native async views (ERP_ASYNC_SELF_SERVICE)
+and GET /api/my/marks/stream/ pushes results as they change. With more than
+one worker, give them a shared ERP_EVENTS_SOCKET_DIR and a shared cache
+(Redis or Memcached via ERP_CACHE_BACKEND; the default LocMemCache is per
+process and the relay refuses it), see erp/events.py.
 """
 
 import os
@@ -12,5 +23,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('ERP_ASYNC_SELF_SERVICE', '1')
 
 application = get_asgi_application()
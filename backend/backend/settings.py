@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,6 +55,7 @@ AUTH_USER_MODEL = 'erp.user'
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',   # must be first
+    'erp.compression.CompressionMiddleware',   # brotli/gzip; before anything that edits the body
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,6 +65,43 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request SQL/timing instrumentation (Server-Timing headers, /api/_metrics/).
+# Off by default; it wraps every query, so enable it when investigating.
+if os.environ.get('ERP_REQUEST_METRICS') == '1':
+    MIDDLEWARE.insert(1, 'erp.middleware.RequestMetricsMiddleware')
+ERP_NPLUSONE_THRESHOLD = int(os.environ.get('ERP_NPLUSONE_THRESHOLD', 5))
+
+# Responses below this size are sent uncompressed.
+ERP_COMPRESS_MIN_BYTES = int(os.environ.get('ERP_COMPRESS_MIN_BYTES', 1024))
+ERP_BROTLI_QUALITY = int(os.environ.get('ERP_BROTLI_QUALITY', 4))
+
+# Serve /api/auth/me/, /api/my/profile/ and /api/my/marks/ from native async
+# views. backend/asgi.py turns this on; under WSGI the sync views are faster.
+ERP_ASYNC_SELF_SERVICE = os.environ.get('ERP_ASYNC_SELF_SERVICE') == '1'
+
+# Files written by background jobs (exports); served by GET /api/jobs/{id}/download/.
+ERP_JOB_FILES_DIR = os.environ.get('ERP_JOB_FILES_DIR', str(BASE_DIR / 'job_files'))
+
+# POST /api/students/bulk/ admits intakes up to this size in the request (hashing
+# passwords takes ~0.5s each); larger ones are queued for run_worker.
+ERP_ADMIT_INLINE_MAX_ROWS = int(os.environ.get('ERP_ADMIT_INLINE_MAX_ROWS', 20))
+
+# GET /api/marks/changes/: changes younger than this are held back until their
+# transactions have surely committed; cursors (and delete records) expire after
+# the retention period (python manage.py purge_tombstones).
+ERP_CHANGES_SETTLE_SECONDS = int(os.environ.get('ERP_CHANGES_SETTLE_SECONDS', 5))
+ERP_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('ERP_TOMBSTONE_RETENTION_DAYS', 180))
+
+# GET /api/my/marks/stream/ (ASGI only): open streams per worker process, the
+# keep-alive interval, and how many woken streams may re-read results at once.
+# With several workers, point ERP_EVENTS_SOCKET_DIR at a directory they (and
+# run_worker) share so a mark saved in one process reaches streams in the others;
+# they must share the cache too (ERP_CACHE_BACKEND, not LocMemCache).
+ERP_EVENTS_MAX_STREAMS = int(os.environ.get('ERP_EVENTS_MAX_STREAMS', 10000))
+ERP_EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('ERP_EVENTS_HEARTBEAT_SECONDS', 25))
+ERP_EVENTS_REFRESH_CONCURRENCY = int(os.environ.get('ERP_EVENTS_REFRESH_CONCURRENCY', 8))
+ERP_EVENTS_SOCKET_DIR = os.environ.get('ERP_EVENTS_SOCKET_DIR', '')
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -79,6 +120,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
 
 
 # Database
@@ -91,6 +133,42 @@ DATABASES = {
     }
 }
 
+# ERP_DB_PROFILE=production tunes SQLite for concurrent use: WAL and the other
+# pragmas in erp/db.py, BEGIN IMMEDIATE so writers queue on busy_timeout
+# instead of failing mid-transaction (transaction_mode needs Django 5.1+),
+# persistent connections, and a read-only `read` alias that the student
+# self-service views read from.
+ERP_DB_PROFILE = os.environ.get('ERP_DB_PROFILE', 'development')
+
+if ERP_DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('ERP_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 5},
+    })
+    DATABASES['read'] = {
+        **DATABASES['default'],
+        'NAME': f"file:{DATABASES['default']['NAME']}?mode=ro",
+        'OPTIONS': {'timeout': 5},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['erp.db.ReadReplicaRouter']
+
+
+# Cache
+# LocMemCache is per process; multi-worker deployments and run_worker (which
+# refuses to start without one) need a shared backend,
+# e.g. ERP_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# with ERP_CACHE_LOCATION=/var/tmp/erp_cache, or
+# django.core.cache.backends.memcached.PyMemcacheCache with 127.0.0.1:11211.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('ERP_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('ERP_CACHE_LOCATION', 'erp'),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,11 +208,23 @@ STATIC_URL = 'static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # builds the request user from role/student_id token claims (no User query)
+        'erp.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'erp.pagination.KeysetPagination',
+    # orjson-backed when orjson is installed; identical output to DRF's JSON classes
+    'DEFAULT_RENDERER_CLASSES': (
+        'erp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'erp.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 from datetime import timedelta
@@ -151,6 +241,8 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# the results stream (my/marks/stream/) resumes with Last-Event-ID
+CORS_ALLOW_HEADERS = (*default_headers, 'last-event-id')
 
 
 # Default primary key field type
@@ -0,0 +1,161 @@
+"""
+Stateless, role-aware JWT authentication.
+
+Tokens issued by `tokens_for` carry `role` and `student_id` claims, so
+`ClaimsJWTAuthentication` can build a `ClaimsUser` straight from the token
+instead of loading the User row on every request. The permission classes and
+the student self-service views only need those claims. Views that need the
+real User call `full_user()`, which goes through a bounded in-process LRU.
+
+Because the user row is not re-read per request, deactivating an account
+takes effect when its access token expires (SIMPLE_JWT ACCESS_TOKEN_LIFETIME);
+blacklisting the refresh token stops it from being renewed.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import cached_property
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User, Student
+
+
+def tokens_for(user):
+    """A refresh token (and, via .access_token, an access token) with ERP claims."""
+    refresh = RefreshToken.for_user(user)
+    refresh['role'] = user.role
+    refresh['student_id'] = (
+        Student.objects.filter(user=user).values_list('pk', flat=True).first()
+        if user.role == 'student' else None
+    )
+    return refresh
+
+
+class ClaimsUser(TokenUser):
+    """Request user backed by the token's claims; no database row is loaded."""
+
+    @cached_property
+    def id(self):
+        return int(super().id)
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @cached_property
+    def student_id(self):
+        return self.token.get('student_id')
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if 'role' not in validated_token:
+            # issued before the claims existed: fall back to the User row
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
+
+
+async def aauthenticate(request):
+    """
+    ClaimsJWTAuthentication for async views: (user, token), or None when no
+    credentials were sent. Tokens carrying the ERP claims are handled without
+    leaving the event loop.
+    """
+    authenticator = ClaimsJWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    validated_token = authenticator.get_validated_token(raw_token)
+    if 'role' not in validated_token:
+        return await sync_to_async(authenticator.authenticate)(request)
+    return ClaimsUser(validated_token), validated_token
+
+
+class LRUCache:
+    """A small thread-safe LRU with a per-entry time to live."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+# TTL bounds how long another worker's edit to a user can go unseen here.
+user_cache = LRUCache(maxsize=getattr(settings, 'ERP_USER_CACHE_SIZE', 1024),
+                      ttl=getattr(settings, 'ERP_USER_CACHE_TTL', 300))
+
+
+def full_user(user):
+    """The User model instance behind a request user."""
+    if isinstance(user, User):
+        return user
+    cached = user_cache.get(user.id)
+    if cached is None:
+        try:
+            cached = User.objects.get(pk=user.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found.', code='user_not_found')
+        user_cache.set(user.id, cached)
+    return cached
+
+
+async def afull_user(user):
+    if isinstance(user, User):
+        return user
+    cached = user_cache.get(user.id)
+    if cached is None:
+        try:
+            cached = await User.objects.aget(pk=user.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found.', code='user_not_found')
+        user_cache.set(user.id, cached)
+    return cached
+
+
+def student_id_for(user):
+    """The Student pk for a request user: the token claim when present, else a lookup."""
+    if isinstance(user, ClaimsUser):
+        return user.student_id
+    return Student.objects.filter(user_id=user.pk).values_list('pk', flat=True).first()
+
+
+async def astudent_id_for(user):
+    if isinstance(user, ClaimsUser):
+        return user.student_id
+    return await Student.objects.filter(user_id=user.pk).values_list('pk', flat=True).afirst()
@@ -0,0 +1,908 @@
+"""
+Benchmarks for the hot API paths.
+
+Run with ``python manage.py benchmark <scenario>``. Each scenario builds its
+own fixture data and runs inside a transaction that is rolled back at the
+end, so it is safe to run against a development database. Scenarios cache
+into a private in-process cache (BENCHMARK_CACHES), never the configured
+one: results cached for rolled-back synthetic students could otherwise be
+served to real students who are later given the same ids.
+"""
+
+import asyncio
+import gzip
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.utils import ConnectionHandler, OperationalError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import path
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import compression, events, progression, rankings, search, slips, synthetic
+from .cache import bump_version
+from .catalogue import get_catalogue
+from .authentication import tokens_for
+from .bulk import admit_students
+from .fastlists import flat_reader
+from .models import User, Programme, Student, Unit, Mark, CatalogueVersion
+from .renderers import FastJSONRenderer
+from .serializers import MarkSerializer, StudentSerializer, UnitSerializer
+from .views import (
+    MeView, MyProfileView, MyMarksView, AsyncMeView, AsyncMyProfileView, AsyncMyMarksView,
+    AsyncMyMarksStreamView
+)
+
+SCENARIOS = {}
+
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                'LOCATION': 'erp-benchmark'}}
+
+
+def scenario(name):
+    """Register a benchmark function under `name`."""
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def run(name, out, **options):
+    with override_settings(CACHES=BENCHMARK_CACHES), transaction.atomic():
+        try:
+            results = SCENARIOS[name](out, **options)
+        finally:
+            cache.clear()  # the benchmark cache only; its entries describe rolled-back rows
+        transaction.set_rollback(True)
+    return results
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+
+def make_cohort(students, units=8, code='BENCH'):
+    """Create one programme with `units` units and `students` students."""
+    programme = Programme.objects.create(name='Benchmark Programme', code=code)
+    unit_objs = Unit.objects.bulk_create(
+        Unit(code=f'{code}{i:03d}', name=f'Benchmark Unit {i}', programme=programme,
+             year=1, semester=1 + i % 2)
+        for i in range(units)
+    )
+    password = make_password('bench')
+    users = User.objects.bulk_create(
+        User(username=f'{code.lower()}{i}', password=password, role='student')
+        for i in range(students)
+    )
+    student_objs = Student.objects.bulk_create(
+        Student(user=user, reg_number=f'MU/{code}/{i:06d}', programme=programme)
+        for i, user in enumerate(users)
+    )
+    return programme, unit_objs, student_objs
+
+
+def admin_client():
+    admin = User.objects.create(username='bench-admin', role='admin')
+    client = APIClient()
+    client.force_authenticate(admin)
+    return client
+
+
+@scenario('mark_upload')
+def mark_upload(out, size=400, **options):
+    """Per-row `POST /api/marks/` against one `POST /api/marks/bulk/` for `size` rows."""
+    _, units, students = make_cohort(size, units=2)
+    client = admin_client()
+
+    def per_row():
+        for student in students:
+            client.post('/api/marks/', {'student': student.pk, 'unit': units[0].pk,
+                                        'cat_score': 20, 'exam_score': 50}, format='json')
+
+    def bulk():
+        rows = [{'reg_number': s.reg_number, 'unit_code': units[1].code,
+                 'cat_score': 20, 'exam_score': 50} for s in students]
+        response = client.post('/api/marks/bulk/', rows, format='json')
+        assert response.status_code == 200, response.content
+
+    _, per_row_secs = timed(per_row)
+    _, bulk_secs = timed(bulk)
+    results = {
+        'rows': size,
+        'per_row_rows_per_sec': round(size / per_row_secs, 1),
+        'bulk_rows_per_sec': round(size / bulk_secs, 1),
+        'speedup': round(per_row_secs / bulk_secs, 1),
+    }
+    out.write(f"{size} rows: per-row {results['per_row_rows_per_sec']} rows/s, "
+              f"bulk {results['bulk_rows_per_sec']} rows/s ({results['speedup']}x)")
+    return results
+
+
+@scenario('admission')
+def admission(out, size=100, **options):
+    """
+    Admitting `size` students: one `POST /api/students/` per student against
+    admit_students() hashing inline and across one process per CPU. Password
+    hashing (PBKDF2) dominates, so the pool scales with cores.
+    """
+    programme = Programme.objects.create(name='Admission Programme', code='ADMIT')
+    client = admin_client()
+
+    def intake(prefix):
+        return [{'first_name': 'Bench', 'last_name': f'Student {i}', 'email': f'{prefix}{i}@example.com',
+                 'username': f'{prefix}{i}', 'password': f'intake-{i}',
+                 'reg_number': f'{prefix.upper()}/{i:05d}', 'programme': programme.pk}
+                for i in range(size)]
+
+    def per_request():
+        for row in intake('single'):
+            response = client.post('/api/students/', row, format='json')
+            assert response.status_code == 201, response.content
+
+    runs = {
+        'per_request': per_request,
+        'bulk_inline': lambda: admit_students(intake('inline'), processes=0),
+        f'bulk_pool_x{os.cpu_count()}': lambda: admit_students(intake('pool')),
+    }
+    results = {'rows': size}
+    for name, run in runs.items():
+        _, secs = timed(run)
+        results[f'{name}_rows_per_sec'] = round(size / secs, 1)
+        out.write(f"{name:<16}{size / secs:>10.1f} students/s")
+    return results
+
+
+def percentile(sorted_values, pct):
+    index = round(pct / 100 * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+def measure(call, count):
+    """
+    Call `call(i)` `count` times and return latency percentiles, throughput
+    and the SQL query count per request.
+    """
+    latencies, queries = [], []
+    started = time.perf_counter()
+    for i in range(count):
+        with CaptureQueriesContext(connection) as ctx:
+            request_started = time.perf_counter()
+            response = call(i)
+            latencies.append(time.perf_counter() - request_started)
+        assert response.status_code < 400, (response.status_code, response.content[:200])
+        queries.append(len(ctx.captured_queries))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': count,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'throughput_rps': round(count / elapsed, 1),
+        'queries_max': max(queries),
+        'queries_mean': round(sum(queries) / count, 2),
+    }
+
+
+def bearer(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {tokens_for(user).access_token}'}
+
+
+@scenario('api')
+def api(out, size=2000, requests=200, **options):
+    """
+    End-to-end latency, throughput and query counts for the hot endpoints
+    over a synthetic dataset of `size` students (16 marks each).
+    """
+    dataset = synthetic.generate(size, marks_per_student=16, programmes=4, seed=1)
+    out.write(f"Dataset: {dataset['students']} students, {dataset['marks']} marks.")
+    cache.clear()
+    client = Client()
+    students = list(Student.objects.select_related('user').order_by('?')[:requests])
+    admin = User.objects.create(username='bench-admin', role='admin')
+    admin_auth = bearer(admin)
+    student_auth = [bearer(s.user) for s in students]
+    sample = students[0]
+    units_url = (f'/api/units/?programme={sample.programme_id}'
+                 f'&year={sample.year_of_study}&semester=1')
+    # (student, unit) pairs with no mark yet: units from another year of study
+    other_year_units = {
+        p: list(Unit.objects.filter(programme_id=p).exclude(year=1).values_list('pk', flat=True))
+        for p in {s.programme_id for s in students}
+    }
+    upload_pairs = [
+        (s.pk, unit_id) for s in students if s.year_of_study == 1
+        for unit_id in other_year_units[s.programme_id]
+    ]
+
+    endpoints = {
+        'auth/login/': (lambda i: client.post(
+            '/api/auth/login/',
+            {'username': students[i].user.username, 'password': synthetic.SYNTHETIC_PASSWORD},
+            content_type='application/json'), min(requests, 20)),
+        'my/marks/': (lambda i: client.get('/api/my/marks/', **student_auth[i % len(students)]),
+                      requests),
+        'my/profile/': (lambda i: client.get('/api/my/profile/', **student_auth[i % len(students)]),
+                        requests),
+        'marks/': (lambda i: client.get('/api/marks/', **admin_auth), requests),
+        'units/?programme=&year=&semester=': (lambda i: client.get(units_url, **admin_auth),
+                                              requests),
+        'marks/ (upload)': (lambda i: client.post(
+            '/api/marks/',
+            {'student': upload_pairs[i][0], 'unit': upload_pairs[i][1],
+             'cat_score': 20, 'exam_score': 50},
+            content_type='application/json', **admin_auth), min(requests, len(upload_pairs))),
+    }
+
+    results = {'dataset': dataset, 'endpoints': {}}
+    out.write(f"{'endpoint':<36}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}")
+    for name, (call, count) in endpoints.items():
+        stats = measure(call, count)
+        results['endpoints'][name] = stats
+        out.write(f"{name:<36}{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+                  f"{stats['throughput_rps']:>9}{stats['queries_max']:>9}")
+    return results
+
+
+def concurrency_stats(latencies, elapsed):
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+    }
+
+
+def run_threaded(paths, headers, connections_open):
+    """WSGI-style: `connections_open` worker threads, one sync request at a time each."""
+    local = threading.local()
+    latencies = []
+
+    def request(i):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        started = time.perf_counter()
+        response = local.client.get(paths[i], headers=headers[i])
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, (response.status_code, response.content[:200])
+
+    def close(_):
+        connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=connections_open) as pool:
+        list(pool.map(request, range(len(paths))))
+        elapsed = time.perf_counter() - started
+        list(pool.map(close, range(connections_open)))
+    return concurrency_stats(latencies, elapsed)
+
+
+def run_async(paths, headers, connections_open):
+    """ASGI-style: up to `connections_open` requests in flight on one event loop."""
+    latencies = []
+
+    async def drive():
+        client = AsyncClient()
+        slots = asyncio.Semaphore(connections_open)
+
+        async def request(i):
+            async with slots:
+                started = time.perf_counter()
+                response = await client.get(paths[i], headers=headers[i])
+                latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, (response.status_code, response.content[:200])
+
+        await asyncio.gather(*(request(i) for i in range(len(paths))))
+
+    started = time.perf_counter()
+    asyncio.run(drive())
+    return concurrency_stats(latencies, time.perf_counter() - started)
+
+
+@contextmanager
+def keeping_connections():
+    """
+    Stop request_started/request_finished from closing database connections,
+    as the test client does, so requests sent straight to an ASGIHandler
+    run inside the benchmark's transaction.
+    """
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        yield
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+
+
+class EventStream:
+    """
+    An in-process HTTP client holding one request open on an ASGI
+    `application` (e.g. GET my/marks/stream/), with the server-sent events
+    it receives parsed into `events`: dicts of their fields, plus
+    `comment` for keep-alives. Use inside keeping_connections().
+    """
+
+    def __init__(self, application, path, headers=()):
+        self.status = None
+        self.headers = {}
+        self.body = b''
+        self.events = asyncio.Queue()
+        self.disconnect = asyncio.Event()
+        self.requested = False
+        self.buffer = b''
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+            'headers': [(b'host', b'localhost'),
+                        *((name.lower().encode(), value.encode()) for name, value in dict(headers).items())],
+        }
+        self.task = asyncio.create_task(application(scope, self.receive, self.send))
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            self.headers = {name.decode().lower(): value.decode() for name, value in message['headers']}
+            return
+        self.body += message.get('body', b'')
+        self.buffer += message.get('body', b'')
+        *frames, self.buffer = self.buffer.split(b'\n\n')
+        for frame in frames:
+            event = {}
+            for line in frame.decode().split('\n'):
+                field, _, value = line.partition(':')
+                event[field or 'comment'] = value.strip()
+            self.events.put_nowait(event)
+
+    async def next_event(self, kind='marks', timeout=5):
+        """The next event of `kind`, skipping keep-alives and retry hints."""
+        while True:
+            event = await asyncio.wait_for(self.events.get(), timeout)
+            if event.get('event') == kind:
+                return event
+
+    async def close(self):
+        self.disconnect.set()
+        await self.task
+
+
+@scenario('asgi')
+def asgi(out, size=50, requests=500, **options):
+    """
+    Throughput of the student self-service endpoints with `size` concurrent
+    connections: the sync views on a WSGI-style thread pool against the
+    async views on one event loop. Both run in-process against committed
+    students, so seed first (`seed_data --students N`); use an external
+    load generator against uvicorn/gunicorn for deployment numbers.
+    """
+    students = list(Student.objects.select_related('user').order_by('?')[:requests])
+    if not students:
+        out.write('No students in the database; run `manage.py seed_data --students 1000` first.')
+        return {}
+    # worker threads open their own connections, which only see committed rows
+    headers = [{'Authorization': f'Bearer {tokens_for(s.user).access_token}'}
+               for s in students]
+    headers = [headers[i % len(headers)] for i in range(requests)]
+    urlconf = (  # a tuple: URL resolvers are cached by urlconf, so it must be hashable
+        path('wsgi/auth/me/', MeView.as_view()),
+        path('wsgi/my/profile/', MyProfileView.as_view()),
+        path('wsgi/my/marks/', MyMarksView.as_view()),
+        path('asgi/auth/me/', AsyncMeView.as_view()),
+        path('asgi/my/profile/', AsyncMyProfileView.as_view()),
+        path('asgi/my/marks/', AsyncMyMarksView.as_view()),
+    )
+
+    results = {'connections': size, 'endpoints': {}}
+    out.write(f"{size} concurrent connections, {requests} requests per endpoint")
+    out.write(f"{'endpoint':<16}{'mode':>6}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}")
+    with override_settings(ROOT_URLCONF=urlconf):
+        for endpoint in ('auth/me/', 'my/profile/', 'my/marks/'):
+            for mode, runner in (('wsgi', run_threaded), ('asgi', run_async)):
+                cache.clear()
+                stats = runner([f'/{mode}/{endpoint}'] * requests, headers, size)
+                results['endpoints'].setdefault(endpoint, {})[mode] = stats
+                out.write(f"{endpoint:<16}{mode:>6}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+                          f"{stats['throughput_rps']:>9}")
+    return results
+
+
+def sqlite_profile(path, production):
+    """DATABASES-style settings for a scratch SQLite file in either profile."""
+    primary = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    if production:
+        primary['OPTIONS'] = {'transaction_mode': 'IMMEDIATE', 'timeout': 5}
+    # own alias names so tests may open them from worker threads
+    return ConnectionHandler({
+        'default': primary,  # required by ConnectionHandler, never opened
+        'primary': primary,
+        'replica': {'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': f'file:{path}?mode=ro' if production else path},
+    })
+
+
+def contended_sqlite(path, production, writers=4, readers=4, transactions=40, rows=25):
+    """
+    Upsert-shaped writer transactions (read, then insert) racing readers on
+    one SQLite file, configured like ERP_DB_PROFILE=production or like the
+    development defaults. Returns the lock errors seen and the throughput.
+    """
+    handler = sqlite_profile(path, production)
+    errors, done = [], threading.Event()
+    with override_settings(ERP_DB_PROFILE='production' if production else 'development'):
+        with handler['primary'].cursor() as cursor:
+            cursor.execute('CREATE TABLE scores (id INTEGER PRIMARY KEY, writer INT, total REAL)')
+
+        def write(writer):
+            db = handler['primary']
+            try:
+                for _ in range(transactions):
+                    try:
+                        with db.cursor() as cursor:
+                            cursor.execute(f'BEGIN {db.transaction_mode or ""}')
+                            cursor.execute('SELECT COUNT(*) FROM scores WHERE writer = %s', [writer])
+                            cursor.executemany('INSERT INTO scores (writer, total) VALUES (%s, %s)',
+                                               [(writer, 50.0)] * rows)
+                            cursor.execute('COMMIT')
+                    except OperationalError as exc:
+                        errors.append(str(exc))
+                        db.connection.rollback()
+            finally:
+                db.close()
+
+        def read():
+            db = handler['replica']
+            try:
+                while not done.is_set():
+                    try:
+                        with db.cursor() as cursor:
+                            cursor.execute('SELECT COUNT(*), AVG(total) FROM scores')
+                            cursor.fetchone()
+                    except OperationalError as exc:
+                        errors.append(str(exc))
+            finally:
+                db.close()
+
+        reader_threads = [threading.Thread(target=read) for _ in range(readers)]
+        writer_threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+        started = time.perf_counter()
+        for thread in reader_threads + writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        for thread in reader_threads:
+            thread.join()
+        with handler['primary'].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM scores')
+            written = cursor.fetchone()[0]
+        handler.close_all()
+    return {
+        'errors': len(errors),
+        'error_kinds': sorted(set(errors)),
+        'rows_written': written,
+        'rows_expected': writers * transactions * rows,
+        'seconds': round(elapsed, 3),
+    }
+
+
+@scenario('sqlite_locking')
+def sqlite_locking(out, size=8, requests=200, **options):
+    """
+    `size` writer and `size` reader threads, `requests` transactions per
+    writer, on a scratch SQLite file: development defaults against the
+    production profile (WAL, pragmas, BEGIN IMMEDIATE, read-only replica).
+    """
+    results = {}
+    for profile in ('development', 'production'):
+        with tempfile.TemporaryDirectory() as directory:
+            stats = contended_sqlite(os.path.join(directory, 'bench.sqlite3'),
+                                     production=profile == 'production',
+                                     writers=size, readers=size, transactions=requests)
+        results[profile] = stats
+        out.write(f"{profile:<12} {stats['errors']:>5} lock errors  "
+                  f"{stats['rows_written']}/{stats['rows_expected']} rows in {stats['seconds']}s "
+                  f"{stats['error_kinds']}")
+    return results
+
+
+@scenario('serialize')
+def serialize(out, size=2000, **options):
+    """
+    Rows/sec for list serialisation over a synthetic dataset of `size`
+    students: the ModelSerializer path against the flat values() fast path
+    (erp/fastlists.py), query and JSON rendering included. Checks the two
+    produce identical bytes.
+    """
+    synthetic.generate(size, marks_per_student=16, programmes=4, seed=1)
+    renderer = JSONRenderer()
+    querysets = {
+        'marks': (MarkSerializer, Mark.objects.select_related('student', 'unit').order_by('id')),
+        'students': (StudentSerializer,
+                     Student.objects.select_related('user', 'programme').order_by('id')),
+        'units': (UnitSerializer, Unit.objects.select_related('programme').order_by('id')),
+    }
+    results = {}
+    out.write(f"{'list':<10}{'rows':>9}{'serializer r/s':>16}{'fast path r/s':>16}{'speedup':>9}")
+    for name, (serializer_class, queryset) in querysets.items():
+        serializer = serializer_class()
+        reader = flat_reader(serializer, queryset)
+        slow, slow_secs = timed(lambda: renderer.render(serializer_class(queryset.all(), many=True).data))
+        fast, fast_secs = timed(lambda: renderer.render(reader.render(reader.rows(queryset.all()))))
+        assert slow == fast, f'{name}: fast path output differs'
+        rows = queryset.count()
+        results[name] = {
+            'rows': rows,
+            'serializer_rows_per_sec': round(rows / slow_secs),
+            'fast_rows_per_sec': round(rows / fast_secs),
+            'speedup': round(slow_secs / fast_secs, 1),
+        }
+        stats = results[name]
+        out.write(f"{name:<10}{rows:>9}{stats['serializer_rows_per_sec']:>16}"
+                  f"{stats['fast_rows_per_sec']:>16}{stats['speedup']:>8}x")
+    return results
+
+
+@scenario('json_wire')
+def json_wire(out, size=10000, requests=5, **options):
+    """
+    Encode time and bytes on the wire for `size` rows of the marks/ and
+    students/ list payloads: DRF's stdlib JSONRenderer against
+    FastJSONRenderer (orjson), then gzip (level 6, as the middleware uses)
+    and brotli at ERP_BROTLI_QUALITY when the brotli package is installed.
+    Times are the best of `requests` runs.
+    """
+    synthetic.generate(size, marks_per_student=16, programmes=4, seed=1)
+    lists = {
+        'marks': (MarkSerializer, Mark.objects.select_related('student', 'unit').order_by('id')[:size]),
+        'students': (StudentSerializer,
+                     Student.objects.select_related('user', 'programme').order_by('id')[:size]),
+    }
+    brotli = compression.brotli
+    quality = getattr(settings, 'ERP_BROTLI_QUALITY', 4)
+
+    def best(func, payload):
+        return min(timed(func, payload)[1] for _ in range(requests))
+
+    results = {}
+    out.write(f"{'list':<10}{'rows':>7}{'stdlib ms':>11}{'orjson ms':>11}{'raw KiB':>10}"
+              f"{'gzip KiB':>10}{'gzip ms':>9}{'br KiB':>9}{'br ms':>8}")
+    for name, (serializer_class, queryset) in lists.items():
+        data = serializer_class(queryset, many=True).data
+        body = JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data) == body, f'{name}: renderers disagree'
+        gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+        stats = {
+            'rows': len(data),
+            'stdlib_encode_ms': round(best(JSONRenderer().render, data) * 1000, 1),
+            'orjson_encode_ms': round(best(FastJSONRenderer().render, data) * 1000, 1),
+            'raw_bytes': len(body),
+            'gzip_bytes': len(gzipped),
+            'gzip_ms': round(best(lambda b: gzip.compress(b, compresslevel=6, mtime=0), body) * 1000, 1),
+        }
+        if brotli is not None:
+            stats['brotli_bytes'] = len(brotli.compress(body, quality=quality))
+            stats['brotli_ms'] = round(best(lambda b: brotli.compress(b, quality=quality), body) * 1000, 1)
+        results[name] = stats
+        brotli_kib = f"{stats['brotli_bytes'] / 1024:.0f}" if brotli is not None else '-'
+        out.write(f"{name:<10}{stats['rows']:>7}{stats['stdlib_encode_ms']:>11}{stats['orjson_encode_ms']:>11}"
+                  f"{stats['raw_bytes'] / 1024:>10.0f}{stats['gzip_bytes'] / 1024:>10.0f}{stats['gzip_ms']:>9}"
+                  f"{brotli_kib:>9}{stats.get('brotli_ms', '-'):>8}")
+    return results
+
+
+@scenario('slips')
+def slips_throughput(out, size=2000, **options):
+    """
+    Results-slip generation for `size` synthetic students (16 marks each):
+    slips/sec rendering in-process against a process pool with one process
+    per CPU, and the SQL queries each run needs.
+    """
+    synthetic.generate(size, marks_per_student=16, programmes=4, seed=1)
+    results = {}
+    out.write(f"{'mode':<12}{'slips':>8}{'seconds':>10}{'slips/s':>10}{'queries':>9}")
+    for mode, processes in (('inline', 0), (f'pool x{os.cpu_count()}', os.cpu_count())):
+        with tempfile.TemporaryDirectory() as directory, CaptureQueriesContext(connection) as ctx:
+            summary = slips.generate({}, os.path.join(directory, 'slips.zip'), processes=processes)
+        results[mode] = {**summary, 'queries': len(ctx.captured_queries)}
+        out.write(f"{mode:<12}{summary['slips']:>8}{summary['seconds']:>10.2f}"
+                  f"{summary['slips_per_second']:>10}{len(ctx.captured_queries):>9}")
+    return results
+
+
+@scenario('search')
+def student_search(out, size=200000, requests=50, **options):
+    """
+    `GET /api/students/?q=` latency over `size` students with synthetic
+    names: reg-number prefixes, name prefixes of several breadths and a
+    misspelt name. Reports the index lookup alone (StudentSearch, one page
+    of 20 plus the look-ahead row) and the whole request.
+    """
+    password = make_password('bench')
+    for start in range(0, size, 10000):
+        batch = range(start, min(start + 10000, size))
+        users = User.objects.bulk_create(
+            User(username=f'search{i}', password=password, role='student',
+                 first_name=first_name, last_name=last_name)
+            for i, (first_name, last_name) in zip(batch, map(synthetic.person_name, batch))
+        )
+        Student.objects.bulk_create(
+            Student(user=user, reg_number=f'MU/S{i % 8}/{i:07d}') for i, user in zip(batch, users)
+        )
+    _, index_secs = timed(search.rebuild)
+    out.write(f"{size} students indexed in {index_secs:.2f}s\n")
+
+    client = admin_client()
+    queries = {
+        'reg exact': f'MU/S3/{size // 2 + 3:07d}',
+        'reg prefix': 'MU/S1/00',
+        'one name': 'wanjiru',
+        'first + last': 'wanjiru kimani',
+        'short prefix': 'wa',
+        'one letter': 'k',
+        'misspelt': 'Wanjru Kimnai',
+    }
+    results = {}
+    out.write(f"{'query':<14}{'q':<16}{'found':>6}{'search ms':>11}{'API p50 ms':>12}"
+              f"{'API p95 ms':>12}{'queries':>9}")
+    for name, q in queries.items():
+        found = len(client.get('/api/students/', {'q': q}).json()['results'])
+        lookups = sorted(timed(lambda: search.StudentSearch(q)[0:21])[1] for _ in range(requests))
+        stats = measure(lambda i: client.get('/api/students/', {'q': q}), requests)
+        results[name] = {'q': q, 'found': found, 'search_p50_ms': round(percentile(lookups, 50) * 1000, 2),
+                         **stats}
+        out.write(f"{name:<14}{q:<16}{found:>6}{results[name]['search_p50_ms']:>11}{stats['p50_ms']:>12}"
+                  f"{stats['p95_ms']:>12}{stats['queries_max']:>9}")
+    return results
+
+
+@scenario('catalogue')
+def catalogue_lists(out, size=2000, requests=200, **options):
+    """
+    Programme and unit list/retrieve latency over a catalogue of `size`
+    units in 20 programmes, read from the database (ERP_CATALOGUE_CACHE
+    off) against the in-process catalogue (erp/catalogue.py).
+    """
+    programmes = Programme.objects.bulk_create(
+        Programme(name=f'Catalogue Programme {i}', code=f'CAT{i:02d}', duration_years=4)
+        for i in range(20)
+    )
+    units = Unit.objects.bulk_create(
+        Unit(code=f'CAT{i:05d}', name=f'Catalogue Unit {i}', programme=programmes[i % 20],
+             year=1 + i // 20 % 4, semester=1 + i // 80 % 2)
+        for i in range(size)
+    )
+    CatalogueVersion.bump()  # bulk_create sends no signals
+    client = admin_client()
+    urls = {
+        'programmes': '/api/programmes/',
+        'units page': '/api/units/',
+        'units filter': f'/api/units/?programme={programmes[3].pk}&year=2&semester=1',
+        'unit detail': f'/api/units/{units[size // 2].pk}/',
+    }
+    _, load_secs = timed(get_catalogue)
+    out.write(f"catalogue of {size} units loaded in {load_secs * 1000:.1f} ms\n")
+    out.write(f"{'endpoint':<14}{'mode':<10}{'p50 ms':>9}{'p95 ms':>9}{'rps':>9}{'queries':>9}")
+    results = {}
+    for name, url in urls.items():
+        for mode, cached in (('database', False), ('cached', True)):
+            with override_settings(ERP_CATALOGUE_CACHE=cached):
+                stats = measure(lambda i: client.get(url), requests)
+            results[f'{name} ({mode})'] = stats
+            out.write(f"{name:<14}{mode:<10}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+                      f"{stats['throughput_rps']:>9}{stats['queries_max']:>9}")
+    return results
+
+
+@scenario('changes')
+def change_feed(out, size=2000, requests=50, **options):
+    """
+    Keeping a copy of every mark current for `size` synthetic students
+    (16 marks each) after 1% of the marks change: re-downloading the marks
+    list against following `marks/changes/` from a stored cursor. Reports
+    time, requests and bytes moved, and the cost of polling an idle feed.
+    """
+    synthetic.generate(size, marks_per_student=16, programmes=4, seed=1)
+    client = admin_client()
+
+    def walk(first_url, advance):
+        """Fetch pages until `advance(body)` returns None: (requests, bytes, seconds, last body)."""
+        started, url, pages, sent = time.perf_counter(), first_url, 0, 0
+        while url:
+            response = client.get(url)
+            pages += 1
+            sent += len(response.content)
+            body = response.json()
+            url = advance(body)
+        return pages, sent, time.perf_counter() - started, body
+
+    def feed_next(body):
+        return f"/api/marks/changes/?limit=5000&since={body['next']}" if body['has_more'] else None
+
+    results = {}
+    with override_settings(ERP_CHANGES_SETTLE_SECONDS=0):
+        _, _, _, tail = walk('/api/marks/changes/?limit=5000', feed_next)
+        cursor = tail['next']
+        ids = list(Mark.objects.order_by('id').values_list('id', flat=True))
+        changed = ids[::100]
+        Mark.objects.filter(pk__in=changed[::2]).update(exam_score=55, uploaded_at=timezone.now())
+        for mark in Mark.objects.filter(pk__in=changed[1::2]):
+            mark.delete()  # per row, so the tombstone signal runs
+
+        out.write(f"{len(ids)} marks, {len(changed)} changed\n")
+        out.write(f"{'method':<22}{'requests':>9}{'KiB':>10}{'seconds':>9}")
+        full = walk('/api/marks/?page_size=500', lambda body: body['next'])
+        delta = walk(f'/api/marks/changes/?limit=5000&since={cursor}', feed_next)
+        for name, (pages, sent, secs, _) in (('full re-download', full), ('change feed delta', delta)):
+            results[name] = {'requests': pages, 'bytes': sent, 'seconds': round(secs, 3)}
+            out.write(f"{name:<22}{pages:>9}{sent / 1024:>10.1f}{secs:>9.3f}")
+        assert len(delta[3]['changes']) == len(changed), len(delta[3]['changes'])
+
+        idle = measure(lambda i: client.get(f"/api/marks/changes/?since={delta[3]['next']}"), requests)
+        results['idle poll'] = idle
+        out.write(f"\nidle poll: p50 {idle['p50_ms']} ms, p95 {idle['p95_ms']} ms, "
+                  f"{idle['queries_max']} queries")
+    return results
+
+
+def rss_bytes():
+    """Resident memory of this process, where /proc tells us."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+@scenario('stream')
+def results_stream(out, size=10000, changed=100, **options):
+    """
+    `size` synthetic students each holding GET my/marks/stream/ open on one
+    in-process ASGI application: the time to open them, threads and memory
+    per idle stream (client side included), then how long the new results
+    take to arrive after marks of `changed` of them are published, and that
+    no other stream hears about it.
+    """
+    synthetic.generate(size, marks_per_student=4, programmes=4, seed=1)
+    students = list(Student.objects.select_related('user').order_by('-id')[:size])
+    headers = [{'Authorization': f'Bearer {tokens_for(s.user).access_token}'} for s in students]
+    touched = set(range(0, size, max(size // changed, 1)))
+    urlconf = (path('api/my/marks/stream/', AsyncMyMarksStreamView.as_view()),)
+    results = {'streams': size}
+
+    async def drive():
+        application = ASGIHandler()
+        threads, rss = threading.active_count(), rss_bytes()
+        started = time.perf_counter()
+        streams = []
+        for start in range(0, size, 500):
+            batch = [EventStream(application, '/api/my/marks/stream/', headers[i])
+                     for i in range(start, min(start + 500, size))]
+            await asyncio.gather(*(stream.next_event(timeout=60) for stream in batch))
+            streams += batch
+        opened = time.perf_counter() - started
+        results.update(open_seconds=round(opened, 2), open_per_sec=round(size / opened, 1),
+                       hub=len(events.hub), extra_threads=threading.active_count() - threads)
+        if rss is not None:
+            results['kib_per_stream'] = round((rss_bytes() - rss) / size / 1024, 1)
+        out.write(f"{size} streams open in {opened:.2f}s ({results['open_per_sec']}/s), "
+                  f"{results['extra_threads']} extra threads, "
+                  f"{results.get('kib_per_stream', '?')} KiB each")
+
+        def publish():
+            ids = [students[i].pk for i in touched]
+            Mark.objects.filter(student_id__in=ids).update(exam_score=55, uploaded_at=timezone.now())
+            for student_id in ids:  # what the commit hooks do
+                bump_version('marks', student_id)
+            events.publish(ids)
+
+        started = time.perf_counter()
+        await sync_to_async(publish)()
+        latencies = []
+
+        async def arrival(stream):
+            await stream.next_event()
+            latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(arrival(streams[i]) for i in touched))
+        latencies.sort()
+
+        def heard(stream):
+            while not stream.events.empty():
+                if stream.events.get_nowait().get('event') == 'marks':
+                    return True
+            return False
+
+        quiet = not any(heard(stream) for i, stream in enumerate(streams) if i not in touched)
+        results.update(changed=len(touched), p50_ms=round(percentile(latencies, 50) * 1000, 2),
+                       max_ms=round(latencies[-1] * 1000, 2), others_quiet=quiet)
+        out.write(f"{len(touched)} students' marks published: results arrived p50 "
+                  f"{results['p50_ms']} ms, all within {results['max_ms']} ms; "
+                  f"other streams quiet: {quiet}")
+
+        await asyncio.gather(*(stream.close() for stream in streams))
+        results['hub_after_close'] = len(events.hub)
+
+    with override_settings(ROOT_URLCONF=urlconf), keeping_connections():
+        cache.clear()
+        async_to_sync(drive)()
+    return results
+
+
+@scenario('progression')
+def progression_run(out, size=50000, sample=2000, **options):
+    """
+    Year-end progression for one programme of `size` synthetic students
+    (16 marks each, for their current year): the set-based report and bulk
+    promotion against a per-student loop over marks, which is timed on
+    `sample` students and scaled up. The standings refresh that follows a
+    promotion on commit is timed separately.
+    """
+    synthetic.generate(size, marks_per_student=16, programmes=1, seed=1)
+    programme = Programme.objects.get(code='SYN01')
+    cohort = list(Student.objects.filter(programme=programme).order_by('reg_number')
+                  .values_list('pk', 'year_of_study'))
+
+    def per_student(students):
+        statuses = {}
+        for pk, year_of_study in students:
+            units = list(Unit.objects.filter(programme=programme, year=year_of_study)
+                         .values_list('pk', flat=True))
+            totals = list(Mark.objects.filter(student_id=pk, unit_id__in=units)
+                          .values_list('total', flat=True))
+            failed = sum(1 for total in totals if total < progression.PASS_MARK)
+            statuses[pk] = progression.classify(len(units), len(totals) - failed, failed)
+        return statuses
+
+    looped, loop_secs = timed(per_student, cohort[:sample])
+    report, report_secs = timed(progression.report, programme)
+    assert all(looped[row['student']] == row['status'] for row in report['students'][:sample])
+    result, promote_secs = timed(progression.promote, programme)
+    assert result['promoted'] == report['promotable'], (result['promoted'], report['promotable'])
+    promoted = [row['student'] for row in result['students']
+                if row['status'] == progression.PASS and row['year_of_study'] < programme.duration_years]
+    _, refresh_secs = timed(rankings.refresh_students, promoted)
+
+    results = {
+        'students': len(cohort),
+        'counts': report['counts'],
+        'promoted': result['promoted'],
+        'per_student_loop_seconds': round(loop_secs * len(cohort) / min(sample, len(cohort)), 2),
+        'report_seconds': round(report_secs, 2),
+        'promote_seconds': round(promote_secs, 2),
+        'standings_refresh_seconds': round(refresh_secs, 2),
+    }
+    counts = ', '.join(f'{status} {count}' for status, count in report['counts'].items())
+    out.write(f"{len(cohort)} students: {counts}; {result['promoted']} promoted\n")
+    out.write(f"{'step':<40}{'seconds':>9}")
+    for label, key in (('per-student loop (scaled from sample)', 'per_student_loop_seconds'),
+                       ('report (dry run)', 'report_seconds'),
+                       ('promote (report + bulk UPDATE)', 'promote_seconds'),
+                       ('standings refresh on commit', 'standings_refresh_seconds')):
+        out.write(f"{label:<40}{results[key]:>9}")
+    return results
@@ -0,0 +1,254 @@
+"""
+Set-based write paths for registry operations that touch many rows at once.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from . import events, search
+from .cache import bump_on_commit
+from .models import User, Programme, Student, Unit, Mark
+from .processes import setup_child
+from .serializers import MarkBulkRowSerializer, StudentAdmissionRowSerializer
+from .rankings import refresh_on_commit
+from .stats import invalidate_for_units
+
+# Keeps IN (...) lists well below SQLite's bound-parameter limit.
+LOOKUP_CHUNK_SIZE = 500
+INSERT_BATCH_SIZE = 500
+
+
+def chunked(items, size=LOOKUP_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@dataclass
+class BulkResult:
+    created: int = 0
+    updated: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'updated': self.updated, 'errors': self.errors}
+
+
+def _lookup(model, key, values):
+    """Map `key` values to primary keys with one query per chunk."""
+    found = {}
+    for chunk in chunked(values):
+        found.update(model.objects.filter(**{f'{key}__in': chunk}).values_list(key, 'pk'))
+    return found
+
+
+def upsert_marks(rows):
+    """
+    Validate and upsert a batch of mark rows in a single transaction.
+
+    Rows are dicts accepted by `MarkBulkRowSerializer`. Invalid rows are
+    reported by their 1-based position and skipped; the valid ones are
+    written with one `INSERT ... ON CONFLICT (student, unit) DO UPDATE` per
+    batch. If the same student/unit pair appears more than once the last row
+    wins.
+    """
+    result = BulkResult()
+    valid = []
+    for row_number, row in enumerate(rows, start=1):
+        serializer = MarkBulkRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((row_number, serializer.validated_data))
+        else:
+            result.add_error(row_number, serializer.errors)
+
+    students_by_id = _lookup(Student, 'pk', {d['student'] for _, d in valid if d.get('student')})
+    students_by_reg = _lookup(Student, 'reg_number', {d['reg_number'] for _, d in valid
+                                                      if not d.get('student') and d.get('reg_number')})
+    units_by_id = _lookup(Unit, 'pk', {d['unit'] for _, d in valid if d.get('unit')})
+    units_by_code = _lookup(Unit, 'code', {d['unit_code'] for _, d in valid
+                                           if not d.get('unit') and d.get('unit_code')})
+
+    marks = {}
+    for row_number, data in valid:
+        if data.get('student'):
+            student_id = students_by_id.get(data['student'])
+        else:
+            student_id = students_by_reg.get(data['reg_number'])
+        if data.get('unit'):
+            unit_id = units_by_id.get(data['unit'])
+        else:
+            unit_id = units_by_code.get(data['unit_code'])
+
+        errors = {}
+        if student_id is None:
+            errors['student'] = ["Student not found."]
+        if unit_id is None:
+            errors['unit'] = ["Unit not found."]
+        if errors:
+            result.add_error(row_number, errors)
+            continue
+        marks[(student_id, unit_id)] = Mark(
+            student_id=student_id,
+            unit_id=unit_id,
+            cat_score=data.get('cat_score'),
+            exam_score=data.get('exam_score'),
+        )
+    result.errors.sort(key=lambda error: error['row'])
+
+    if not marks:
+        return result
+
+    with transaction.atomic():
+        # counted in the same transaction as the upsert, so created/updated match what it wrote
+        existing = set()
+        for chunk in chunked({student_id for student_id, _ in marks}):
+            existing.update(
+                Mark.objects.filter(student_id__in=chunk, unit_id__in={u for _, u in marks})
+                .values_list('student_id', 'unit_id')
+            )
+        existing &= marks.keys()
+        Mark.objects.bulk_create(
+            marks.values(),
+            batch_size=INSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['student', 'unit'],
+            update_fields=['cat_score', 'exam_score', 'uploaded_at'],
+        )
+        # bulk_create sends no signals, so invalidate cached results here
+        bump_on_commit('marks', {student_id for student_id, _ in marks})
+        invalidate_for_units({unit_id for _, unit_id in marks})
+        refresh_on_commit({student_id for student_id, _ in marks})
+        events.publish_on_commit({student_id for student_id, _ in marks})
+
+    result.updated = len(existing)
+    result.created = len(marks) - result.updated
+    return result
+
+
+def hash_passwords(passwords, processes=None):
+    """
+    make_password() for each password, spread over a process pool of
+    `processes` (default one per CPU; 0 hashes in this process). Each PBKDF2
+    hash is deliberately slow, so an intake is CPU-bound on hashing alone.
+    """
+    processes = os.cpu_count() if processes is None else processes
+    if processes == 0 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    workers = min(processes, len(passwords))
+    with ProcessPoolExecutor(max_workers=workers, initializer=setup_child,
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+class AdmissionConflict(Exception):
+    """A concurrent write took a username or reg number while an intake was being inserted."""
+
+
+TAKEN_LABELS = (('username', 'Username'), ('reg_number', 'Reg number'))
+
+
+def _admissible(rows, result):
+    """
+    The (row number, data, programme id) `rows` whose username and reg number
+    the database doesn't have yet; the others are reported in `result`.
+    """
+    taken = {'username': _lookup(User, 'username', {data['username'] for _, data, _ in rows}),
+             'reg_number': _lookup(Student, 'reg_number', {data['reg_number'] for _, data, _ in rows})}
+    kept = []
+    for row_number, data, programme_id in rows:
+        errors = {key: [f"{label} already exists."] for key, label in TAKEN_LABELS if data[key] in taken[key]}
+        if errors:
+            result.add_error(row_number, errors)
+        else:
+            kept.append((row_number, data, programme_id))
+    return kept
+
+
+def admit_students(rows, processes=None):
+    """
+    Register a student intake in one transaction.
+
+    Rows are dicts accepted by `StudentAdmissionRowSerializer`. Usernames and
+    reg numbers are checked against the database with one IN (...) query
+    per chunk, and against earlier rows of the same intake; offending rows
+    are reported by their 1-based position and skipped. Passwords of the
+    remaining rows are hashed across a process pool (see hash_passwords)
+    and the User and Student rows are written with bulk_create.
+
+    The database check is repeated inside the transaction, after hashing, so
+    rows another intake admitted meanwhile are reported too. Raises
+    AdmissionConflict if one still slips in before the insert.
+    """
+    result = BulkResult()
+    valid = []
+    for row_number, row in enumerate(rows, start=1):
+        serializer = StudentAdmissionRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((row_number, serializer.validated_data))
+        else:
+            result.add_error(row_number, serializer.errors)
+
+    programmes_by_id = _lookup(Programme, 'pk', {d['programme'] for _, d in valid if d.get('programme')})
+    programmes_by_code = _lookup(Programme, 'code', {d['programme_code'] for _, d in valid
+                                                     if not d.get('programme') and d.get('programme_code')})
+
+    candidates = []
+    first_rows = {'username': {}, 'reg_number': {}}  # value -> row that claimed it
+    for row_number, data in valid:
+        if data.get('programme'):
+            programme_id = programmes_by_id.get(data['programme'])
+        else:
+            programme_id = programmes_by_code.get(data['programme_code'])
+
+        errors = {}
+        for key, label in TAKEN_LABELS:
+            if data[key] in first_rows[key]:
+                errors[key] = [f"{label} repeats row {first_rows[key][data[key]]}."]
+        if programme_id is None:
+            errors['programme'] = ["Programme not found."]
+        if errors:
+            result.add_error(row_number, errors)
+            continue
+        first_rows['username'][data['username']] = row_number
+        first_rows['reg_number'][data['reg_number']] = row_number
+        candidates.append((row_number, data, programme_id))
+
+    # a first check, so that passwords of rows bound to be rejected aren't hashed
+    admitted = _admissible(candidates, result)
+    if not admitted:
+        result.errors.sort(key=lambda error: error['row'])
+        return result
+
+    hashes = hash_passwords([data['password'] for _, data, _ in admitted], processes)
+    try:
+        with transaction.atomic():
+            hashed = dict(zip((row_number for row_number, _, _ in admitted), hashes))
+            admitted = _admissible(admitted, result)
+            users = User.objects.bulk_create(
+                [User(username=data['username'], password=hashed[row_number],
+                      first_name=data['first_name'], last_name=data['last_name'],
+                      email=data['email'], role='student')
+                 for row_number, data, _ in admitted],
+                batch_size=INSERT_BATCH_SIZE,
+            )
+            students = Student.objects.bulk_create(
+                [Student(user=user, reg_number=data['reg_number'], programme_id=programme_id,
+                         year_of_study=data.get('year_of_study') or 1, phone=data.get('phone') or '')
+                 for user, (_, data, programme_id) in zip(users, admitted)],
+                batch_size=INSERT_BATCH_SIZE,
+            )
+            search.index_students([student.pk for student in students])  # bulk_create sends no signals
+    except IntegrityError as exc:
+        raise AdmissionConflict(
+            "Another admission took one of these usernames or reg numbers; submit the intake again.") from exc
+    result.errors.sort(key=lambda error: error['row'])
+    result.created = len(admitted)
+    return result
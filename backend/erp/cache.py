@@ -0,0 +1,94 @@
+"""
+Versioned caching on top of Django's cache framework.
+
+Cached values live under a key that embeds a per-object version counter.
+Writes bump the counter (see erp/signals.py and erp/bulk.py) rather than
+deleting entries, so readers stop addressing stale entries immediately and
+the old ones age out on their own.
+
+Counters are per backend: with the default LocMemCache every worker process
+has its own cache, which is only correct for a single-process deployment.
+Multi-worker deployments should point ERP_CACHE_BACKEND at a shared backend
+(file-based or memcached).
+"""
+
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+RESULTS_TIMEOUT = 60 * 60
+
+stats = Counter()
+
+
+def _version_key(namespace, key):
+    return f'erp:v:{namespace}:{key}'
+
+
+def get_version(namespace, key):
+    version_key = _version_key(namespace, key)
+    version = cache.get(version_key)
+    if version is None:
+        # Seed with the clock rather than 1 so a counter that was evicted and
+        # recreated can never line up with a stale entry from before.
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+async def aget_version(namespace, key):
+    version_key = _version_key(namespace, key)
+    version = await cache.aget(version_key)
+    if version is None:
+        await cache.aadd(version_key, time.time_ns(), timeout=None)
+        version = await cache.aget(version_key)
+    return version
+
+
+def bump_version(namespace, key):
+    version_key = _version_key(namespace, key)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.add(version_key, time.time_ns(), timeout=None)
+
+
+def bump_on_commit(namespace, keys):
+    """
+    Bump versions once the surrounding transaction commits, so a reader can
+    never cache pre-commit data under the new version.
+    """
+    keys = set(keys)
+    transaction.on_commit(lambda: [bump_version(namespace, key) for key in keys])
+
+
+def get_or_build(namespace, key, build, variant='', timeout=RESULTS_TIMEOUT):
+    """
+    Return the cached value for (namespace, key, variant), calling `build()`
+    on a miss. `variant` distinguishes different renderings of the same
+    object (e.g. a ?fields= selection) that share one version counter.
+    """
+    data_key = f'erp:{namespace}:{key}:{get_version(namespace, key)}:{variant}'
+    value = cache.get(data_key)
+    if value is None:
+        stats[f'{namespace}_misses'] += 1
+        value = build()
+        cache.set(data_key, value, timeout)
+    else:
+        stats[f'{namespace}_hits'] += 1
+    return value
+
+
+async def aget_or_build(namespace, key, build, variant='', timeout=RESULTS_TIMEOUT):
+    """get_or_build() for async views; `build` is a coroutine function."""
+    data_key = f'erp:{namespace}:{key}:{await aget_version(namespace, key)}:{variant}'
+    value = await cache.aget(data_key)
+    if value is None:
+        stats[f'{namespace}_misses'] += 1
+        value = await build()
+        await cache.aset(data_key, value, timeout)
+    else:
+        stats[f'{namespace}_hits'] += 1
+    return value
@@ -0,0 +1,142 @@
+"""
+In-process cache of the programme/unit catalogue.
+
+The whole catalogue (a few hundred programmes and units, changed a few
+times a year) is loaded into one immutable Catalogue snapshot: compact
+tuples keyed by id, by code and by (programme, year, semester), plus the
+serializer output of every row, rendered once. `get_catalogue()` checks the
+snapshot against the CatalogueVersion stamp (one primary-key read) and
+reloads it when any Programme or Unit write has bumped the version, so
+every process serves the current catalogue without a shared cache.
+Writes that bypass the model signals (bulk_create, raw SQL) must call
+CatalogueVersion.bump(), as erp/synthetic.py does.
+"""
+
+import threading
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .models import Programme, Unit, CatalogueVersion
+from .serializers import ProgrammeSerializer, UnitSerializer
+
+
+class ProgrammeEntry(NamedTuple):
+    id: int
+    code: str
+    name: str
+    duration_years: int
+    has_semester_3: bool
+
+
+class UnitEntry(NamedTuple):
+    id: int
+    code: str
+    name: str
+    programme_id: int
+    year: int
+    semester: int
+
+
+class Catalogue:
+    """Every programme and unit as of `version`. Never mutated once built."""
+
+    def __init__(self, version, updated_at, programmes, units):
+        self.version = version
+        self.updated_at = updated_at
+        self.programmes = tuple(ProgrammeEntry(p.pk, p.code, p.name, p.duration_years, p.has_semester_3)
+                                for p in programmes)
+        self.units = tuple(UnitEntry(u.pk, u.code, u.name, u.programme_id, u.year, u.semester)
+                           for u in units)
+        self.programmes_by_id = {p.id: p for p in self.programmes}
+        self.programmes_by_code = {p.code: p for p in self.programmes}
+        self.units_by_id = {u.id: u for u in self.units}
+        self.units_by_code = {u.code: u for u in self.units}
+        by_programme, by_term = {}, {}
+        for unit in self.units:
+            by_programme.setdefault(unit.programme_id, []).append(unit)
+            by_term.setdefault((unit.programme_id, unit.year, unit.semester), []).append(unit)
+        self.units_by_programme = {key: tuple(units) for key, units in by_programme.items()}
+        self.units_by_term = {key: tuple(units) for key, units in by_term.items()}
+        # serializer output, in id order like the list endpoints
+        self.programme_data = {row['id']: dict(row) for row in ProgrammeSerializer(programmes, many=True).data}
+        self.unit_data = {row['id']: dict(row) for row in UnitSerializer(units, many=True).data}
+
+    @classmethod
+    def load(cls):
+        stamp = CatalogueVersion.current()  # read first: the rows are at least this new
+        programmes = list(Programme.objects.order_by('id'))
+        by_id = {programme.pk: programme for programme in programmes}
+        units = list(Unit.objects.order_by('id'))
+        for unit in units:
+            unit.programme = by_id[unit.programme_id]
+        return cls(stamp.version, stamp.updated_at, programmes, units)
+
+    def find_units(self, programme=None, year=None, semester=None):
+        """Units matching the given filters (None matches anything), in id order."""
+        if programme is not None and year is not None and semester is not None:
+            return self.units_by_term.get((programme, year, semester), ())
+        units = self.units if programme is None else self.units_by_programme.get(programme, ())
+        return [unit for unit in units
+                if (year is None or unit.year == year) and (semester is None or unit.semester == semester)]
+
+    def programme_units(self, programme_id, up_to_year):
+        """A programme's units from year 1 through `up_to_year`."""
+        return [unit for unit in self.units_by_programme.get(programme_id, ()) if unit.year <= up_to_year]
+
+
+_catalogue = None
+_load_lock = threading.Lock()
+
+
+def _stamp():
+    return CatalogueVersion.objects.filter(pk=1).values_list('version', 'updated_at').first()
+
+
+def get_catalogue():
+    """The current catalogue; one version lookup, plus a reload after a change."""
+    global _catalogue
+    # the bump time is compared too: a rolled-back bump can reuse a version number
+    catalogue = _catalogue
+    if catalogue is not None and (catalogue.version, catalogue.updated_at) == _stamp():
+        return catalogue
+    with _load_lock:
+        catalogue = _catalogue
+        if catalogue is None or (catalogue.version, catalogue.updated_at) != _stamp():
+            catalogue = _catalogue = Catalogue.load()
+    return catalogue
+
+
+def enabled():
+    return getattr(settings, 'ERP_CATALOGUE_CACHE', True)
+
+
+class RowSet:
+    """
+    Pre-rendered rows sorted by id with the three queryset operations
+    CursorPagination applies (order_by, filter on the cursor position,
+    slicing), so cached lists page exactly like the database ones.
+    """
+
+    def __init__(self, rows, reverse=False):
+        self.rows = rows
+        self.reverse = reverse
+
+    def order_by(self, *ordering):
+        if ordering not in (('id',), ('-id',)):
+            raise ValueError(f'RowSet only orders by id, not {ordering}.')
+        return RowSet(self.rows, reverse=ordering[0] == '-id')
+
+    def filter(self, id__gt=None, id__lt=None):
+        rows = self.rows
+        if id__gt is not None:
+            rows = [row for row in rows if row['id'] > int(id__gt)]
+        if id__lt is not None:
+            rows = [row for row in rows if row['id'] < int(id__lt)]
+        return RowSet(rows, self.reverse)
+
+    def __getitem__(self, index):
+        return (self.rows[::-1] if self.reverse else self.rows)[index]
+
+    def __len__(self):
+        return len(self.rows)
@@ -0,0 +1,122 @@
+"""
+Incremental change feed for marks (`GET /api/marks/changes/?since=`).
+
+A consumer stores the opaque cursor from each response and passes it back
+to receive only what changed since: marks whose `uploaded_at` is later
+(creates and updates) and MarkTombstone rows for deletes, merged in
+(time, kind, id) order. Both come from range scans on (uploaded_at, id) and
+(deleted_at, id) indexes, so a page costs the same however old the data is.
+
+Changes younger than ERP_CHANGES_SETTLE_SECONDS are held back: timestamps
+are taken before the writing transaction commits, so a slow bulk import
+could otherwise commit rows "behind" a cursor a consumer already holds.
+Tombstones older than ERP_TOMBSTONE_RETENTION_DAYS are purged
+(`manage.py purge_tombstones`), and older cursors are refused so their
+consumers know to start over; an empty page still advances its cursor to
+the settle horizon, so only a consumer that stops polling falls that far
+behind.
+"""
+
+import base64
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .fastlists import flat_reader
+from .models import Mark, MarkTombstone
+from .serializers import MarkSerializer
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+UPSERT, DELETE = 0, 1  # at equal timestamps, upserts sort before deletes
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def encode_cursor(changed_at, kind, pk):
+    raw = f'{changed_at.isoformat()}|{kind}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(changed_at, kind, pk); ValueError for anything encode_cursor() did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        changed_at, kind, pk = raw.split('|')
+        changed_at, kind, pk = parse_datetime(changed_at), int(kind), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor.')
+    if changed_at is None or timezone.is_naive(changed_at) or kind not in (UPSERT, DELETE):
+        raise ValueError('Invalid cursor.')
+    return changed_at, kind, pk
+
+
+def retention_cutoff():
+    return timezone.now() - timedelta(days=settings.ERP_TOMBSTONE_RETENTION_DAYS)
+
+
+def purge_tombstones():
+    """Delete tombstones past the retention period; returns how many."""
+    deleted, _ = MarkTombstone.objects.filter(deleted_at__lt=retention_cutoff()).delete()
+    return deleted
+
+
+def _after(queryset, field, position, kind):
+    """Rows of `kind` strictly after `position` = (changed_at, kind, pk) in feed order."""
+    if position is None:
+        return queryset
+    changed_at, cursor_kind, pk = position
+    if kind < cursor_kind:
+        return queryset.filter(**{f'{field}__gt': changed_at})
+    queryset = queryset.filter(**{f'{field}__gte': changed_at})
+    if kind == cursor_kind:
+        queryset = queryset.exclude(**{field: changed_at, 'id__lte': pk})
+    return queryset
+
+
+def _mark_changes(queryset):
+    """[(feed position, change)] for these marks, serialized like the marks list."""
+    reader = flat_reader(MarkSerializer(), queryset)
+    if reader is None:
+        return [((mark.uploaded_at, UPSERT, mark.pk), {'op': 'upsert', **MarkSerializer(mark).data})
+                for mark in queryset]
+    rows = list(reader.rows(queryset))
+    return [((row['uploaded_at'], UPSERT, row['id']), {'op': 'upsert', **data})
+            for row, data in zip(rows, reader.render(rows))]
+
+
+def changes(since=None, limit=PAGE_SIZE):
+    """
+    Up to `limit` changes after the cursor `since` (None: from the start):
+    {'changes': [...], 'next': cursor, 'has_more': bool}. Raises ValueError
+    for a malformed cursor and CursorExpired for one older than the
+    tombstone retention.
+    """
+    position = decode_cursor(since) if since else None
+    if position is not None and position[0] < retention_cutoff():
+        raise CursorExpired('Cursor is older than the tombstone retention; start again without one.')
+    until = timezone.now() - timedelta(seconds=settings.ERP_CHANGES_SETTLE_SECONDS)
+
+    marks = _after(Mark.objects.select_related('student', 'unit').filter(uploaded_at__lte=until),
+                   'uploaded_at', position, UPSERT).order_by('uploaded_at', 'id')[:limit + 1]
+    tombstones = _after(MarkTombstone.objects.filter(deleted_at__lte=until),
+                        'deleted_at', position, DELETE).order_by('deleted_at', 'id')[:limit + 1]
+
+    merged = _mark_changes(marks)
+    merged += [((tombstone.deleted_at, DELETE, tombstone.pk),
+                {'op': 'delete', 'id': tombstone.mark_id, 'student': tombstone.student_id,
+                 'unit': tombstone.unit_id, 'deleted_at': tombstone.deleted_at})
+               for tombstone in tombstones]
+    merged.sort(key=lambda item: item[0])
+    page = merged[:limit]
+    if page:
+        since = encode_cursor(*page[-1][0])
+    elif position is None or position < (until, UPSERT, 0):
+        # nothing up to `until`, and nothing older can still commit: move to there, so
+        # a consumer polling a quiet feed never holds a cursor past the retention
+        since = encode_cursor(until, UPSERT, 0)
+    return {'changes': [change for _, change in page], 'next': since, 'has_more': len(merged) > limit}
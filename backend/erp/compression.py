@@ -0,0 +1,53 @@
+"""
+Response compression for the API.
+
+Brotli when the `brotli` package is installed and the client accepts `br`,
+gzip otherwise (Django's GZipMiddleware, including its random-filename
+padding against BREACH-style length probing). Responses smaller than
+ERP_COMPRESS_MIN_BYTES are sent as they are: below about a kilobyte the
+CPU cost outweighs the few bytes saved. Streaming responses such as the
+CSV export are gzipped chunk by chunk. Server-sent event streams are sent
+as they are: each event is flushed on its own and is too small to gain.
+"""
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+class CompressionMiddleware(GZipMiddleware):
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_bytes = getattr(settings, 'ERP_COMPRESS_MIN_BYTES', 1024)
+        self.brotli_quality = getattr(settings, 'ERP_BROTLI_QUALITY', 4)
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        if not response.streaming and len(response.content) < self.min_bytes:
+            return response
+        if (brotli is None or response.streaming or response.has_header('Content-Encoding')
+                or not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # as in GZipMiddleware: the encoded body is no longer byte-identical
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,97 @@
+"""
+Conditional GET (ETag / Last-Modified) for the most polled endpoints.
+
+Validators are computed without rendering the body: catalogue reads use the
+CatalogueVersion stamp (via the in-process catalogue) plus the request URL, and a student's results use
+the count and latest `uploaded_at` of their marks and their units' details,
+which are cached with the serialised results. A matching If-None-Match (or If-Modified-Since) gets a
+bodyless 304.
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .catalogue import enabled as catalogue_enabled, get_catalogue
+from .models import CatalogueVersion
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # clients must revalidate, and responses differ per user
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def conditional(request, etag, respond, last_modified=None):
+    """
+    A 304 when the request's validators match, else `respond()` with the
+    ETag/Last-Modified headers set.
+    """
+    not_modified = get_conditional_response(
+        request, etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if not_modified is not None:
+        return _validators(not_modified, etag, last_modified)
+    response = respond()
+    if response.status_code == 200:
+        _validators(response, etag, last_modified)
+    return response
+
+
+def results_etag(student_id, marks, variant=''):
+    """
+    ETag for a student's results: which marks exist, when they last changed
+    and the unit details shown with them (`marks` come with their units).
+    """
+    latest = max((mark.uploaded_at for mark in marks), default=None)
+    units = hashlib.md5(repr([(mark.unit.code, mark.unit.name, mark.unit.year, mark.unit.semester)
+                              for mark in marks]).encode()).hexdigest()
+    return make_etag('results', student_id, len(marks), latest.isoformat() if latest else '',
+                     units, variant)
+
+
+class CatalogueConditionalMixin:
+    """
+    list/retrieve answer 304 until a Programme or Unit changes. With the
+    in-process catalogue enabled (ERP_CATALOGUE_CACHE, see erp/catalogue.py)
+    they are answered from it through list_from_catalogue() and
+    retrieve_from_catalogue(), which may return None to use the database.
+    """
+
+    def catalogue_response(self, request, cached, uncached):
+        if catalogue_enabled():
+            catalogue = stamp = get_catalogue()
+        else:
+            catalogue, stamp = None, CatalogueVersion.current()
+        etag = make_etag('catalogue', stamp.version, request.get_full_path())
+
+        def respond():
+            response = cached(catalogue) if catalogue is not None else None
+            return uncached() if response is None else response
+        return conditional(request, etag, respond, last_modified=stamp.updated_at)
+
+    def list(self, request, *args, **kwargs):
+        return self.catalogue_response(
+            request, lambda catalogue: self.list_from_catalogue(request, catalogue),
+            lambda: super(CatalogueConditionalMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.catalogue_response(
+            request, lambda catalogue: self.retrieve_from_catalogue(request, catalogue, kwargs['pk']),
+            lambda: super(CatalogueConditionalMixin, self).retrieve(request, *args, **kwargs))
+
+    def list_from_catalogue(self, request, catalogue):
+        return None
+
+    def retrieve_from_catalogue(self, request, catalogue, pk):
+        return None
@@ -0,0 +1,89 @@
+"""
+SQLite tuning and read/write routing for the production database profile
+(ERP_DB_PROFILE=production, see settings.py).
+
+Every new SQLite connection gets the PRODUCTION_PRAGMAS: WAL lets readers and
+the single writer proceed concurrently instead of failing with "database is
+locked", and busy_timeout makes writers queue for the write lock rather
+than error. Reads made inside `read_replica()` (the student self-service
+views) are routed to the read-only `read` alias, a second connection to the
+same file, so they never hold the primary connection.
+"""
+
+import functools
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+READ_ALIAS = 'read'
+
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',     # durable across app crashes; fsync only at checkpoints
+    'busy_timeout': 5000,        # ms to wait for the write lock before giving up
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,    # negative means KiB: 64 MiB page cache per connection
+}
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or getattr(settings, 'ERP_DB_PROFILE', None) != 'production':
+        return
+    read_only = 'mode=ro' in str(connection.settings_dict['NAME'])
+    with connection.cursor() as cursor:
+        for pragma, value in PRODUCTION_PRAGMAS.items():
+            if pragma == 'journal_mode' and read_only:
+                continue  # persistent in the file; set by the primary connection
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+_use_read_replica = ContextVar('erp_use_read_replica', default=False)
+
+
+@contextmanager
+def read_replica():
+    """Route ORM reads in this block (and its sync_to_async calls) to READ_ALIAS."""
+    token = _use_read_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_read_replica.reset(token)
+
+
+def reads_from_replica(handler):
+    """Run a (sync or async) view handler inside read_replica()."""
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            with read_replica():
+                return await handler(*args, **kwargs)
+    else:
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            with read_replica():
+                return handler(*args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """
+    Sends reads to READ_ALIAS inside read_replica() and everything else to
+    the primary. Only installed when the `read` alias is configured.
+    """
+
+    def db_for_read(self, model, **hints):
+        return READ_ALIAS if _use_read_replica.get() else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # both aliases are the same database
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,247 @@
+"""
+Push notification of results changes for `GET /api/my/marks/stream/`.
+
+Each open stream subscribes to its student's id on the process-wide `hub`.
+Mark writes call `publish_on_commit()` (the signals in erp/signals.py and
+the bulk paths in erp/bulk.py), and once the transaction commits every
+stream of those students is woken to re-read its results and send them as
+one server-sent event. An idle stream is an asyncio.Event and a timer on
+the event loop; no thread or database connection is held for it.
+
+With several worker processes a write in one must reach the streams held by
+the others. When ERP_EVENTS_SOCKET_DIR is set, every process serving
+streams binds a Unix datagram socket `<pid>.sock` in that directory and
+`publish()` sends the student ids to all of them; sockets of workers that
+have died are removed by the first publisher to find them refusing.
+A woken stream re-reads its results through the results cache, so the
+workers must also share that cache (Redis or Memcached, see settings.CACHES):
+with the per-process LocMemCache the others would wake only to send their
+own stale copy, and relay() refuses to start.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import threading
+import weakref
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+RELAY_CHUNK_SIZE = 2000  # student ids per datagram
+RELAY_SEND_TIMEOUT = 0.05  # seconds to wait on a peer whose queue is full
+RETRY_MS = (3000, 10000)  # reconnect delay suggested to clients, spread to avoid a stampede
+
+
+class Subscription:
+    """One open stream: woken by the hub whenever its student's marks change."""
+    __slots__ = ('student_id', 'loop', 'changed', '__weakref__')
+
+    def __init__(self, student_id, loop):
+        self.student_id = student_id
+        self.loop = loop
+        self.changed = asyncio.Event()
+
+    async def wait(self, timeout):
+        """True once a change has been published, False after `timeout` seconds without one."""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
+
+
+def _wake(subscriptions):
+    for subscription in subscriptions:
+        subscription.changed.set()
+
+
+class Hub:
+    """Open streams of this process by student id."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def subscribe(self, student_id):
+        subscription = Subscription(student_id, asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions.setdefault(student_id, set()).add(subscription)
+            self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.student_id, ())
+            if subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self.count -= 1
+                if not subscriptions:
+                    del self.subscriptions[subscription.student_id]
+
+    def deliver(self, student_ids):
+        """Wake the streams of these students (from any thread); returns how many."""
+        by_loop = {}
+        with self.lock:
+            for student_id in student_ids:
+                for subscription in self.subscriptions.get(student_id, ()):
+                    by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_wake, subscriptions)
+            except RuntimeError:  # the loop has closed; its streams are gone
+                pass
+        return sum(len(subscriptions) for subscriptions in by_loop.values())
+
+
+hub = Hub()
+
+
+class Relay:
+    """Forwards published student ids between worker processes (see the module docstring)."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        self.pid = None
+
+    @property
+    def path(self):
+        return self.directory / f'{os.getpid()}.sock'
+
+    def listen(self, hub):
+        """Start receiving into `hub`, once per process."""
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.path.unlink(missing_ok=True)  # left by an earlier process with our pid
+            receiver.bind(str(self.path))
+            self.pid = os.getpid()
+        threading.Thread(target=self._receive, args=(receiver, hub), name='erp-events-relay',
+                         daemon=True).start()
+
+    def _receive(self, receiver, hub):
+        while True:
+            payload = receiver.recv(65536)
+            try:
+                hub.deliver([int(student_id) for student_id in payload.split(b',')])
+            except ValueError:
+                logger.warning('Ignoring malformed events datagram %r', payload[:80])
+
+    def send(self, student_ids):
+        own = self.path if self.pid == os.getpid() else None
+        peers = [path for path in self.directory.glob('*.sock') if path != own]
+        if not peers:
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.settimeout(RELAY_SEND_TIMEOUT)
+            for start in range(0, len(student_ids), RELAY_CHUNK_SIZE):
+                payload = ','.join(map(str, student_ids[start:start + RELAY_CHUNK_SIZE])).encode()
+                for peer in peers:
+                    try:
+                        sender.sendto(payload, str(peer))
+                    except (ConnectionRefusedError, FileNotFoundError):
+                        peer.unlink(missing_ok=True)  # its worker has exited
+                    except OSError as exc:  # e.g. timed out on a backlogged peer
+                        logger.warning('Dropped results events for %s: %s', peer.name, exc)
+
+
+_relay = None
+_relay_lock = threading.Lock()
+
+
+def relay():
+    """The cross-process Relay, or None for a single-process deployment."""
+    global _relay
+    directory = getattr(settings, 'ERP_EVENTS_SOCKET_DIR', '')
+    if not directory:
+        return None
+    if isinstance(caches['default'], LocMemCache):
+        raise ImproperlyConfigured("ERP_EVENTS_SOCKET_DIR needs the cache backend the workers share; "
+                                   "LocMemCache is per process (set ERP_CACHE_BACKEND, see settings.CACHES).")
+    with _relay_lock:
+        if _relay is None or _relay.directory != Path(directory):
+            _relay = Relay(directory)
+        return _relay
+
+
+def publish(student_ids):
+    """Tell every stream of these students, in this and the other workers, to refresh."""
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return
+    hub.deliver(student_ids)
+    peers = relay()
+    if peers is not None:
+        peers.send(student_ids)
+
+
+def publish_on_commit(student_ids):
+    """publish() once the surrounding transaction commits, after the results cache is bumped."""
+    student_ids = set(student_ids)
+    transaction.on_commit(lambda: publish(student_ids))
+
+
+def full():
+    return len(hub) >= getattr(settings, 'ERP_EVENTS_MAX_STREAMS', 10000)
+
+
+_refresh_slots = weakref.WeakKeyDictionary()  # event loop -> Semaphore
+
+
+def _slots():
+    loop = asyncio.get_running_loop()
+    slots = _refresh_slots.get(loop)
+    if slots is None:
+        slots = _refresh_slots[loop] = asyncio.Semaphore(
+            getattr(settings, 'ERP_EVENTS_REFRESH_CONCURRENCY', 8))
+    return slots
+
+
+def message(event, event_id, data):
+    """A server-sent event; `data` is JSON bytes (which never contain a newline)."""
+    return b'id: %s\nevent: %s\ndata: %s\n\n' % (event_id.encode(), event.encode(), data)
+
+
+async def stream(student_id, load, last_event_id=None):
+    """
+    The body of an event stream for `student_id`: a `marks` event with what
+    `load()` returns, an (event id, JSON bytes) pair, now (unless it is still
+    `last_event_id`) and after every change, with keep-alive comments in
+    between. Runs until the client disconnects.
+    """
+    subscription = hub.subscribe(student_id)
+    relayed = relay()
+    if relayed is not None:
+        relayed.listen(hub)
+    heartbeat = getattr(settings, 'ERP_EVENTS_HEARTBEAT_SECONDS', 25)
+    try:
+        yield b'retry: %d\n\n' % random.randint(*RETRY_MS)
+        changed = True
+        while True:
+            if changed:
+                async with _slots():
+                    event_id, data = await load()
+                if event_id != last_event_id:
+                    last_event_id = event_id
+                    yield message('marks', event_id, data)
+            changed = await subscription.wait(heartbeat)
+            if not changed:
+                yield b': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
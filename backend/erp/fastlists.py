@@ -0,0 +1,165 @@
+"""
+Read-only fast path for list endpoints.
+
+A serializer's readable fields are compiled once into a "plan": the ORM
+lookup behind each field (dotted sources become joins, nested serializers
+become prefixed lookups) plus the bound field's own `to_representation`.
+List views then fetch flat `values()` rows and run each value through its
+field's converter, skipping model instances and per-row attribute walks.
+The JSON is byte-for-byte what the serializer would produce; serializers
+using anything values() cannot express (method fields, properties,
+many-to-many, source='*') simply keep the normal path.
+"""
+
+import threading
+
+from django.core.exceptions import FieldError
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _identity(value):
+    return value
+
+
+class FieldPlan:
+    """One output key: where its value comes from and how it is converted."""
+
+    def __init__(self, name, lookup, convert, guards, field):
+        self.name = name
+        self.lookup = lookup
+        self.convert = convert
+        self.guards = guards  # FK lookups that must be non-null for the source to resolve
+        self.field = field
+
+    def missing(self):
+        """DRF's Field.get_attribute() behaviour when a relation on the path is None."""
+        if self.field.default is not empty:
+            return self.field.get_default()
+        if self.field.allow_null:
+            return None
+        if not self.field.required:
+            raise SkipField()
+        raise Unsupported(self.name)
+
+
+class NestedPlan:
+    def __init__(self, name, lookup, plans):
+        self.name = name
+        self.lookup = lookup  # the relation's FK column; None -> null object
+        self.plans = plans
+
+
+def compile_plan(serializer, prefix=''):
+    plans = []
+    for field in serializer._readable_fields:
+        if field.source == '*' or isinstance(field, (ManyRelatedField, serializers.ListSerializer)):
+            raise Unsupported(field.field_name)
+        lookup = prefix + '__'.join(field.source_attrs)
+        if isinstance(field, serializers.BaseSerializer):
+            plans.append(NestedPlan(field.field_name, lookup,
+                                    compile_plan(field, prefix=lookup + '__')))
+            continue
+        if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+            convert = _identity  # values() already yields the key
+        else:
+            convert = field.to_representation
+        guards = [prefix + '__'.join(field.source_attrs[:i]) for i in range(1, len(field.source_attrs))]
+        plans.append(FieldPlan(field.field_name, lookup, convert, guards, field))
+    return plans
+
+
+def _lookups(plans):
+    for plan in plans:
+        if isinstance(plan, NestedPlan):
+            yield plan.lookup
+            yield from _lookups(plan.plans)
+        else:
+            yield plan.lookup
+            yield from plan.guards
+
+
+def _render(plans, row):
+    out = {}
+    for plan in plans:
+        if isinstance(plan, NestedPlan):
+            out[plan.name] = None if row[plan.lookup] is None else _render(plan.plans, row)
+            continue
+        if any(row[guard] is None for guard in plan.guards):
+            try:
+                out[plan.name] = plan.missing()
+            except SkipField:
+                pass
+            continue
+        value = row[plan.lookup]
+        out[plan.name] = None if value is None else plan.convert(value)
+    return out
+
+
+class FlatReader:
+    def __init__(self, plans, lookups):
+        self.plans = plans
+        self.lookups = lookups
+
+    def rows(self, queryset, extra=()):
+        """The flat values() queryset; `extra` adds e.g. pagination ordering columns."""
+        return queryset.values(*dict.fromkeys([*self.lookups, *extra]))
+
+    def render(self, rows):
+        plans = self.plans
+        return [_render(plans, row) for row in rows]
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def flat_reader(serializer, queryset):
+    """
+    A FlatReader for this serializer's (possibly ?fields=-trimmed) field set,
+    or None if it cannot be expressed with values(). Compiled once per field set.
+    """
+    key = (type(serializer), queryset.model, tuple(serializer.fields))
+    try:
+        return _readers[key]
+    except KeyError:
+        pass
+    try:
+        plans = compile_plan(serializer)
+        lookups = list(dict.fromkeys(_lookups(plans)))
+        queryset.values(*lookups)  # resolves every lookup now; FieldError if one is not a column
+        reader = FlatReader(plans, lookups)
+    except (Unsupported, FieldError):
+        reader = None
+    with _readers_lock:
+        _readers[key] = reader
+    return reader
+
+
+class FastListMixin:
+    """
+    ModelViewSet.list() through flat_reader(): same JSON and pagination,
+    without building a model instance per row.
+    """
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        reader = flat_reader(self.get_serializer(), queryset) if self.fast_list else None
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        rows = reader.rows(queryset, extra=[field.lstrip('-') for field in ordering])
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.render(page))
+        return Response(reader.render(rows))
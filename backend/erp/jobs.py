@@ -0,0 +1,275 @@
+"""
+Background jobs without an external broker.
+
+An API request queues a Job row and returns straight away; `manage.py
+run_worker` claims queued jobs and runs them in a process pool, so imports
+and exports that would outlive the proxy timeout run off the request cycle.
+Claiming is a conditional UPDATE (queued -> running) of a single row, so
+any number of worker processes can poll the same database and each job runs
+exactly once. Handlers report progress through the callable they are given.
+
+A claimed job holds a lease that the worker's Heartbeat thread renews every
+third of the lease, however long the handler goes without reporting
+progress. Only a job whose lease has run out, because its worker has died,
+is put back in the queue.
+"""
+
+import csv
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .bulk import BulkResult, admit_students, upsert_marks
+from .exports import COLUMNS as EXPORT_COLUMNS, FILTERS as EXPORT_FILTERS
+from .exports import export_filename, export_queryset, export_rows, write_xlsx
+from .models import Job, Programme
+from .slips import generate as generate_slips
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+IMPORT_BATCH_SIZE = 2000
+PROGRESS_INTERVAL = 1.0  # seconds between progress writes
+LEASE_SECONDS = 60  # how long a running job survives its worker
+
+
+def handler(kind):
+    """Register `func(job, progress)` to run jobs of `kind`; it returns the JSON result."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, params=None, user_id=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}.")
+    return Job.objects.create(kind=kind, params=params or {}, created_by_id=user_id)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def files_dir():
+    path = Path(settings.ERP_JOB_FILES_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def claim(worker, limit=1, lease=LEASE_SECONDS):
+    """
+    Mark up to `limit` of the oldest queued jobs as running for `worker`,
+    leased for `lease` seconds; returns their ids.
+    """
+    claimed = []
+    while len(claimed) < limit:
+        candidates = list(Job.objects.filter(status=Job.QUEUED).order_by('id')
+                          .values_list('id', flat=True)[:limit - len(claimed)])
+        if not candidates:
+            break
+        now = timezone.now()
+        for job_id in candidates:
+            # another worker may have taken it since the SELECT; only one UPDATE matches
+            if Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+                    status=Job.RUNNING, worker=worker, started_at=now, updated_at=now,
+                    lease_expires_at=now + timedelta(seconds=lease)):
+                claimed.append(job_id)
+    return claimed
+
+
+def renew(worker, job_ids, lease=LEASE_SECONDS):
+    """Extend the leases of `worker`'s running jobs among `job_ids`; returns how many."""
+    return Job.objects.filter(pk__in=job_ids, status=Job.RUNNING, worker=worker).update(
+        lease_expires_at=timezone.now() + timedelta(seconds=lease))
+
+
+def requeue_expired():
+    """Put back running jobs whose lease has run out (their worker died)."""
+    now = timezone.now()
+    expired = Q(lease_expires_at__lt=now) | Q(lease_expires_at__isnull=True)
+    return Job.objects.filter(expired, status=Job.RUNNING).update(
+        status=Job.QUEUED, worker='', progress=0, lease_expires_at=None, updated_at=now)
+
+
+class Heartbeat(threading.Thread):
+    """
+    Renews the leases of the jobs in `job_ids` every third of `lease` until
+    stopped, from its own thread and database connection, so a handler that
+    reports progress rarely (or never) keeps its job.
+    """
+
+    def __init__(self, worker, lease=LEASE_SECONDS):
+        super().__init__(name='erp-jobs-heartbeat', daemon=True)
+        self.worker = worker
+        self.lease = lease
+        self.job_ids = set()
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.lease / 3):
+                self.beat()
+        finally:
+            connections.close_all()
+
+    def beat(self):
+        job_ids = list(self.job_ids)
+        if not job_ids:
+            return
+        try:
+            renew(self.worker, job_ids, self.lease)
+        except DatabaseError:  # e.g. the database was locked; two more tries before the lease ends
+            logger.exception('Could not renew the leases of jobs %s', job_ids)
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+
+class Progress:
+    """`progress(done, total=None)` for handlers; writes at most once per PROGRESS_INTERVAL."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.done = 0
+        self.total = None
+        self.written_at = 0.0
+
+    def __call__(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if time.monotonic() - self.written_at >= PROGRESS_INTERVAL:
+            self.write()
+
+    def write(self):
+        self.written_at = time.monotonic()
+        Job.objects.filter(pk=self.job_id).update(progress=self.done, total=self.total,
+                                                  updated_at=timezone.now())
+
+
+def run_job(job_id):
+    """Run a claimed job in this process and record the outcome; returns the final status."""
+    job = Job.objects.get(pk=job_id)
+    progress = Progress(job.pk)
+    try:
+        result = HANDLERS[job.kind](job, progress)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        fail(job.pk, exc)
+        return Job.FAILED
+    except BaseException as exc:
+        # interrupted (KeyboardInterrupt, SystemExit): record it rather than leave the job
+        # running until its lease runs out; an admission has already dropped its rows
+        fail(job.pk, exc)
+        raise
+    now = timezone.now()
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.SUCCEEDED, result=result, progress=progress.done, total=progress.total,
+        finished_at=now, updated_at=now)
+    return Job.SUCCEEDED
+
+
+def fail(job_id, exc):
+    now = timezone.now()
+    Job.objects.filter(pk=job_id).update(status=Job.FAILED, error=f'{type(exc).__name__}: {exc}',
+                                         finished_at=now, updated_at=now)
+
+
+def execute(job_id):
+    """Process-pool entry point (the pool's initializer, processes.setup_child, has run django.setup())."""
+    try:
+        return run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+# ─── Handlers ────────────────────────────────────────────────────────────────
+@handler('import_marks')
+def import_marks(job, progress):
+    """Upsert `params['rows']` (see upsert_marks) in batches, one transaction each."""
+    rows = job.params.get('rows') or []
+    result = BulkResult()
+    progress(0, len(rows))
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        batch = upsert_marks(rows[start:start + IMPORT_BATCH_SIZE])
+        result.created += batch.created
+        result.updated += batch.updated
+        for error in batch.errors:
+            result.add_error(error['row'] + start, error['errors'])
+        progress(min(start + IMPORT_BATCH_SIZE, len(rows)))
+    return result.as_dict()
+
+
+@handler('admit_students')
+def admit_intake(job, progress):
+    """admit_students() for `params['rows']`; the rows (with passwords) are cleared afterwards."""
+    rows = job.params.get('rows') or []
+    progress(0, len(rows))
+    try:
+        result = admit_students(rows, processes=job.params.get('processes'))
+    finally:
+        Job.objects.filter(pk=job.pk).update(params={})
+    progress(len(rows))
+    return result.as_dict()
+
+
+@handler('export_marks')
+def export_marks(job, progress):
+    """Write the marks sheet for `params` (export filters, `type`) to ERP_JOB_FILES_DIR."""
+    # ids and numbers only; params from POST /api/jobs/ haven't been through the export view
+    filters = {key: int(job.params[key]) for key in EXPORT_FILTERS if job.params.get(key)}
+    extension = 'xlsx' if job.params.get('type') == 'xlsx' else 'csv'
+    total = export_queryset(filters).count()
+    progress(0, total)
+
+    def counted(rows):
+        for done, row in enumerate(rows, start=1):
+            if done % 1000 == 0:
+                progress(done)
+            yield row
+        progress(total)
+
+    path = files_dir() / f'job-{job.pk}.{extension}'
+    try:
+        if extension == 'xlsx':
+            with open(path, 'wb') as output:
+                write_xlsx(counted(export_rows(filters)), output)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as output:
+                writer = csv.writer(output)
+                writer.writerow([name for name, _ in EXPORT_COLUMNS])
+                writer.writerows(counted(export_rows(filters)))
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return {'file': path.name, 'filename': export_filename(filters, extension), 'rows': total}
+
+
+@handler('results_slips')
+def results_slips(job, progress):
+    """A zip of results slips for `params` programme/year/semester (`format`: html or pdf)."""
+    scope = {key: job.params.get(key) for key in ('programme', 'year', 'semester')}
+    fmt = 'pdf' if job.params.get('format') == 'pdf' else 'html'
+    path = files_dir() / f'job-{job.pk}.zip'
+    try:
+        summary = generate_slips(scope, path, fmt=fmt, processes=job.params.get('processes'),
+                                 progress=progress)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    programme = Programme.objects.filter(pk=scope['programme']).values_list('code', flat=True).first()
+    parts = ['slips', programme] + [f'{key[0]}{scope[key]}' for key in ('year', 'semester') if scope[key]]
+    return {'file': path.name, 'filename': '-'.join(filter(None, parts)) + '.zip', **summary}
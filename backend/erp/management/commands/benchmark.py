@@ -0,0 +1,44 @@
+"""
+Management command to run the API benchmarks in erp/benchmarks.py.
+
+Usage:
+    python manage.py benchmark mark_upload
+    python manage.py benchmark mark_upload --size 2000
+    python manage.py benchmark api --size 10000 --requests 500 --output bench.json
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from erp.benchmarks import SCENARIOS, run
+
+
+class Command(BaseCommand):
+    help = "Run a benchmark scenario against a rolled-back copy of the data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=sorted(SCENARIOS))
+        parser.add_argument(
+            "--size",
+            type=int,
+            help="Scenario size (rows, students, ...); see the scenario docstring.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            help="Requests per endpoint, for scenarios that drive the API.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results as JSON to this file so runs can be compared.",
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {key: options[key] for key in ("size", "requests") if options[key]}
+        self.stdout.write(f"Running {options['scenario']}...")
+        results = run(options["scenario"], self.stdout, **kwargs)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump({"scenario": options["scenario"], "results": results}, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
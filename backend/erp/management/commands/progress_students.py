@@ -0,0 +1,60 @@
+"""
+Management command for year-end progression (see erp/progression.py).
+
+Usage:
+    python manage.py progress_students --programme 3                  # dry run: report only
+    python manage.py progress_students --programme 3 --year 2 --csv progression.csv
+    python manage.py progress_students --programme 3 --apply          # promote passing students
+"""
+
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from erp import progression
+from erp.models import Programme
+
+CSV_COLUMNS = ['student', 'reg_number', 'year_of_study', 'status', 'units', 'passed', 'failed', 'missing']
+
+
+class Command(BaseCommand):
+    help = "Report pass/supplementary/fail status for a programme's students and optionally promote."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programme', type=int, required=True, help='Programme id.')
+        parser.add_argument('--year', type=int, help='Only students now in this year of study.')
+        parser.add_argument('--apply', action='store_true',
+                            help='Promote passing students (default: dry run).')
+        parser.add_argument('--csv', help='Write every student\'s status to this CSV file.')
+
+    def handle(self, *args, **options):
+        programme = Programme.objects.filter(pk=options['programme']).first()
+        if programme is None:
+            raise CommandError(f"Programme {options['programme']} does not exist.")
+        started = time.perf_counter()
+        if options['apply']:
+            result = progression.promote(programme, options['year'])
+        else:
+            result = progression.report(programme, options['year'])
+        elapsed = time.perf_counter() - started
+
+        if options['csv']:
+            with open(options['csv'], 'w', newline='', encoding='utf-8') as output:
+                writer = csv.DictWriter(output, fieldnames=CSV_COLUMNS)
+                writer.writeheader()
+                writer.writerows(result['students'])
+
+        counts = result['counts']
+        self.stdout.write(
+            f"{programme.code}: {len(result['students'])} students — "
+            f"pass {counts['pass']} ({result['promotable']} to promote, "
+            f"{result['completing']} completing), supplementary {counts['supplementary']}, "
+            f"fail {counts['fail']}, incomplete {counts['incomplete']}"
+        )
+        if options['apply']:
+            self.stdout.write(self.style.SUCCESS(
+                f"✔  {result['promoted']} students promoted in {elapsed:.2f}s."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✔  Dry run in {elapsed:.2f}s; run with --apply to promote."))
@@ -0,0 +1,21 @@
+"""
+Management command to delete mark tombstones past ERP_TOMBSTONE_RETENTION_DAYS.
+
+Usage:
+    python manage.py purge_tombstones
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from erp import changes
+
+
+class Command(BaseCommand):
+    help = "Delete change-feed delete records older than the retention period."
+
+    def handle(self, *args, **options):
+        count = changes.purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f"✔  {count} tombstones older than {settings.ERP_TOMBSTONE_RETENTION_DAYS} days purged."
+        ))
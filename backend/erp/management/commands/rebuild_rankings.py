@@ -0,0 +1,23 @@
+"""
+Management command to recompute every cohort ranking from the marks table.
+
+Usage:
+    python manage.py rebuild_rankings
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from erp import rankings
+
+
+class Command(BaseCommand):
+    help = "Recompute all student standings and cohort ranks from scratch."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rankings.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"✔  {count} standings rebuilt in {time.perf_counter() - started:.2f}s."
+        ))
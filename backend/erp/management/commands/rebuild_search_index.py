@@ -0,0 +1,23 @@
+"""
+Management command to re-index every student's name for `?q=` search.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from erp import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the student name search index from the users table."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"✔  {count} students indexed in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,124 @@
+"""
+Management command that runs queued background jobs (see erp/jobs.py).
+
+Usage:
+    python manage.py run_worker                  # one process per CPU, runs until stopped
+    python manage.py run_worker --processes 2
+    python manage.py run_worker --burst          # exit once the queue is empty
+    python manage.py run_worker --processes 0    # run jobs in this process (debugging)
+
+Jobs invalidate cached results as they write, so the worker refuses to
+start with a per-process cache (LocMemCache) that the web processes would
+never see; point ERP_CACHE_BACKEND at the shared backend they use.
+"""
+
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from erp import jobs
+from erp.processes import setup_child
+
+
+class Command(BaseCommand):
+    help = "Claim queued jobs from the database and run them in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (0 runs jobs inline).')
+        parser.add_argument('--poll', type=float, default=2.0,
+                            help='Seconds between queue polls when idle.')
+        parser.add_argument('--lease', type=int, default=jobs.LEASE_SECONDS,
+                            help='Seconds a running job is leased for; renewed every third of it. '
+                                 'Jobs whose worker stops renewing are requeued after this.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit when there are no queued or running jobs left.')
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            raise CommandError("run_worker needs the cache backend the web processes share; "
+                               "LocMemCache is per process (set ERP_CACHE_BACKEND, see settings.CACHES).")
+        self.stopping = False
+        previous = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+        self.worker = jobs.worker_name()
+        self.stdout.write(f"Worker {self.worker} started ({options['processes'] or 'inline'}).")
+        self.heartbeat = jobs.Heartbeat(self.worker, options['lease'])
+        self.heartbeat.start()
+        try:
+            if options['processes'] == 0:
+                self.run_inline(options)
+            else:
+                finished = False
+                while not finished:
+                    # no connection may be shared with the children
+                    connections.close_all()
+                    with ProcessPoolExecutor(max_workers=options['processes'],
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=setup_child) as pool:
+                        finished = self.run_pool(pool, options)
+        finally:
+            self.heartbeat.stop()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f"✔  Worker {self.worker} stopped."))
+
+    def stop(self, signum, frame):
+        self.stdout.write("Finishing running jobs, then stopping...")
+        self.stopping = True
+
+    def run_inline(self, options):
+        while not self.stopping:
+            jobs.requeue_expired()
+            claimed = jobs.claim(self.worker, lease=options['lease'])
+            if not claimed:
+                if options['burst']:
+                    return
+                time.sleep(options['poll'])
+                continue
+            self.heartbeat.job_ids.add(claimed[0])
+            try:
+                status = jobs.run_job(claimed[0])
+            finally:
+                self.heartbeat.job_ids.discard(claimed[0])
+            self.report(claimed[0], status)
+
+    def run_pool(self, pool, options):
+        """Feed the pool until stopped; False if a child died and the pool must be replaced."""
+        running = {}
+        broken = False
+        while running or not (self.stopping or broken):
+            if not (self.stopping or broken):
+                jobs.requeue_expired()
+                for job_id in jobs.claim(self.worker, options['processes'] - len(running),
+                                         options['lease']):
+                    self.heartbeat.job_ids.add(job_id)
+                    running[pool.submit(jobs.execute, job_id)] = job_id
+            if not running:
+                if options['burst']:
+                    return True
+                time.sleep(options['poll'])
+                continue
+            done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+            for future in done:
+                job_id = running.pop(future)
+                self.heartbeat.job_ids.discard(job_id)
+                try:
+                    status = future.result()
+                except BrokenProcessPool as exc:
+                    # a child was killed (e.g. out of memory); every job in the pool is lost
+                    jobs.fail(job_id, exc)
+                    status, broken = 'failed', True
+                self.report(job_id, status)
+        return not broken
+
+    def report(self, job_id, status):
+        style = self.style.SUCCESS if status == 'succeeded' else self.style.ERROR
+        self.stdout.write(style(f"job {job_id}: {status}"))
@@ -5,10 +5,14 @@ Usage:
     python manage.py seed_data
     python manage.py seed_data --clear     # wipe existing data first
     python manage.py seed_data --minimal   # admin + 2 students only
+    python manage.py seed_data --students 100000 --marks-per-student 20 \
+        --programmes 8 --random-seed 1       # synthetic load-test dataset
 """
 
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from erp import rankings, synthetic
+from erp.catalogue import get_catalogue
 from erp.models import User, Programme, Student, Unit, Mark
 
 
@@ -169,6 +173,34 @@ class Command(BaseCommand):
             action="store_true",
             help="Seed admin + 2 students only (no marks).",
         )
+        parser.add_argument(
+            "--students",
+            type=int,
+            help="Generate this many synthetic students instead of the sample data.",
+        )
+        parser.add_argument(
+            "--marks-per-student",
+            type=int,
+            default=16,
+            help="Synthetic mode: marks per student (units per year of study).",
+        )
+        parser.add_argument(
+            "--programmes",
+            type=int,
+            default=4,
+            help="Synthetic mode: number of programmes to spread students over.",
+        )
+        parser.add_argument(
+            "--random-seed",
+            type=int,
+            help="Synthetic mode: seed for reproducible datasets.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Synthetic mode: students written per bulk insert batch.",
+        )
 
     @transaction.atomic
     def handle(self, *args, **options):
@@ -204,42 +236,42 @@ class Command(BaseCommand):
             self._done()
             return
 
+        if options["students"]:
+            self._seed_synthetic(options)
+            return
+
         # ── Programmes ────────────────────────────────────────────────────────
+        # existence checks read the in-process catalogue, not one query per code
         self.stdout.write("\n📋 Seeding programmes...")
-        prog_map = {}
+        catalogue = get_catalogue()
+        prog_map = {}  # code → programme id
         for p in PROGRAMMES:
-            obj, created = Programme.objects.get_or_create(
-                code=p["code"],
-                defaults={
-                    "name": p["name"],
-                    "duration_years": p["duration_years"],
-                    "has_semester_3": p["has_semester_3"],
-                },
-            )
-            prog_map[p["code"]] = obj
+            obj = catalogue.programmes_by_code.get(p["code"])
+            created = obj is None
+            if created:
+                obj = Programme.objects.create(
+                    code=p["code"],
+                    name=p["name"],
+                    duration_years=p["duration_years"],
+                    has_semester_3=p["has_semester_3"],
+                )
+            prog_map[p["code"]] = obj.id
             status = "created" if created else "exists "
             self.stdout.write(f"  [{status}]  {obj.code}  —  {obj.name}")
 
         # ── Units ─────────────────────────────────────────────────────────────
         self.stdout.write("\n📚 Seeding units...")
-        unit_map = {}  # code → Unit
+        catalogue = get_catalogue()
         total_units = 0
         for prog_code, units in UNITS.items():
-            programme = prog_map[prog_code]
             for (code, name, year, semester) in units:
-                obj, created = Unit.objects.get_or_create(
-                    code=code,
-                    defaults={
-                        "name": name,
-                        "programme": programme,
-                        "year": year,
-                        "semester": semester,
-                    },
-                )
-                unit_map[code] = obj
-                if created:
+                if code not in catalogue.units_by_code:
+                    Unit.objects.create(code=code, name=name, programme_id=prog_map[prog_code],
+                                        year=year, semester=semester)
                     total_units += 1
-        self.stdout.write(self.style.SUCCESS(f"  ✔  {total_units} units created ({len(unit_map)} total)."))
+        catalogue = get_catalogue()
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✔  {total_units} units created ({len(catalogue.units)} total)."))
 
         # ── Students ──────────────────────────────────────────────────────────
         self.stdout.write("\n🎓 Seeding students...")
@@ -262,7 +294,7 @@ class Command(BaseCommand):
                 reg_number=reg_no,
                 defaults={
                     "user": user,
-                    "programme": prog_map[prog_code],
+                    "programme_id": prog_map[prog_code],
                     "year_of_study": year,
                     "phone": f"+2547{reg_no[-7:].replace('/', ''):0>8}"[:13],
                 },
@@ -275,10 +307,7 @@ class Command(BaseCommand):
         self.stdout.write("\n📊 Seeding marks...")
         marks_created = 0
         for idx, (student, prog_code, year_of_study) in enumerate(student_objects):
-            student_units = [
-                u for u in unit_map.values()
-                if u.programme.code == prog_code and u.year <= year_of_study
-            ]
+            student_units = catalogue.programme_units(prog_map[prog_code], year_of_study)
             # rotate through the marks template so each student gets varied scores
             for unit_idx, unit in enumerate(student_units):
                 cat, exam = MARKS_TEMPLATE[(idx + unit_idx) % len(MARKS_TEMPLATE)]
@@ -287,7 +316,7 @@ class Command(BaseCommand):
                 exam_var = max(0, min(70, exam + (idx % 5) - 2))
                 _, created = Mark.objects.get_or_create(
                     student=student,
-                    unit=unit,
+                    unit_id=unit.id,
                     defaults={"cat_score": cat_var, "exam_score": exam_var},
                 )
                 if created:
@@ -321,6 +350,37 @@ class Command(BaseCommand):
             )
             self.stdout.write(f"  ✔  {reg_no} — {first} {last}")
 
+    def _seed_synthetic(self, options):
+        """Bulk-generate a large synthetic dataset for capacity testing."""
+        total = options["students"]
+        self.stdout.write(
+            f"\n🏭 Synthetic mode: {total} students × {options['marks_per_student']} marks "
+            f"over {options['programmes']} programmes (seed={options['random_seed']})..."
+        )
+
+        def progress(students, marks, elapsed):
+            self.stdout.write(
+                f"  {students:>9}/{total} students  {marks:>10} marks  "
+                f"{elapsed:7.1f}s  ({students / elapsed:,.0f} students/s)"
+            )
+
+        summary = synthetic.generate(
+            total,
+            marks_per_student=options["marks_per_student"],
+            programmes=options["programmes"],
+            seed=options["random_seed"],
+            batch_size=options["batch_size"],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✔  {summary['students']} students, {summary['marks']} marks, "
+            f"{summary['units']} units in {summary['seconds']}s "
+            f"({summary['marks_per_sec']:,} marks/s)."
+        ))
+        # bulk inserts bypass the mark signals, so rank everyone in one pass
+        self.stdout.write(f"  ✔  {rankings.rebuild()} cohort standings ranked.")
+        self.stdout.write(f"  All synthetic students use password: {synthetic.SYNTHETIC_PASSWORD}")
+
     def _done(self):
         self.stdout.write("\n" + "─" * 55)
         self.stdout.write(self.style.SUCCESS("🎉  Seed complete!\n"))
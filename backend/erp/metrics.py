@@ -0,0 +1,88 @@
+"""
+In-process request metrics, rendered in the Prometheus text format.
+
+Metrics are kept per worker process; scrape each worker (or run a single
+worker) when aggregating. See erp/middleware.py for what gets recorded.
+"""
+
+import threading
+from collections import defaultdict
+
+from .cache import stats as cache_stats
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.total}')
+        return lines
+
+
+class Registry:
+    HISTOGRAMS = {
+        'erp_request_duration_seconds': ('Wall time per request.', DURATION_BUCKETS),
+        'erp_request_db_seconds': ('Time spent in SQL per request.', DURATION_BUCKETS),
+        'erp_request_render_seconds': ('Time spent rendering the response body.', DURATION_BUCKETS),
+        'erp_request_queries': ('SQL queries per request.', QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {name: defaultdict(lambda b=buckets: Histogram(b))
+                           for name, (_, buckets) in self.HISTOGRAMS.items()}
+        self.n_plus_one = defaultdict(int)
+
+    def record(self, view, method, duration, db_time, render_time, queries, n_plus_one):
+        key = (view, method)
+        with self.lock:
+            self.histograms['erp_request_duration_seconds'][key].observe(duration)
+            self.histograms['erp_request_db_seconds'][key].observe(db_time)
+            self.histograms['erp_request_render_seconds'][key].observe(render_time)
+            self.histograms['erp_request_queries'][key].observe(queries)
+            if n_plus_one:
+                self.n_plus_one[key] += 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (view, method), histogram in sorted(self.histograms[name].items()):
+                    lines += histogram.render(name, f'view="{view}",method="{method}"')
+            lines += ['# HELP erp_request_n_plus_one_total Requests repeating one SQL '
+                      'template more than ERP_NPLUSONE_THRESHOLD times.',
+                      '# TYPE erp_request_n_plus_one_total counter']
+            for (view, method), count in sorted(self.n_plus_one.items()):
+                lines.append(f'erp_request_n_plus_one_total{{view="{view}",method="{method}"}} {count}')
+        lines += ['# HELP erp_cache_events_total Versioned cache hits and misses.',
+                  '# TYPE erp_cache_events_total counter']
+        for key, count in sorted(cache_stats.items()):
+            namespace, _, event = key.rpartition('_')
+            lines.append(f'erp_cache_events_total{{namespace="{namespace}",event="{event}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
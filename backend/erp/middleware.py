@@ -0,0 +1,87 @@
+"""
+Opt-in request instrumentation. Enable with ERP_REQUEST_METRICS=1 (see
+settings.py); it adds a Server-Timing header to every response and feeds
+the per-view histograms served by GET /api/_metrics/.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries, SQL time and repeats per template."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.templates = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.templates[sql] += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Records SQL query count, SQL time, render time and wall time for each
+    request. A request that runs the same SQL template more than
+    ERP_NPLUSONE_THRESHOLD times is logged as a likely N+1.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.n_plus_one_threshold = getattr(settings, 'ERP_NPLUSONE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._metrics_render = [None, None]
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        render_started, render_finished = request._metrics_render
+        render_time = (render_finished - render_started) if render_finished else 0.0
+        app_time = max(duration - recorder.duration - render_time, 0.0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"',
+            f'app;dur={app_time * 1000:.2f}',
+            f'render;dur={render_time * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ])
+
+        view = request.resolver_match.view_name if request.resolver_match else 'unmatched'
+        repeated = {sql: n for sql, n in recorder.templates.items() if n > self.n_plus_one_threshold}
+        for sql, n in repeated.items():
+            logger.warning('Possible N+1 on %s %s: %d× %s', request.method, view, n, sql[:200])
+        registry.record(view, request.method, duration, recorder.duration, render_time,
+                        recorder.count, n_plus_one=bool(repeated))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render after this hook, so bracket the render here.
+        request._metrics_render[0] = time.perf_counter()
+        response.add_post_render_callback(self._render_finished(request))
+        return response
+
+    @staticmethod
+    def _render_finished(request):
+        def callback(response):
+            request._metrics_render[1] = time.perf_counter()
+        return callback
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:08
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mark',
+            name='grade',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(django.db.models.lookups.GreaterThanOrEqual(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('cat_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6)), '+', django.db.models.functions.comparison.Coalesce('exam_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6))), 70), then=models.Value('A')), models.When(django.db.models.lookups.GreaterThanOrEqual(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('cat_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6)), '+', django.db.models.functions.comparison.Coalesce('exam_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6))), 60), then=models.Value('B')), models.When(django.db.models.lookups.GreaterThanOrEqual(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('cat_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6)), '+', django.db.models.functions.comparison.Coalesce('exam_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6))), 50), then=models.Value('C')), models.When(django.db.models.lookups.GreaterThanOrEqual(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('cat_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6)), '+', django.db.models.functions.comparison.Coalesce('exam_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6))), 40), then=models.Value('D')), default=models.Value('E')), output_field=models.CharField(max_length=1)),
+        ),
+        migrations.AddField(
+            model_name='mark',
+            name='total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('cat_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6)), '+', django.db.models.functions.comparison.Coalesce('exam_score', models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=6))), output_field=models.DecimalField(decimal_places=2, max_digits=6)),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0002_mark_total_grade_generated'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['unit', 'total'], name='mark_unit_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['unit', 'grade'], name='mark_unit_grade_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['programme', 'year_of_study'], name='student_cohort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['programme', 'year', 'semester'], name='unit_prog_year_sem_idx'),
+        ),
+    ]
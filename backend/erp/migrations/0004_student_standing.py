@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0003_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentStanding',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='standing', serialize=False, to='erp.student')),
+                ('year_of_study', models.IntegerField()),
+                ('unit_count', models.IntegerField()),
+                ('total_sum', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mean_total', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('rank', models.IntegerField(null=True)),
+                ('cohort_size', models.IntegerField(default=0)),
+                ('programme', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='erp.programme')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['programme', 'year_of_study', '-mean_total'], name='standing_cohort_mean_idx')],
+            },
+        ),
+    ]
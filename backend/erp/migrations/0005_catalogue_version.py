@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:28
+
+from django.db import migrations, models
+
+
+def create_stamp(apps, schema_editor):
+    apps.get_model('erp', 'CatalogueVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0004_student_standing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_stamp, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:10
+
+from django.db import migrations
+
+# see erp/search.py; other vendors search with icontains lookups instead
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE erp_student_search USING fts5("
+    "first_name, last_name, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')",
+    "CREATE VIRTUAL TABLE erp_student_search_terms USING fts5vocab(erp_student_search, 'row')",
+    "INSERT INTO erp_student_search (rowid, first_name, last_name) "
+    "SELECT s.id, u.first_name, u.last_name FROM erp_student s JOIN erp_user u ON u.id = s.user_id",
+]
+DROP_SQL = [
+    "DROP TABLE erp_student_search_terms",
+    "DROP TABLE erp_student_search",
+]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0006_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
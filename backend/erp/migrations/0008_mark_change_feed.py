@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0007_student_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarkTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mark_id', models.BigIntegerField()),
+                ('student_id', models.BigIntegerField()),
+                ('unit_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['uploaded_at', 'id'], name='mark_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marktombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_feed_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -28,6 +31,12 @@ class Student(models.Model):
     phone = models.CharField(max_length=15, blank=True)
     date_registered = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # cohort lookups: everyone in a programme and year of study
+            models.Index(fields=['programme', 'year_of_study'], name='student_cohort_idx'),
+        ]
+
     def __str__(self):
         return f"{self.reg_number} - {self.user.get_full_name()}"
 
@@ -39,34 +48,176 @@ class Unit(models.Model):
     year = models.IntegerField()  # 1 or 2
     semester = models.IntegerField()  # 1, 2, or 3
 
+    class Meta:
+        indexes = [
+            # UnitViewSet filters on programme + year + semester
+            models.Index(fields=['programme', 'year', 'semester'], name='unit_prog_year_sem_idx'),
+        ]
+
     def __str__(self):
         return f"{self.code} - {self.name} (Y{self.year}S{self.semester})"
 
 
+SCORE_FIELD = models.DecimalField(max_digits=6, decimal_places=2)
+MARK_TOTAL = (
+    Coalesce('cat_score', models.Value(0), output_field=SCORE_FIELD)
+    + Coalesce('exam_score', models.Value(0), output_field=SCORE_FIELD)
+)
+# (grade, lowest total for that grade); anything below 40 is an E.
+GRADE_BOUNDARIES = (('A', 70), ('B', 60), ('C', 50), ('D', 40))
+
+
 class Mark(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='marks')
     unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='marks')
     cat_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     exam_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now=True)
+    # Stored generated columns, so totals and grades can be filtered, sorted,
+    # indexed and aggregated in SQL. Missing scores count as 0.
+    total = models.GeneratedField(
+        expression=MARK_TOTAL,
+        output_field=models.DecimalField(max_digits=6, decimal_places=2),
+        db_persist=True,
+    )
+    grade = models.GeneratedField(
+        expression=models.Case(
+            *(models.When(GreaterThanOrEqual(MARK_TOTAL, floor), then=models.Value(letter))
+              for letter, floor in GRADE_BOUNDARIES),
+            default=models.Value('E'),
+        ),
+        output_field=models.CharField(max_length=1),
+        db_persist=True,
+    )
 
     class Meta:
-        unique_together = ('student', 'unit')
+        unique_together = ('student', 'unit')  # also serves per-student lookups
+        indexes = [
+            # per-unit reports: marks sheets, ?grade= filters, sorted totals
+            models.Index(fields=['unit', 'total'], name='mark_unit_total_idx'),
+            models.Index(fields=['unit', 'grade'], name='mark_unit_grade_idx'),
+            # the change feed reads marks in (uploaded_at, id) order after a cursor
+            models.Index(fields=['uploaded_at', 'id'], name='mark_feed_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        mark = super().from_db(db, field_names, values)
+        # the student and unit it was loaded with, so a save that moves the
+        # mark elsewhere can refresh both old and new (see erp/signals.py)
+        mark.loaded_student_id = mark.__dict__.get('student_id')
+        mark.loaded_unit_id = mark.__dict__.get('unit_id')
+        return mark
 
-    @property
-    def total(self):
-        cat = self.cat_score or 0
-        exam = self.exam_score or 0
-        return float(cat) + float(exam)
+    def __str__(self):
+        return f"{self.student.reg_number} - {self.unit.code}: {self.total}"
+
+
+class MarkTombstone(models.Model):
+    """
+    Left behind by a deleted Mark so the change feed (erp/changes.py) can
+    report the delete. The ids are plain integers: the rows may be gone.
+    """
+    mark_id = models.BigIntegerField()
+    student_id = models.BigIntegerField()
+    unit_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['deleted_at', 'id'], name='tombstone_feed_idx')]
+
+    def __str__(self):
+        return f"mark {self.mark_id} deleted {self.deleted_at:%Y-%m-%d %H:%M:%S}"
+
+
+class StudentStanding(models.Model):
+    """
+    Per-student aggregate of mark totals and the student's rank within their
+    cohort (programme + year of study). Maintained by erp/rankings.py.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='standing')
+    programme = models.ForeignKey(Programme, on_delete=models.CASCADE, null=True)
+    year_of_study = models.IntegerField()
+    unit_count = models.IntegerField()
+    total_sum = models.DecimalField(max_digits=10, decimal_places=2)
+    mean_total = models.DecimalField(max_digits=6, decimal_places=2)
+    rank = models.IntegerField(null=True)  # 1 = highest mean in the cohort
+    cohort_size = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # the ranking window partitions by cohort and orders by mean
+            models.Index(fields=['programme', 'year_of_study', '-mean_total'],
+                         name='standing_cohort_mean_idx'),
+        ]
 
     @property
-    def grade(self):
-        t = self.total
-        if t >= 70: return 'A'
-        if t >= 60: return 'B'
-        if t >= 50: return 'C'
-        if t >= 40: return 'D'
-        return 'E'
+    def percentile(self):
+        """Share of the cohort ranked at or below this student, 100 for the top."""
+        if self.rank is None:
+            return None
+        if self.cohort_size <= 1:
+            return 100.0
+        return round(100 * (self.cohort_size - self.rank) / (self.cohort_size - 1), 1)
+
+    def __str__(self):
+        return f"{self.student_id}: {self.mean_total} (#{self.rank}/{self.cohort_size})"
+
+
+class CatalogueVersion(models.Model):
+    """
+    Single-row change stamp for the programme/unit catalogue, bumped by the
+    Programme and Unit signals. Catalogue responses use it as their ETag and
+    Last-Modified, so revalidating costs one primary-key lookup.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).first() or cls.objects.get_or_create(pk=1)[0]
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(version=models.F('version') + 1,
+                                                updated_at=timezone.now()):
+            cls.objects.get_or_create(pk=1)
+
+    def __str__(self):
+        return f"catalogue v{self.version} ({self.updated_at:%Y-%m-%d %H:%M:%S})"
+
+
+class Job(models.Model):
+    """
+    A long-running registry operation (mark import, export, ...) queued by an
+    API request and run by `manage.py run_worker`. See erp/jobs.py.
+    """
+    QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+    STATUS_CHOICES = ((QUEUED, 'Queued'), (RUNNING, 'Running'),
+                      (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed'))
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # renewed by the worker while the job runs; an expired lease means the worker died
+    lease_expires_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # workers claim the oldest queued job
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.student.reg_number} - {self.unit.code}: {self.total}"
\ No newline at end of file
+        return f"job {self.pk} {self.kind} ({self.status})"
@@ -0,0 +1,39 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the primary key. Each page is a `WHERE id > ?
+    ORDER BY id LIMIT n` range read, so page 1000 costs the same as page 1.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'id'
+
+
+class SearchPagination(LimitOffsetPagination):
+    """
+    Limit/offset pages of ranked search results (`?q=`). There is no total
+    count, which would mean evaluating every match; one extra row is read
+    to tell whether there is a next page.
+    """
+    default_limit = 20
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        page = list(queryset[self.offset:self.offset + self.limit + 1])
+        # get_next_link() stops at self.count
+        self.count = self.offset + len(page)
+        return page[:self.limit]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
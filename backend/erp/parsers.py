@@ -0,0 +1,71 @@
+import csv
+import io
+import re
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser, get_encoding
+from rest_framework.utils import json
+
+from .renderers import FastJSONRenderer, orjson
+
+# orjson turns integers beyond 64 bits into floats; leave those bodies to the stdlib
+LONG_INTEGER = re.compile(rb'\d{20}')
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a `text/csv` body into a list of dicts keyed by the header row.
+    Empty cells become None so optional fields validate the same way as a
+    JSON null.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        return read_csv_bytes(stream.read(), parser_context.get('encoding', 'utf-8'))
+
+
+def read_csv_bytes(data, encoding='utf-8'):
+    """read_csv_rows() for undecoded CSV, e.g. an uploaded file."""
+    try:
+        text = data.decode(encoding)
+    except UnicodeDecodeError as exc:
+        raise ParseError(f"CSV parse error - {exc}")
+    return read_csv_rows(text)
+
+
+def read_csv_rows(text):
+    """Turn CSV text (with a header row) into a list of row dicts."""
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    if not reader.fieldnames:
+        raise ParseError("CSV is empty or has no header row.")
+    return [
+        {key.strip(): (value.strip() or None) if value is not None else None
+         for key, value in row.items() if key}
+        for row in reader
+    ]
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser through orjson for UTF-8 bodies. Anything orjson rejects, or
+    would parse differently, goes through the stdlib, so accepted input and
+    error messages stay exactly those of JSONParser.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = get_encoding(parser_context or {})
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if not LONG_INTEGER.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        try:
+            parse_constant = json.strict_constant if self.strict else None
+            return json.loads(body.decode(encoding), parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
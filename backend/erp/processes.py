@@ -0,0 +1,19 @@
+"""
+Initializer for the spawned process pools (run_worker, password hashing,
+results slips). It imports no models, so a fresh child can unpickle it
+before django.setup() has run.
+"""
+
+import signal
+
+import django
+
+
+def setup_child():
+    """
+    Ignore Ctrl-C, which the terminal sends to the whole process group: the
+    parent decides what an interrupt means (run_worker lets running jobs
+    finish, a command shuts its pool down), then set up Django.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
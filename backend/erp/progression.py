@@ -0,0 +1,106 @@
+"""
+Year-end progression: which students move up a year of study.
+
+A student passes their year when every unit of their programme for their
+current `year_of_study` has a mark with a total of at least PASS_MARK.
+Failing no more than SUPPLEMENTARY_SHARE of those units means sitting
+supplementary examinations; failing more means repeating the year, and a
+unit with no mark yet leaves the student `incomplete`.
+
+`report()` classifies a whole programme with two aggregate queries, the
+number of units per year (Unit) and each student's passed and failed marks
+among their current year's units (Mark), however many students it covers.
+`promote()` then moves every passing student below their programme's final
+year up with a single UPDATE whose WHERE clause re-checks the rule in SQL.
+"""
+
+from fractions import Fraction
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+
+from .models import Student, Unit, Mark
+from .rankings import refresh_on_commit
+from .stats import PASS_MARK
+
+PASS, SUPPLEMENTARY, FAIL, INCOMPLETE = 'pass', 'supplementary', 'fail', 'incomplete'
+STATUSES = (PASS, SUPPLEMENTARY, FAIL, INCOMPLETE)
+SUPPLEMENTARY_SHARE = Fraction(1, 3)  # of the year's units; failing more repeats the year
+
+
+def classify(units, passed, failed):
+    """The status of a student with `passed` and `failed` marks among `units` required units."""
+    if not units or passed + failed < units:
+        return INCOMPLETE
+    if not failed:
+        return PASS
+    return SUPPLEMENTARY if failed <= units * SUPPLEMENTARY_SHARE else FAIL
+
+
+def _cohort(programme, year=None):
+    students = Student.objects.filter(programme=programme)
+    return students if year is None else students.filter(year_of_study=year)
+
+
+def _units_per_year(programme):
+    return dict(Unit.objects.filter(programme=programme).order_by()
+                .values('year').annotate(units=Count('id')).values_list('year', 'units'))
+
+
+def report(programme, year=None):
+    """
+    Every student of `programme` (those now in `year` only, if given) with
+    their status, plus the count per status: `promotable` students passed
+    below the final year, `completing` ones passed the final year.
+    """
+    units = _units_per_year(programme)
+    current = Q(marks__unit__programme=F('programme'), marks__unit__year=F('year_of_study'))
+    rows = (_cohort(programme, year)
+            .annotate(passed=Count('marks', filter=current & Q(marks__total__gte=PASS_MARK)),
+                      failed=Count('marks', filter=current & Q(marks__total__lt=PASS_MARK)))
+            .order_by('reg_number')
+            .values_list('pk', 'reg_number', 'year_of_study', 'passed', 'failed'))
+
+    counts = dict.fromkeys(STATUSES, 0)
+    promotable = completing = 0
+    students = []
+    for pk, reg_number, year_of_study, passed, failed in rows:
+        required = units.get(year_of_study, 0)
+        status = classify(required, passed, failed)
+        counts[status] += 1
+        if status == PASS:
+            if year_of_study < programme.duration_years:
+                promotable += 1
+            else:
+                completing += 1
+        students.append({'student': pk, 'reg_number': reg_number, 'year_of_study': year_of_study,
+                         'status': status, 'units': required, 'passed': passed, 'failed': failed,
+                         'missing': max(required - passed - failed, 0)})
+    return {'programme': programme.pk, 'year': year, 'counts': counts,
+            'promotable': promotable, 'completing': completing, 'students': students}
+
+
+def passing(programme, year=None):
+    """The students report() calls `pass`, as a queryset: the rule as correlated subqueries."""
+    required = Unit.objects.filter(programme=OuterRef('programme'), year=OuterRef('year_of_study'))
+    passed = Mark.objects.filter(student=OuterRef(OuterRef('pk')), unit=OuterRef('pk'),
+                                 total__gte=PASS_MARK)
+    return (_cohort(programme, year)
+            .filter(Exists(required))
+            .exclude(Exists(required.exclude(Exists(passed)))))
+
+
+def promote(programme, year=None):
+    """
+    Move every passing student of `programme` below its final year up one
+    year. Returns report() as it stood just before, plus `promoted`.
+    """
+    with transaction.atomic():
+        result = report(programme, year)
+        promoted = (passing(programme, year).filter(year_of_study__lt=programme.duration_years)
+                    .update(year_of_study=F('year_of_study') + 1))
+        # a standing belongs to a (programme, year) cohort; update() sends no signals
+        refresh_on_commit(row['student'] for row in result['students']
+                          if row['status'] == PASS and row['year_of_study'] < programme.duration_years)
+    result['promoted'] = promoted
+    return result
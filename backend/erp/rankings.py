@@ -0,0 +1,130 @@
+"""
+Cohort rankings by mean mark total.
+
+StudentStanding keeps each student's unit count, sum and mean of totals and
+their rank within the cohort (programme + year of study). A mark write only
+re-aggregates the students it touched; ranks for their cohorts are then
+reassigned by one window-function UPDATE, so nothing ever loads a cohort's
+marks into Python. `rebuild()` recomputes everything from the marks table
+(`manage.py rebuild_rankings`).
+"""
+
+import threading
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Sum
+
+from .models import Student, Mark, StudentStanding
+
+TWO_PLACES = Decimal('0.01')
+CHUNK_SIZE = 500  # students per IN (...) lookup
+
+_RANK_SQL = """
+    UPDATE {table} SET "rank" = ranked.cohort_rank, cohort_size = ranked.cohort_count
+    FROM (
+        SELECT student_id,
+               RANK() OVER (PARTITION BY programme_id, year_of_study
+                            ORDER BY mean_total DESC) AS cohort_rank,
+               COUNT(*) OVER (PARTITION BY programme_id, year_of_study) AS cohort_count
+        FROM {table}
+        WHERE programme_id IS NOT NULL {cohorts}
+    ) AS ranked
+    WHERE {table}.student_id = ranked.student_id
+"""
+
+_REBUILD_SQL = """
+    INSERT INTO {table} (student_id, programme_id, year_of_study, unit_count,
+                         total_sum, mean_total, cohort_size)
+    SELECT m.student_id, s.programme_id, s.year_of_study, COUNT(*),
+           SUM(m.total), ROUND(AVG(m.total), 2), 0
+    FROM {marks} m JOIN {students} s ON s.id = m.student_id
+    GROUP BY m.student_id, s.programme_id, s.year_of_study
+"""
+
+
+def rank_cohorts(cohorts=None):
+    """Reassign rank and cohort_size for the given (programme_id, year) pairs, or all."""
+    params = []
+    where = ''
+    if cohorts is not None:
+        cohorts = [c for c in cohorts if c[0] is not None]
+        if not cohorts:
+            return
+        where = 'AND (' + ' OR '.join(['(programme_id = %s AND year_of_study = %s)'] * len(cohorts)) + ')'
+        params = [value for cohort in cohorts for value in cohort]
+    with connection.cursor() as cursor:
+        cursor.execute(_RANK_SQL.format(table=StudentStanding._meta.db_table, cohorts=where), params)
+
+
+def refresh_students(student_ids):
+    """Re-aggregate these students' standings and re-rank every cohort involved."""
+    student_ids = set(student_ids)
+    with transaction.atomic():
+        cohorts = set()
+        ordered = sorted(student_ids)
+        for start in range(0, len(ordered), CHUNK_SIZE):
+            chunk = ordered[start:start + CHUNK_SIZE]
+            cohorts.update(StudentStanding.objects.filter(student_id__in=chunk)
+                           .values_list('programme_id', 'year_of_study'))
+            rows = (Mark.objects.filter(student_id__in=chunk)
+                    .values('student_id', 'student__programme_id', 'student__year_of_study')
+                    .annotate(unit_count=Count('id'), total_sum=Sum('total'), mean_total=Avg('total'))
+                    .order_by())
+            standings = [
+                StudentStanding(
+                    student_id=row['student_id'],
+                    programme_id=row['student__programme_id'],
+                    year_of_study=row['student__year_of_study'],
+                    unit_count=row['unit_count'],
+                    total_sum=row['total_sum'],
+                    mean_total=Decimal(row['mean_total']).quantize(TWO_PLACES),
+                )
+                for row in rows
+            ]
+            StudentStanding.objects.bulk_create(
+                standings,
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=['programme', 'year_of_study', 'unit_count', 'total_sum', 'mean_total'],
+            )
+            cohorts.update((s.programme_id, s.year_of_study) for s in standings)
+            # students whose last mark went away drop out of the rankings
+            StudentStanding.objects.filter(student_id__in=set(chunk) - {s.student_id for s in standings}).delete()
+        rank_cohorts(cohorts)
+
+
+_pending = threading.local()
+
+
+def refresh_on_commit(student_ids):
+    """
+    Queue students for refresh_students() once the transaction commits. All
+    writes in one transaction share a single refresh, however many marks
+    they touch.
+    """
+    pending = getattr(_pending, 'students', None)
+    if pending is None:
+        pending = _pending.students = set()
+    pending.update(student_ids)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    students = getattr(_pending, 'students', None)
+    _pending.students = None
+    if students:
+        refresh_students(students)
+
+
+def rebuild():
+    """Recompute every standing and rank from the marks table. Returns the row count."""
+    tables = {'table': StudentStanding._meta.db_table,
+              'marks': Mark._meta.db_table,
+              'students': Student._meta.db_table}
+    with transaction.atomic():
+        StudentStanding.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(_REBUILD_SQL.format(**tables))
+        rank_cohorts()
+        return StudentStanding.objects.count()
@@ -0,0 +1,40 @@
+"""
+JSON rendering through orjson when it is installed (`pip install orjson`).
+
+orjson encodes the large list responses several times faster than the
+stdlib encoder. Types it does not handle natively the way DRF does
+(Decimal, datetime/date/time, lazy strings) are passed to DRF's own
+JSONEncoder.default, so the bytes are the same as JSONRenderer's compact
+UTF-8 output. Without orjson, or when a request asks for indented output,
+this is plain JSONRenderer.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits; the stdlib encoder copes
+            return super().render(data, accepted_media_type, renderer_context)
+        # same escaping as JSONRenderer: keep the output a strict JavaScript subset
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
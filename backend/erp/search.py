@@ -0,0 +1,204 @@
+"""
+Student search for `GET /api/students/?q=`.
+
+Queries that look like a registration number (they contain a digit or a
+slash) are a prefix range scan on the unique reg_number index:
+`MU/CS/0` reads `reg_number >= 'MU/CS/0' AND reg_number < 'MU/CS/1'` in
+reg-number order. Anything else is a name search against an SQLite FTS5
+table holding each student's first and last name (rowid = student id),
+kept in sync by the signals in erp/signals.py and by the bulk paths that
+bypass them. Every word of the query must prefix-match a name, in any
+order, ignoring case and accents; matches are ranked by bm25 unless the
+query is too broad for ranking to mean anything, and a query with no
+matches at all is retried with close spellings taken from the index's
+own vocabulary. Other database vendors fall back to icontains lookups.
+"""
+
+import difflib
+import re
+import time
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import User, Student
+
+TABLE = 'erp_student_search'
+VOCABULARY = 'erp_student_search_terms'
+CHUNK_SIZE = 500  # students per IN (...) when re-indexing
+RANK_LIMIT = 2000  # broader matches come back in id order instead of bm25 order
+FUZZY_MIN_LENGTH = 4  # shorter words are too ambiguous to correct
+FUZZY_CUTOFF = 0.75
+FUZZY_ALTERNATIVES = 5
+VOCABULARY_TTL = 300  # seconds a per-letter term list is reused for spelling suggestions
+
+re_reg_number = re.compile(r'[\d/]')
+re_word = re.compile(r'\w+')
+
+_INDEX_SQL = """
+    INSERT INTO {table} (rowid, first_name, last_name)
+    SELECT s.id, u.first_name, u.last_name
+    FROM {students} s JOIN {users} u ON u.id = s.user_id
+    {where}
+"""
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def _index_sql(where=''):
+    return _INDEX_SQL.format(table=TABLE, students=Student._meta.db_table, users=User._meta.db_table,
+                             where=where)
+
+
+def _reindex(column, ids):
+    ids = sorted(set(ids))
+    if not ids or not available():
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            marks = ', '.join(['%s'] * len(chunk))
+            if column == 'id':
+                cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN ({marks})', chunk)
+            else:
+                cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN '
+                               f'(SELECT id FROM {Student._meta.db_table} WHERE {column} IN ({marks}))',
+                               chunk)
+            cursor.execute(_index_sql(f'WHERE s.{column} IN ({marks})'), chunk)
+
+
+def index_students(student_ids):
+    """(Re-)index these students' names."""
+    _reindex('id', student_ids)
+
+
+def index_users(user_ids):
+    """(Re-)index the students belonging to these users (a user without one is a no-op)."""
+    _reindex('user_id', user_ids)
+
+
+def remove_students(student_ids):
+    student_ids = sorted(set(student_ids))
+    if not student_ids or not available():
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(student_ids), CHUNK_SIZE):
+            chunk = student_ids[start:start + CHUNK_SIZE]
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def rebuild():
+    """Re-index every student from scratch; returns the number indexed."""
+    if not available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(_index_sql())
+        return cursor.rowcount
+
+
+# ─── Queries ─────────────────────────────────────────────────────────────────
+def fold(text):
+    """Lower-case without accents, as the FTS tokenizer sees it."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _match_expression(words):
+    """Each word (a list of alternative spellings) must prefix-match some name."""
+    groups = []
+    for spellings in words:
+        terms = ['"{}"*'.format(spelling.replace('"', '""')) for spelling in spellings]
+        groups.append(terms[0] if len(terms) == 1 else '(' + ' OR '.join(terms) + ')')
+    return ' AND '.join(groups)
+
+
+_vocabulary = {}  # first letter -> (loaded at, indexed terms)
+
+
+def _terms(cursor, letter):
+    """
+    Indexed terms starting with `letter`. fts5vocab counts documents for
+    every term it returns, so the list is kept for VOCABULARY_TTL; a
+    stale list only misses suggesting a name added since.
+    """
+    loaded_at, terms = _vocabulary.get(letter, (None, None))
+    if loaded_at is None or time.monotonic() - loaded_at > VOCABULARY_TTL:
+        cursor.execute(f'SELECT term FROM {VOCABULARY} WHERE term >= %s AND term < %s',
+                       [letter, chr(ord(letter) + 1)])
+        terms = [term for term, in cursor.fetchall()]
+        _vocabulary[letter] = (time.monotonic(), terms)
+    return terms
+
+
+def _close_spellings(cursor, word):
+    """Indexed names within FUZZY_CUTOFF similarity of `word`, sharing its first letter."""
+    if len(word) < FUZZY_MIN_LENGTH:
+        return []
+    return difflib.get_close_matches(word, _terms(cursor, word[0]), n=FUZZY_ALTERNATIVES,
+                                     cutoff=FUZZY_CUTOFF)
+
+
+class StudentSearch:
+    """
+    The ids of students matching `q`, best first. Slicing runs the query
+    for just that slice (LIMIT/OFFSET), like a queryset.
+    """
+
+    def __init__(self, q):
+        self.q = q.strip()
+        self.words = re_word.findall(fold(self.q))
+        self.expression = None
+        self.matches = 0
+
+    def __getitem__(self, page):
+        if not isinstance(page, slice) or page.step is not None:
+            raise TypeError('StudentSearch only supports [start:stop] slices.')
+        start = page.start or 0
+        limit = None if page.stop is None else max(page.stop - start, 0)
+        if re_reg_number.search(self.q):
+            return self._by_reg_number(start, limit)
+        if not self.words:
+            return []
+        if not available():
+            return self._by_name_lookup(start, limit)
+        return self._by_name_index(start, limit)
+
+    def _slice(self, queryset, start, limit):
+        return list(queryset[start:None if limit is None else start + limit])
+
+    def _by_reg_number(self, start, limit):
+        prefix = self.q.upper()
+        upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        queryset = (Student.objects.filter(reg_number__gte=prefix, reg_number__lt=upper_bound)
+                    .order_by('reg_number').values_list('pk', flat=True))
+        return self._slice(queryset, start, limit)
+
+    def _by_name_lookup(self, start, limit):
+        queryset = Student.objects.all()
+        for word in self.words:
+            queryset = queryset.filter(Q(user__first_name__icontains=word) | Q(user__last_name__icontains=word))
+        return self._slice(queryset.order_by('pk').values_list('pk', flat=True), start, limit)
+
+    def _by_name_index(self, start, limit):
+        with connection.cursor() as cursor:
+            if self.expression is None:
+                self.expression = _match_expression([[word] for word in self.words])
+                self.matches = self._count(cursor, RANK_LIMIT + 1)
+                if not self.matches:
+                    alternatives = [[word, *_close_spellings(cursor, word)] for word in self.words]
+                    self.expression = _match_expression(alternatives)
+                    self.matches = self._count(cursor, RANK_LIMIT + 1)
+            order = 'rank, rowid' if self.matches <= RANK_LIMIT else 'rowid'
+            cursor.execute(f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s ORDER BY {order} '
+                           'LIMIT %s OFFSET %s', [self.expression, -1 if limit is None else limit, start])
+            return [student_id for student_id, in cursor.fetchall()]
+
+    def _count(self, cursor, cap):
+        """Matches for the current expression, counting no further than `cap`."""
+        cursor.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM {TABLE} WHERE {TABLE} MATCH %s LIMIT %s)',
+                       [self.expression, cap])
+        return cursor.fetchone()[0]
@@ -1,6 +1,24 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User, Programme, Student, Unit, Mark
+from .models import User, Programme, Student, Unit, Mark, StudentStanding, Job
+
+
+class SparseFieldsMixin:
+    """
+    Lets GET clients trim the payload with `?fields=id,unit_code,total`.
+    Unknown names are ignored; without the parameter every field is returned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        requested = request.query_params.get('fields')
+        if requested:
+            wanted = {name.strip() for name in requested.split(',')}
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
 
 
 class LoginSerializer(serializers.Serializer):
@@ -29,7 +47,7 @@ class ProgrammeSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     programme_name = serializers.CharField(source='programme.name', read_only=True)
     programme_code = serializers.CharField(source='programme.code', read_only=True)
@@ -90,7 +108,7 @@ class UnitSerializer(serializers.ModelSerializer):
         fields = ('id', 'code', 'name', 'programme', 'programme_name', 'year', 'semester')
 
 
-class MarkSerializer(serializers.ModelSerializer):
+class MarkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     unit_code = serializers.CharField(source='unit.code', read_only=True)
     unit_name = serializers.CharField(source='unit.name', read_only=True)
     year = serializers.IntegerField(source='unit.year', read_only=True)
@@ -104,14 +122,94 @@ class MarkSerializer(serializers.ModelSerializer):
                   'year', 'semester', 'cat_score', 'exam_score', 'total', 'grade', 'uploaded_at')
 
 
+class StudentStandingSerializer(serializers.ModelSerializer):
+    total_sum = serializers.FloatField()
+    mean_total = serializers.FloatField()
+    percentile = serializers.FloatField()
+
+    class Meta:
+        model = StudentStanding
+        fields = ('student', 'programme', 'year_of_study', 'unit_count', 'total_sum',
+                  'mean_total', 'rank', 'cohort_size', 'percentile')
+
+
+def validate_score_range(data):
+    for field in ('cat_score', 'exam_score'):
+        val = data.get(field)
+        if val is not None and not (0 <= float(val) <= 100):
+            raise serializers.ValidationError(f"{field} must be between 0 and 100.")
+    return data
+
+
 class MarkUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Mark
         fields = ('student', 'unit', 'cat_score', 'exam_score')
 
     def validate(self, data):
-        for field in ('cat_score', 'exam_score'):
-            val = data.get(field)
-            if val is not None and not (0 <= float(val) <= 100):
-                raise serializers.ValidationError(f"{field} must be between 0 and 100.")
-        return data
\ No newline at end of file
+        return validate_score_range(data)
+
+
+class MarkBulkRowSerializer(serializers.Serializer):
+    """
+    One row of a bulk mark upload. Students and units may be given either by
+    id or by reg number / unit code; they are resolved in bulk afterwards so
+    validating a row never touches the database.
+    """
+    student = serializers.IntegerField(required=False, allow_null=True)
+    reg_number = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    unit = serializers.IntegerField(required=False, allow_null=True)
+    unit_code = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    cat_score = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, allow_null=True)
+    exam_score = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, allow_null=True)
+
+    def validate(self, data):
+        if not data.get('student') and not data.get('reg_number'):
+            raise serializers.ValidationError("Provide either student or reg_number.")
+        if not data.get('unit') and not data.get('unit_code'):
+            raise serializers.ValidationError("Provide either unit or unit_code.")
+        return validate_score_range(data)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Status of a background job; `params` is write-only as imports carry every row."""
+    percent = serializers.SerializerMethodField()
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'params', 'status', 'progress', 'total', 'percent', 'result', 'error',
+                  'created_by', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = ('status', 'progress', 'total', 'result', 'error',
+                            'created_at', 'started_at', 'finished_at')
+        extra_kwargs = {'params': {'write_only': True}}
+
+    def get_percent(self, job):
+        if job.status == Job.SUCCEEDED:
+            return 100
+        if not job.total:
+            return 0
+        return min(100, 100 * job.progress // job.total)
+
+
+class StudentAdmissionRowSerializer(serializers.Serializer):
+    """
+    One row of a bulk admission intake. Like MarkBulkRowSerializer it never
+    touches the database: username/reg number uniqueness and the programme
+    are resolved for the whole intake at once (see erp/bulk.py).
+    """
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+    email = serializers.EmailField()
+    username = serializers.CharField(max_length=150)
+    password = serializers.CharField(write_only=True)
+    reg_number = serializers.CharField(max_length=30)
+    programme = serializers.IntegerField(required=False, allow_null=True)
+    programme_code = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    year_of_study = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    phone = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=15)
+
+    def validate(self, data):
+        if not data.get('programme') and not data.get('programme_code'):
+            raise serializers.ValidationError("Provide either programme or programme_code.")
+        return data
@@ -0,0 +1,70 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import events, search
+from .authentication import user_cache
+from .cache import bump_on_commit
+from .models import User, Programme, Student, Unit, Mark, MarkTombstone, CatalogueVersion
+from .rankings import refresh_on_commit
+from .stats import forget_unit_programmes, invalidate_for_mark, invalidate_for_units
+
+
+@receiver([post_save, post_delete], sender=Mark)
+def mark_changed(sender, instance, **kwargs):
+    # a mark moved to another student or unit leaves the previous one's results/stats stale too
+    students = {instance.student_id, getattr(instance, 'loaded_student_id', None)} - {None}
+    bump_on_commit('marks', students)
+    invalidate_for_mark(instance)
+    if getattr(instance, 'loaded_unit_id', None) not in (None, instance.unit_id):
+        invalidate_for_units([instance.loaded_unit_id])
+    refresh_on_commit(students)
+    events.publish_on_commit(students)
+
+
+@receiver(post_delete, sender=Mark)
+def mark_deleted(sender, instance, **kwargs):
+    # the change feed reports deletes from these (see erp/changes.py)
+    MarkTombstone.objects.create(mark_id=instance.pk, student_id=instance.student_id,
+                                 unit_id=instance.unit_id)
+
+
+@receiver(post_save, sender=Student)
+def student_changed(sender, instance, created, **kwargs):
+    if not created:  # a new student has no marks to rank yet
+        refresh_on_commit([instance.pk])
+    search.index_students([instance.pk])
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    search.remove_students([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Unit)
+def unit_changed(sender, instance, **kwargs):
+    forget_unit_programmes()
+    bump_on_commit('unit_stats', [instance.pk])
+    bump_on_commit('programme_stats', [instance.programme_id])
+    # results carry the unit's code, name, year and semester; a deleted unit's
+    # marks have gone through mark_changed already
+    students = set(Mark.objects.filter(unit=instance).values_list('student_id', flat=True))
+    bump_on_commit('marks', students)
+    events.publish_on_commit(students)
+
+
+@receiver([post_save, post_delete], sender=Programme)
+@receiver([post_save, post_delete], sender=Unit)
+def catalogue_changed(sender, instance, **kwargs):
+    CatalogueVersion.bump()
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    user_cache.discard(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, update_fields=None, **kwargs):
+    # logins save last_login alone; only a name change touches the search index
+    if update_fields is None or {'first_name', 'last_name'} & set(update_fields):
+        search.index_users([instance.pk])
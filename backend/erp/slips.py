@@ -0,0 +1,150 @@
+"""
+Batch generation of end-of-semester results slips.
+
+All marks in scope (programme / year / semester) come from one streaming
+query ordered by student, so each student's slip is a contiguous run of
+rows. Runs are grouped into batches of plain dicts and rendered to HTML (or
+PDF, with weasyprint installed) in a process pool; the parent only reads
+the cursor and writes the finished files into a zip or a directory.
+"""
+
+import itertools
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from decimal import Decimal
+from pathlib import Path
+
+from django.template.loader import render_to_string
+
+from .exports import export_queryset
+from .processes import setup_child
+from .stats import PASS_MARK
+
+BATCH_SIZE = 100  # slips per pool task
+CHUNK_SIZE = 2000
+
+STUDENT_COLUMNS = ('student_id', 'student__reg_number', 'student__user__first_name',
+                   'student__user__last_name', 'student__programme__code', 'student__programme__name',
+                   'student__year_of_study')
+MARK_COLUMNS = ('unit__code', 'unit__name', 'unit__year', 'unit__semester',
+                'cat_score', 'exam_score', 'total', 'grade')
+
+
+def slip_queryset(scope):
+    """Marks for `scope` (programme, year, semester; any may be None), grouped by student."""
+    return export_queryset(scope).order_by('student_id', 'unit__year', 'unit__semester', 'unit__code')
+
+
+def iter_slips(scope):
+    """One dict per student with their marks in scope, read in a single streaming query."""
+    rows = (slip_queryset(scope).values_list(*STUDENT_COLUMNS, *MARK_COLUMNS)
+            .iterator(chunk_size=CHUNK_SIZE))
+    width = len(STUDENT_COLUMNS)
+    for _, run in itertools.groupby(rows, key=lambda row: row[0]):
+        run = list(run)
+        _, reg_number, first_name, last_name, programme_code, programme_name, year_of_study = run[0][:width]
+        marks = [dict(zip(MARK_COLUMNS, row[width:])) for row in run]
+        totals = [mark['total'] for mark in marks if mark['total'] is not None]
+        failed = [mark['unit__code'] for mark in marks if mark['total'] is None or mark['total'] < PASS_MARK]
+        yield {
+            'reg_number': reg_number,
+            'name': f'{first_name} {last_name}'.strip(),
+            'programme_code': programme_code,
+            'programme_name': programme_name,
+            'year_of_study': year_of_study,
+            'marks': marks,
+            'mean': (sum(totals) / len(totals)).quantize(Decimal('0.01')) if totals else None,
+            'failed': failed,
+        }
+
+
+def slip_filename(slip, extension):
+    return slip['reg_number'].replace('/', '-') + f'.{extension}'
+
+
+def render_batch(slips, scope, fmt):
+    """Pool task: [(filename, bytes)] for a batch of slips."""
+    if fmt == 'pdf':
+        from weasyprint import HTML
+    rendered = []
+    for slip in slips:
+        html = render_to_string('erp/results_slip.html', {'slip': slip, 'scope': scope})
+        if fmt == 'pdf':
+            rendered.append((slip_filename(slip, 'pdf'), HTML(string=html).write_pdf()))
+        else:
+            rendered.append((slip_filename(slip, 'html'), html.encode()))
+    return rendered
+
+
+class _Writer:
+    """Files into a .zip archive, or into a directory for any other path."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        if self.path.suffix == '.zip':
+            self.archive = zipfile.ZipFile(self.path, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            self.archive = None
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    def write(self, files):
+        for name, content in files:
+            if self.archive is not None:
+                self.archive.writestr(name, content)
+            else:
+                (self.path / name).write_bytes(content)
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+
+def generate(scope, output, fmt='html', processes=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Render a slip for every student with marks in `scope` into `output`
+    (a .zip path or a directory). `processes=0` renders in this process.
+    `progress(done, total)` is called after each batch. Returns counts and
+    throughput.
+    """
+    if fmt == 'pdf':
+        import weasyprint  # noqa: F401 -- fail before any work without the optional dependency
+    processes = os.cpu_count() if processes is None else processes
+    total = slip_queryset(scope).values('student_id').distinct().count()
+    slips = iter_slips(scope)
+    batches = iter(lambda: list(itertools.islice(slips, batch_size)), [])
+    started = time.perf_counter()
+    done = 0
+    with ExitStack() as cleanup:
+        writer = _Writer(output)
+        cleanup.callback(writer.close)
+        if processes == 0:
+            results = (render_batch(batch, scope, fmt) for batch in batches)
+        else:
+            pool = ProcessPoolExecutor(max_workers=processes, initializer=setup_child,
+                                       mp_context=multiprocessing.get_context('spawn'))
+            cleanup.callback(pool.shutdown, cancel_futures=True)
+            results = _bounded_map(pool, render_batch, batches, scope, fmt, window=processes * 2)
+        for files in results:
+            writer.write(files)
+            done += len(files)
+            if progress:
+                progress(done, total)
+    elapsed = time.perf_counter() - started
+    return {'slips': done, 'seconds': round(elapsed, 3),
+            'slips_per_second': round(done / elapsed, 1) if elapsed else None}
+
+
+def _bounded_map(pool, func, batches, *args, window):
+    """pool.map() that keeps at most `window` batches in flight, yielding results in order."""
+    pending = deque()
+    for batch in batches:
+        pending.append(pool.submit(func, batch, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,122 @@
+"""
+Examination-board statistics computed with SQL aggregates over Mark.total
+and Mark.grade, cached until the next mark write for the unit/programme.
+"""
+
+import math
+
+from django.db.models import Avg, Count, F, FloatField, Max, Min, Q
+
+from .cache import bump_on_commit, get_or_build
+from .models import Unit, Mark, GRADE_BOUNDARIES
+
+PASS_MARK = 40
+GRADES = [letter for letter, _ in GRADE_BOUNDARIES] + ['E']
+
+# unit id -> programme id; units practically never move between programmes,
+# and the memo is cleared whenever a Unit is saved (see erp/signals.py).
+_unit_programmes = {}
+
+
+def programmes_of_units(unit_ids):
+    missing = [pk for pk in unit_ids if pk not in _unit_programmes]
+    if missing:
+        _unit_programmes.update(Unit.objects.filter(pk__in=missing).values_list('pk', 'programme_id'))
+    return {_unit_programmes[pk] for pk in unit_ids if pk in _unit_programmes}
+
+
+def forget_unit_programmes():
+    _unit_programmes.clear()
+
+
+def invalidate_for_mark(mark):
+    if Mark.unit.is_cached(mark):  # spare the lookup when the unit is already loaded
+        _unit_programmes[mark.unit_id] = mark.unit.programme_id
+    invalidate_for_units([mark.unit_id])
+
+
+def invalidate_for_units(unit_ids):
+    """Expire cached statistics for these units and their programmes on commit."""
+    unit_ids = set(unit_ids)
+    bump_on_commit('unit_stats', unit_ids)
+    bump_on_commit('programme_stats', programmes_of_units(unit_ids))
+
+
+def _aggregates():
+    return {
+        'count': Count('id'),
+        'mean': Avg('total'),
+        # SQLite has no STDDEV; std_dev comes from this and the mean in _summary()
+        'mean_square': Avg(F('total') * F('total'), output_field=FloatField()),
+        'min': Min('total'),
+        'max': Max('total'),
+        'passed': Count('id', filter=Q(total__gte=PASS_MARK)),
+        **{f'grade_{letter}': Count('id', filter=Q(grade=letter)) for letter in GRADES},
+    }
+
+
+def _number(value):
+    return round(float(value), 2) if value is not None else None
+
+
+def _std_dev(row):
+    """Population standard deviation: sqrt(E[total²] - E[total]²), clamped against rounding."""
+    if row['mean'] is None:
+        return None
+    return math.sqrt(max(row['mean_square'] - float(row['mean']) ** 2, 0))
+
+
+def _summary(row):
+    count = row['count']
+    return {
+        'count': count,
+        'mean': _number(row['mean']),
+        'std_dev': _number(_std_dev(row)),
+        'min': _number(row['min']),
+        'max': _number(row['max']),
+        'pass_rate': round(100 * row['passed'] / count, 2) if count else None,
+        'grades': {letter: row[f'grade_{letter}'] for letter in GRADES},
+    }
+
+
+def median(qs, count):
+    """Median total via ORDER BY total LIMIT 2 OFFSET n/2 (walks the index)."""
+    if not count:
+        return None
+    middle = list(qs.order_by('total').values_list('total', flat=True)[(count - 1) // 2:count // 2 + 1])
+    return _number(sum(middle) / len(middle))
+
+
+def compute_unit_stats(unit_id):
+    marks = Mark.objects.filter(unit_id=unit_id)
+    stats = _summary(marks.aggregate(**_aggregates()))
+    stats['median'] = median(marks, stats['count'])
+    return stats
+
+
+def compute_programme_stats(programme_id, year=None, semester=None):
+    marks = Mark.objects.filter(unit__programme_id=programme_id)
+    if year:
+        marks = marks.filter(unit__year=year)
+    if semester:
+        marks = marks.filter(unit__semester=semester)
+    stats = _summary(marks.aggregate(**_aggregates()))
+    stats['median'] = median(marks, stats['count'])
+    per_unit = (marks.values('unit_id', 'unit__code', 'unit__name')
+                .annotate(**_aggregates()).order_by('unit__code'))
+    stats['units'] = [
+        {'unit': row['unit_id'], 'unit_code': row['unit__code'], 'unit_name': row['unit__name'],
+         **_summary(row)}
+        for row in per_unit
+    ]
+    return stats
+
+
+def unit_stats(unit_id):
+    return get_or_build('unit_stats', unit_id, lambda: compute_unit_stats(unit_id))
+
+
+def programme_stats(programme_id, year=None, semester=None):
+    return get_or_build('programme_stats', programme_id,
+                        lambda: compute_programme_stats(programme_id, year, semester),
+                        variant=f'{year or ""}:{semester or ""}')
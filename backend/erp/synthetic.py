@@ -0,0 +1,153 @@
+"""
+Synthetic cohorts for capacity testing and benchmarks.
+
+Everything is written with bulk_create in fixed-size batches, so memory use
+depends on the batch size rather than on the number of students. All
+synthetic students share one pre-computed password hash (the plain
+password is SYNTHETIC_PASSWORD).
+"""
+
+import math
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+
+from . import search
+from .models import User, Programme, Student, Unit, Mark, CatalogueVersion
+
+SYNTHETIC_PASSWORD = 'student@123'
+USERNAME_PREFIX = 'syn'
+DURATION_YEARS = 4
+
+FIRST_NAMES = (
+    'Achieng', 'Akinyi', 'Amina', 'Anyango', 'Brian', 'Chebet', 'Cheruiyot', 'Dennis',
+    'Esther', 'Faith', 'Fatuma', 'Grace', 'Hassan', 'Jackline', 'James', 'Jepkosgei',
+    'Joseph', 'Kamau', 'Kevin', 'Kiprono', 'Mercy', 'Mohamed', 'Mwangi', 'Naliaka',
+    'Njeri', 'Nyambura', 'Ochieng', 'Odhiambo', 'Otieno', 'Peter', 'Wafula', 'Wanjiru',
+)
+LAST_NAMES = (
+    'Atieno', 'Barasa', 'Chege', 'Gachanja', 'Gitau', 'Kamande', 'Kariuki', 'Kibet',
+    'Kimani', 'Kipchoge', 'Koech', 'Korir', 'Macharia', 'Maina', 'Mutua', 'Muthoni',
+    'Mwangi', 'Ndungu', 'Njoroge', 'Nyaga', 'Odhiambo', 'Ogola', 'Okoth', 'Omondi',
+    'Onyango', 'Opiyo', 'Otieno', 'Rotich', 'Wambui', 'Wanjala', 'Wekesa', 'Waweru',
+)
+
+
+def person_name(i):
+    """A deterministic (first, last) name pair for the i-th synthetic person."""
+    return FIRST_NAMES[i % len(FIRST_NAMES)], LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]
+
+
+def _programmes(count, rng):
+    programmes = []
+    for i in range(1, count + 1):
+        programme, _ = Programme.objects.get_or_create(
+            code=f'SYN{i:02d}',
+            defaults={
+                'name': f'Synthetic Programme {i}',
+                'duration_years': DURATION_YEARS,
+                'has_semester_3': rng.random() < 0.25,
+            },
+        )
+        programmes.append(programme)
+    return programmes
+
+
+def _units(programme, per_year):
+    """
+    `per_year` units for every year of the programme, split evenly over its
+    semesters. Returns {year: [unit_id, ...]}.
+    """
+    semesters = 3 if programme.has_semester_3 else 2
+    existing = {u.code: u for u in Unit.objects.filter(programme=programme)}
+    wanted = []
+    for year in range(1, programme.duration_years + 1):
+        for k in range(per_year):
+            semester = 1 + k * semesters // per_year
+            code = f'{programme.code}-{year}{k:03d}'
+            if code not in existing:
+                wanted.append(Unit(code=code, name=f'{programme.code} Unit {year}.{k}',
+                                   programme=programme, year=year, semester=semester))
+    if wanted:
+        Unit.objects.bulk_create(wanted)
+        CatalogueVersion.bump()  # bulk_create sends no signals
+    by_year = {}
+    for unit in (Unit.objects.filter(programme=programme, code__startswith=f'{programme.code}-')
+                 .order_by('code')):
+        by_year.setdefault(unit.year, []).append(unit.pk)
+    return {year: ids[:per_year] for year, ids in by_year.items()}
+
+
+def _next_index():
+    """
+    One past the highest synthetic user number, so a run continues after
+    earlier ones even if some of their students were deleted since (a count
+    would then hand out numbers that are still taken).
+    """
+    last = (User.objects.filter(username__regex=rf'^{USERNAME_PREFIX}[0-9]{{7}}$')
+            .order_by('-username').values_list('username', flat=True).first())
+    return int(last[len(USERNAME_PREFIX):]) + 1 if last else 0
+
+
+def _score(rng, mean, spread, ceiling):
+    return max(0, min(ceiling, round(rng.gauss(mean, spread))))
+
+
+def generate(students, marks_per_student=16, programmes=4, seed=None,
+             batch_size=5000, progress=None):
+    """
+    Create `students` students spread over `programmes` synthetic programmes,
+    each with `marks_per_student` marks for the units of their current year.
+    `progress(created_students, created_marks, elapsed)` is called after each
+    batch. Returns a summary dict with counts and timings.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    programme_objs = _programmes(programmes, rng)
+    units = {p.pk: _units(p, marks_per_student) for p in programme_objs}
+    password = make_password(SYNTHETIC_PASSWORD)
+    offset = _next_index()
+
+    created_marks = 0
+    for batch_start in range(0, students, batch_size):
+        batch = range(offset + batch_start, offset + min(batch_start + batch_size, students))
+        users = User.objects.bulk_create(
+            User(username=f'{USERNAME_PREFIX}{i:07d}', password=password, role='student',
+                 first_name=first_name, last_name=last_name,
+                 email=f'{USERNAME_PREFIX}{i:07d}@student.muranga.ac.ke')
+            for i, (first_name, last_name) in zip(batch, map(person_name, batch))
+        )
+        student_objs = []
+        for i, user in zip(batch, users):
+            programme = programme_objs[i % len(programme_objs)]
+            student_objs.append(Student(
+                user=user,
+                reg_number=f'MU/{programme.code}/{i:07d}',
+                programme=programme,
+                year_of_study=rng.randint(1, programme.duration_years),
+                phone=f'+2547{i % 10 ** 8:08d}',
+            ))
+        Student.objects.bulk_create(student_objs)
+        search.index_students([student.pk for student in student_objs])
+
+        marks = [
+            Mark(student=student, unit_id=unit_id,
+                 cat_score=_score(rng, 20, 5, 30), exam_score=_score(rng, 44, 12, 70))
+            for student in student_objs
+            for unit_id in units[student.programme_id][student.year_of_study]
+        ]
+        Mark.objects.bulk_create(marks, batch_size=batch_size)
+        created_marks += len(marks)
+        if progress:
+            progress(batch.stop - offset, created_marks, time.perf_counter() - started)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'programmes': len(programme_objs),
+        'units': sum(len(ids) for by_year in units.values() for ids in by_year.values()),
+        'students': students,
+        'marks': created_marks,
+        'seconds': round(elapsed, 2),
+        'marks_per_sec': round(created_marks / elapsed) if elapsed else math.inf,
+    }
@@ -1,3 +1,1715 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+import signal
+import socket
+import tempfile
+import zipfile
+import zlib
+from contextlib import contextmanager
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    benchmarks, changes, compression, events, jobs, processes, progression, rankings, renderers, search,
+    slips, synthetic
+)
+from .authentication import tokens_for, user_cache
+from .benchmarks import EventStream, contended_sqlite, keeping_connections, sqlite_profile
+from .bulk import admit_students, hash_passwords, upsert_marks
+from .catalogue import get_catalogue
+from .db import ReadReplicaRouter, read_replica
+from .metrics import registry as metrics_registry
+from .middleware import RequestMetricsMiddleware
+from .models import User, Programme, Student, Unit, Mark, MarkTombstone, StudentStanding, Job
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .views import (
+    AsyncMeView, AsyncMyMarksStreamView, AsyncMyMarksView, AsyncMyProfileView,
+    MarkViewSet, StudentViewSet, UnitViewSet
+)
+
+FULL_SCAN = re.compile(r'\bSCAN (erp_\w+)\b(?! USING)')
+
+
+def make_student(programme, username, reg_number, year=1):
+    user = User.objects.create_user(username=username, password='pw', role='student')
+    return Student.objects.create(user=user, reg_number=reg_number,
+                                  programme=programme, year_of_study=year)
+
+
+@contextmanager
+def shared_cache():
+    """A file-based default cache; run_worker refuses the per-process LocMemCache."""
+    with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}):
+        yield
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN QUERY PLAN every query the filtered endpoints run and fail if
+    SQLite falls back to a full table scan of one of our tables.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.units = [
+            Unit.objects.create(code=f'CS1{i}', name=f'Unit {i}', programme=cls.programme,
+                                year=1, semester=1 + i % 2)
+            for i in range(4)
+        ]
+        cls.student = make_student(cls.programme, 'alice', 'MU/CS/001')
+        for unit in cls.units:
+            Mark.objects.create(student=cls.student, unit=unit, cat_score=20, exam_score=45)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def assertNoFullScans(self, queries):
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                self.assertIsNone(FULL_SCAN.search(plan), f"{query['sql']}\n{plan}")
+
+    def get(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(ctx.captured_queries)
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_full_scan_pattern(self):
+        # without the \b the name could backtrack a letter and slip past the lookahead
+        self.assertRegex('SCAN erp_mark', FULL_SCAN)
+        self.assertNotRegex('SCAN erp_mark USING COVERING INDEX erp_mark_student_idx', FULL_SCAN)
+        self.assertNotRegex('SCAN erp_mark USING INDEX erp_mark_unit_idx', FULL_SCAN)
+
+    @override_settings(ERP_CATALOGUE_CACHE=False)  # the cached path reads the whole catalogue on purpose
+    def test_units_by_programme_year_semester(self):
+        self.get(self.admin, f'/api/units/?programme={self.programme.pk}&year=1&semester=2')
+
+    def test_my_marks(self):
+        self.get(self.student.user, '/api/my/marks/')
+
+    def test_my_profile(self):
+        self.get(self.student.user, '/api/my/profile/')
+
+    def test_student_marks(self):
+        self.get(self.admin, f'/api/students/{self.student.pk}/marks/')
+
+    def test_marks_by_student(self):
+        self.get(self.admin, f'/api/marks/?student={self.student.pk}')
+
+    def test_marks_by_unit_and_grade(self):
+        self.get(self.admin, f'/api/marks/?unit={self.units[0].pk}&grade=B')
+
+    def test_mark_changes(self):
+        cursor = changes.encode_cursor(timezone.now() - datetime.timedelta(days=1), changes.UPSERT, 1)
+        self.get(self.admin, f'/api/marks/changes/?since={cursor}')
+
+    def test_cohort_lookup(self):
+        qs = Student.objects.filter(programme=self.programme, year_of_study=1)
+        self.assertNotRegex(qs.explain(), FULL_SCAN)
+
+
+class ResultsCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.unit = Unit.objects.create(code='CS101', name='Programming', programme=programme,
+                                       year=1, semester=1)
+        cls.student = make_student(programme, 'alice', 'MU/CS/001')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student.user)
+
+    def test_repeat_reads_skip_marks_query(self):
+        self.client.get('/api/my/marks/')
+        with self.assertNumQueries(1):  # the Student lookup only
+            response = self.client.get('/api/my/marks/')
+        self.assertEqual(response.json(), [])
+
+    def test_mark_write_invalidates(self):
+        self.client.get('/api/my/marks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Mark.objects.create(student=self.student, unit=self.unit, cat_score=20, exam_score=50)
+        response = self.client.get('/api/my/marks/')
+        self.assertEqual([m['grade'] for m in response.json()], ['A'])
+
+    def test_bulk_upload_invalidates(self):
+        self.client.get('/api/my/marks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_marks([{'reg_number': 'MU/CS/001', 'unit_code': 'CS101',
+                           'cat_score': 10, 'exam_score': 25}])
+        response = self.client.get('/api/my/marks/')
+        self.assertEqual([m['grade'] for m in response.json()], ['E'])
+
+    def test_unit_rename_invalidates(self):
+        Mark.objects.create(student=self.student, unit=self.unit, cat_score=20, exam_score=50)
+        etag = self.client.get('/api/my/marks/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            unit = Unit.objects.get(pk=self.unit.pk)
+            unit.name = 'Programming I'
+            unit.save()
+        response = self.client.get('/api/my/marks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['unit_name'] for m in response.json()], ['Programming I'])
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_reassigned_mark_leaves_previous_student(self):
+        other = make_student(self.unit.programme, 'bob', 'MU/CS/002')
+        mark = Mark.objects.create(student=self.student, unit=self.unit, cat_score=20, exam_score=50)
+        self.client.get('/api/my/marks/')
+        mark = Mark.objects.get(pk=mark.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            mark.student = other
+            mark.save()
+        self.assertEqual(self.client.get('/api/my/marks/').json(), [])
+
+
+class MarkEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.unit = Unit.objects.create(code='CS101', name='Programming', programme=cls.programme,
+                                       year=1, semester=1)
+        cls.student = make_student(cls.programme, 'alice', 'MU/CS/001')
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.mark = Mark.objects.create(student=self.student, unit=self.unit,
+                                        cat_score=10, exam_score=20)
+
+    def test_patch_returns_recomputed_total_and_grade(self):
+        response = self.client.patch(f'/api/marks/{self.mark.pk}/', {'exam_score': 60}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()['total'], response.json()['grade']), (70.0, 'A'))
+
+    def test_put_returns_recomputed_total_and_grade(self):
+        response = self.client.put(f'/api/marks/{self.mark.pk}/', {
+            'student': self.student.pk, 'unit': self.unit.pk, 'cat_score': 15, 'exam_score': 30,
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()['total'], response.json()['grade']), (45.0, 'D'))
+
+    def test_bulk_json_counts_created_and_updated(self):
+        Unit.objects.create(code='CS102', name='Discrete Maths', programme=self.programme,
+                            year=1, semester=1)
+        response = self.client.post('/api/marks/bulk/', [
+            {'reg_number': 'MU/CS/001', 'unit_code': 'CS101', 'cat_score': 25, 'exam_score': 50},
+            {'student': self.student.pk, 'unit_code': 'CS102', 'cat_score': 5, 'exam_score': 30},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {'created': 1, 'updated': 1, 'errors': []})
+        self.mark.refresh_from_db()
+        self.assertEqual(self.mark.grade, 'A')
+
+    def test_bulk_reports_rejected_rows(self):
+        response = self.client.post('/api/marks/bulk/', {'rows': [
+            {'reg_number': 'MU/CS/001', 'unit_code': 'CS101', 'cat_score': 20, 'exam_score': 40},
+            {'reg_number': 'MU/CS/999', 'unit_code': 'CS101', 'exam_score': 40},
+            {'reg_number': 'MU/CS/001', 'unit_code': 'CS101', 'exam_score': 'lots'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual((body['created'], body['updated']), (0, 1))
+        self.assertEqual([error['row'] for error in body['errors']], [2, 3])
+        self.assertIn('student', body['errors'][0]['errors'])
+        self.assertIn('exam_score', body['errors'][1]['errors'])
+
+    def test_bulk_rejects_all_invalid(self):
+        response = self.client.post('/api/marks/bulk/', [{'reg_number': 'MU/CS/999', 'unit_code': 'XX'}],
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['errors'],
+                         {'student': ['Student not found.'], 'unit': ['Unit not found.']})
+
+    def test_bulk_csv_body_and_file(self):
+        body = 'reg_number,unit_code,cat_score,exam_score\nMU/CS/001,CS101,12,40\n'
+        response = self.client.post('/api/marks/bulk/', body, content_type='text/csv')
+        self.assertEqual(response.json(), {'created': 0, 'updated': 1, 'errors': []})
+        upload = SimpleUploadedFile('marks.csv', body.replace('12,40', '30,45').encode())
+        response = self.client.post('/api/marks/bulk/', {'file': upload}, format='multipart')
+        self.assertEqual(response.json(), {'created': 0, 'updated': 1, 'errors': []})
+        self.mark.refresh_from_db()
+        self.assertEqual(self.mark.total, 75)
+
+    def test_bulk_file_must_be_utf8(self):
+        upload = SimpleUploadedFile('marks.csv', 'reg_number,unit_code\nMU/CS/001,CS10\xe9\n'.encode('latin-1'))
+        response = self.client.post('/api/marks/bulk/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('CSV parse error', response.json()['detail'])
+
+    def test_unit_filter_must_be_a_number(self):
+        response = self.client.get('/api/marks/?unit=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('unit', response.json())
+
+    def test_min_total_must_be_a_finite_number(self):
+        for value in ('abc', 'NaN', 'Infinity', '-Infinity', 'sNaN'):
+            response = self.client.get(f'/api/marks/?min_total={value}')
+            self.assertEqual(response.status_code, 400, value)
+            self.assertEqual(response.json(), {'min_total': 'A number is required.'})
+        self.assertEqual(len(self.client.get('/api/marks/?min_total=29.5').json()['results']), 1)
+
+
+class MarkExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.units = [Unit.objects.create(code=f'CS{year}01', name=f'Year {year}', programme=cls.programme,
+                                         year=year, semester=1)
+                     for year in (1, 2)]
+        cls.student = make_student(cls.programme, 'alice', 'MU/CS/001')
+        for unit, exam in zip(cls.units, (50, 30)):
+            Mark.objects.create(student=cls.student, unit=unit, cat_score=20, exam_score=exam)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, query):
+        response = self.client.get(f'/api/marks/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        return response, rows
+
+    def test_csv_for_programme_and_year(self):
+        response, rows = self.export(f'programme={self.programme.pk}&year=2')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'filename="marks-programme{self.programme.pk}-year2.csv"',
+                      response['Content-Disposition'])
+        self.assertEqual(rows[0][:2], ['reg_number', 'first_name'])
+        self.assertEqual([(row[4], row[-2], row[-1]) for row in rows[1:]], [('CS201', '50.00', 'C')])
+
+    def test_unfiltered_export_has_every_mark(self):
+        response, rows = self.export('')
+        self.assertIn('filename="marks.csv"', response['Content-Disposition'])
+        self.assertEqual([row[4] for row in rows[1:]], ['CS101', 'CS201'])
+
+    def test_filters_must_be_numbers(self):
+        for query in ('year=abc', 'semester=1&programme=CS', 'unit=1;rm'):
+            response = self.client.get(f'/api/marks/export/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+        self.assertEqual(self.client.get('/api/marks/export/?year=x&background=1').status_code, 400)
+
+    def test_students_cannot_export(self):
+        self.client.force_authenticate(self.student.user)
+        self.assertEqual(self.client.get('/api/marks/export/').status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(TestCase):
+    """
+    SQL query budgets for the hot endpoints, authenticated with real JWTs.
+    `manage.py benchmark api` reports the same numbers against a large
+    dataset; lower a budget when an endpoint gets cheaper, never raise it
+    without a reason.
+    """
+    BUDGETS = {
+        'login': 3,  # user, student id for the token claims, outstanding token
+        'my_marks': 1,
+        'my_profile': 1,
+        'marks_list': 1,
+        'units_filtered': 1,  # catalogue version stamp; the rows come from the in-process catalogue
+        'mark_upload': 10,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.units = [
+            Unit.objects.create(code=f'CS1{i}', name=f'Unit {i}', programme=cls.programme,
+                                year=1, semester=1 + i % 2)
+            for i in range(4)
+        ]
+        cls.student = make_student(cls.programme, 'alice', 'MU/CS/001')
+        for unit in cls.units[:3]:
+            Mark.objects.create(student=cls.student, unit=unit, cat_score=20, exam_score=45)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, username):
+        response = self.client.post('/api/auth/login/', {'username': username, 'password': 'pw'},
+                                    content_type='application/json')
+        return {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+
+    def assertWithinBudget(self, name, call):
+        with CaptureQueriesContext(connection) as ctx:
+            response = call()
+        self.assertLess(response.status_code, 400, response.content)
+        self.assertLessEqual(len(ctx.captured_queries), self.BUDGETS[name],
+                             '\n'.join(q['sql'] for q in ctx.captured_queries))
+
+    def test_login(self):
+        self.assertWithinBudget('login', lambda: self.client.post(
+            '/api/auth/login/', {'username': 'alice', 'password': 'pw'},
+            content_type='application/json'))
+
+    def test_my_marks(self):
+        auth = self.login('alice')
+        self.assertWithinBudget('my_marks', lambda: self.client.get('/api/my/marks/', **auth))
+
+    def test_my_profile(self):
+        auth = self.login('alice')
+        self.assertWithinBudget('my_profile', lambda: self.client.get('/api/my/profile/', **auth))
+
+    def test_marks_list(self):
+        auth = self.login('admin')
+        self.assertWithinBudget('marks_list', lambda: self.client.get('/api/marks/', **auth))
+
+    def test_units_filtered(self):
+        auth = self.login('admin')
+        url = f'/api/units/?programme={self.programme.pk}&year=1&semester=1'
+        self.client.get(url, **auth)  # loads the catalogue
+        self.assertWithinBudget('units_filtered', lambda: self.client.get(url, **auth))
+
+    def test_mark_upload(self):
+        auth = self.login('admin')
+        data = {'student': self.student.pk, 'unit': self.units[3].pk,
+                'cat_score': 20, 'exam_score': 50}
+        self.assertWithinBudget('mark_upload', lambda: self.client.post(
+            '/api/marks/', data, content_type='application/json', **auth))
+
+    def test_benchmarks_leave_the_shared_cache_alone(self):
+        def scenario(out):
+            cache.set('bench-entry', 1)
+            cache.clear()
+            cache.set('bench-entry', 2)
+            return cache.get('bench-entry')
+
+        cache.set('shared-entry', 'kept')
+        with mock.patch.dict(benchmarks.SCENARIOS, {'probe': scenario}):
+            self.assertEqual(benchmarks.run('probe', StringIO()), 2)
+        self.assertEqual(cache.get('shared-entry'), 'kept')
+        self.assertIsNone(cache.get('bench-entry'))
+        with override_settings(CACHES=benchmarks.BENCHMARK_CACHES):
+            self.assertIsNone(cache.get('bench-entry'))  # cleared after the run
+
+
+@override_settings(MIDDLEWARE=['erp.middleware.RequestMetricsMiddleware'] + settings.MIDDLEWARE,
+                   ERP_NPLUSONE_THRESHOLD=2)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        metrics_registry.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get('/api/programmes/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;')
+        metrics = self.client.get('/api/_metrics/').content.decode()
+        self.assertIn('erp_request_duration_seconds_count{view="programme-list",method="GET"} 1',
+                      metrics)
+
+    def test_repeated_template_is_flagged(self):
+        def view(request):
+            for _ in range(3):
+                list(Programme.objects.filter(pk=1))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        with self.assertLogs('erp.middleware', 'WARNING'):
+            RequestMetricsMiddleware(view)(request)
+        self.assertIn('erp_request_n_plus_one_total{view="unmatched",method="GET"} 1',
+                      metrics_registry.render())
+
+
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.student = make_student(programme, 'alice', 'MU/CS/001')
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        user_cache.clear()
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {tokens_for(user).access_token}'}
+
+    def test_student_endpoints_resolve_student_from_claims(self):
+        auth = self.auth(self.student.user)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/my/profile/', **auth)
+        self.assertEqual(response.json()['reg_number'], 'MU/CS/001')
+
+    def test_role_claim_gates_admin_endpoints(self):
+        response = self.client.get('/api/students/', **self.auth(self.student.user))
+        self.assertEqual(response.status_code, 403)
+
+    def test_me_uses_user_cache(self):
+        auth = self.auth(self.admin)
+        self.client.get('/api/auth/me/', **auth)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/me/', **auth)
+        self.assertEqual(response.json()['username'], 'admin')
+
+    def test_user_cache_invalidated_on_save(self):
+        auth = self.auth(self.admin)
+        self.client.get('/api/auth/me/', **auth)
+        self.admin.first_name = 'Ada'
+        self.admin.save()
+        self.assertEqual(self.client.get('/api/auth/me/', **auth).json()['first_name'], 'Ada')
+
+    def test_tokens_without_claims_still_work(self):
+        token = RefreshToken.for_user(self.student.user).access_token
+        response = self.client.get('/api/my/profile/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.json()['reg_number'], 'MU/CS/001')
+
+
+class StatisticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.unit = Unit.objects.create(code='CS101', name='Programming', programme=cls.programme,
+                                       year=1, semester=1)
+        cls.students = [make_student(cls.programme, f's{i}', f'MU/CS/{i:03d}') for i in range(5)]
+        for student, (cat, exam) in zip(cls.students[:4], [(25, 50), (20, 45), (10, 35), (5, 15)]):
+            Mark.objects.create(student=student, unit=cls.unit, cat_score=cat, exam_score=exam)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_unit_stats(self):
+        stats = self.client.get(f'/api/units/{self.unit.pk}/stats/').json()
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual(stats['mean'], 51.25)
+        self.assertEqual(stats['median'], 55.0)
+        self.assertEqual((stats['min'], stats['max']), (20.0, 75.0))
+        self.assertEqual(stats['std_dev'], 21.03)
+        self.assertEqual(stats['pass_rate'], 75.0)
+        self.assertEqual(stats['grades'], {'A': 1, 'B': 1, 'C': 0, 'D': 1, 'E': 1})
+
+    def test_std_dev_of_equal_totals_is_zero(self):
+        unit = Unit.objects.create(code='CS102', name='Discrete Maths', programme=self.programme,
+                                   year=1, semester=1)
+        for student in self.students[:3]:
+            Mark.objects.create(student=student, unit=unit, cat_score='11.10', exam_score='22.23')
+        self.assertEqual(self.client.get(f'/api/units/{unit.pk}/stats/').json()['std_dev'], 0.0)
+
+    def test_cached_until_mark_write(self):
+        url = f'/api/units/{self.unit.pk}/stats/'
+        self.client.get(url)
+        with self.assertNumQueries(1):  # get_object only
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Mark.objects.create(student=self.students[4], unit=self.unit, cat_score=30, exam_score=70)
+        self.assertEqual(self.client.get(url).json()['count'], 5)
+
+    def test_programme_stats_by_unit(self):
+        url = f'/api/programmes/{self.programme.pk}/stats/?year=1&semester=1'
+        stats = self.client.get(url).json()
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual([u['unit_code'] for u in stats['units']], ['CS101'])
+        self.assertEqual(self.client.get(url + '&semester=x').status_code, 400)
+        self.assertEqual(self.client.get(
+            f'/api/programmes/{self.programme.pk}/stats/?semester=2').json()['count'], 0)
+
+    def test_moving_a_mark_expires_the_old_units_stats(self):
+        other = Programme.objects.create(name='Mathematics', code='MA')
+        unit = Unit.objects.create(code='MA101', name='Calculus', programme=other, year=1, semester=1)
+        unit_url, programme_url = f'/api/units/{self.unit.pk}/stats/', f'/api/programmes/{self.programme.pk}/stats/'
+        self.assertEqual(self.client.get(unit_url).json()['count'], 4)
+        self.assertEqual(self.client.get(programme_url).json()['count'], 4)
+        mark = Mark.objects.get(student=self.students[0], unit=self.unit)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/marks/{mark.pk}/', {'unit': unit.pk}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.client.get(unit_url).json()['count'], 3)
+        self.assertEqual(self.client.get(programme_url).json()['count'], 3)
+        self.assertEqual(self.client.get(f'/api/units/{unit.pk}/stats/').json()['count'], 1)
+
+    def test_students_cannot_read_stats(self):
+        self.client.force_authenticate(self.students[0].user)
+        self.assertEqual(self.client.get(f'/api/units/{self.unit.pk}/stats/').status_code, 403)
+
+
+class RankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.units = [Unit.objects.create(code=f'CS10{i}', name=f'Unit {i}', programme=programme,
+                                         year=1, semester=1) for i in range(2)]
+        cls.alice, cls.bob, cls.carol = (
+            make_student(programme, name, f'MU/CS/{i:03d}') for i, name in enumerate(['alice', 'bob', 'carol'])
+        )
+        cls.other_year = make_student(programme, 'dan', 'MU/CS/100', year=2)
+
+    def add_mark(self, student, unit, cat, exam):
+        with self.captureOnCommitCallbacks(execute=True):
+            Mark.objects.create(student=student, unit=unit, cat_score=cat, exam_score=exam)
+
+    def standing(self, student):
+        return StudentStanding.objects.get(student=student)
+
+    def test_mark_writes_update_sum_mean_and_rank(self):
+        self.add_mark(self.alice, self.units[0], 20, 40)
+        self.add_mark(self.bob, self.units[0], 25, 50)
+        self.add_mark(self.other_year, self.units[0], 0, 10)
+        self.assertEqual(self.standing(self.bob).rank, 1)
+        self.assertEqual(self.standing(self.other_year).cohort_size, 1)
+
+        self.add_mark(self.alice, self.units[1], 30, 70)
+        alice = self.standing(self.alice)
+        self.assertEqual((alice.unit_count, alice.total_sum, alice.mean_total), (2, 160, 80))
+        self.assertEqual((alice.rank, alice.cohort_size, alice.percentile), (1, 2, 100.0))
+        self.assertEqual(self.standing(self.bob).rank, 2)
+
+    def test_bulk_upload_and_rebuild_agree(self):
+        rows = [{'student': s.pk, 'unit': u.pk, 'cat_score': 10 + i, 'exam_score': 30 + i}
+                for i, (s, u) in enumerate((s, u) for s in (self.alice, self.bob, self.carol)
+                                           for u in self.units)]
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_marks(rows)
+        incremental = list(StudentStanding.objects.order_by('pk').values())
+        self.assertEqual([row['rank'] for row in incremental[:3]], [3, 2, 1])
+        rankings.rebuild()
+        self.assertEqual(list(StudentStanding.objects.order_by('pk').values()), incremental)
+
+    def test_deleting_last_mark_unranks(self):
+        self.add_mark(self.alice, self.units[0], 20, 40)
+        self.add_mark(self.bob, self.units[0], 10, 40)
+        with self.captureOnCommitCallbacks(execute=True):
+            Mark.objects.filter(student=self.alice).delete()
+        self.assertFalse(StudentStanding.objects.filter(student=self.alice).exists())
+        self.assertEqual((self.standing(self.bob).rank, self.standing(self.bob).cohort_size), (1, 1))
+
+    def test_rank_endpoints(self):
+        self.add_mark(self.alice, self.units[0], 20, 40)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {tokens_for(self.alice.user).access_token}'}
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/my/rank/', **auth)
+        self.assertEqual(response.json()['rank'], 1)
+        self.assertEqual(response.json()['percentile'], 100.0)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {tokens_for(self.bob.user).access_token}'}
+        self.assertEqual(self.client.get('/api/my/rank/', **auth).status_code, 404)
+
+    def test_student_rank_looks_up_the_student(self):
+        self.add_mark(self.alice, self.units[0], 20, 40)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin', password='pw', role='admin'))
+        self.assertEqual(client.get(f'/api/students/{self.alice.pk}/rank/').json()['rank'], 1)
+        self.assertEqual(client.get(f'/api/students/{self.bob.pk}/rank/').json(),
+                         {'detail': 'No ranked marks yet.'})
+        self.assertEqual(client.get('/api/students/abc/rank/').status_code, 404)
+        response = client.get(f'/api/students/{self.carol.pk + 100}/rank/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotEqual(response.json(), {'detail': 'No ranked marks yet.'})
+
+
+class AsyncSelfServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        programme = Programme.objects.create(name='Computer Science', code='CS')
+        unit = Unit.objects.create(code='CS101', name='Programming', programme=programme,
+                                   year=1, semester=1)
+        cls.student = make_student(programme, 'alice', 'MU/CS/001')
+        Mark.objects.create(student=cls.student, unit=unit, cat_score=20, exam_score=50)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+
+    def auth(self, user):
+        return f'Bearer {tokens_for(user).access_token}'
+
+    async def call(self, view, path, auth=None):
+        headers = {'Authorization': auth} if auth else {}
+        return await view.as_view()(AsyncRequestFactory().get(path, headers=headers))
+
+    async def test_same_json_as_sync_views(self):
+        auth = await sync_to_async(self.auth)(self.student.user)
+        for view, path in [(AsyncMyMarksView, '/api/my/marks/'),
+                           (AsyncMyMarksView, '/api/my/marks/?fields=unit_code,grade'),
+                           (AsyncMyProfileView, '/api/my/profile/'),
+                           (AsyncMeView, '/api/auth/me/')]:
+            response = await self.call(view, path, auth)
+            expected = await sync_to_async(self.client.get)(path, HTTP_AUTHORIZATION=auth)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content, path)
+
+    async def test_authentication_and_role(self):
+        response = await self.call(AsyncMyMarksView, '/api/my/marks/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = await self.call(AsyncMyMarksView, '/api/my/marks/', 'Bearer nonsense')
+        self.assertEqual(response.status_code, 401)
+        auth = await sync_to_async(self.auth)(self.admin)
+        self.assertEqual((await self.call(AsyncMyProfileView, '/api/my/profile/', auth)).status_code, 403)
+        self.assertEqual((await self.call(AsyncMeView, '/api/auth/me/', auth)).status_code, 200)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.unit = Unit.objects.create(code='CS101', name='Programming', programme=cls.programme,
+                                       year=1, semester=1)
+        cls.student = make_student(cls.programme, 'alice', 'MU/CS/001')
+        Mark.objects.create(student=cls.student, unit=cls.unit, cat_score=20, exam_score=50)
+
+    def setUp(self):
+        cache.clear()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {tokens_for(self.student.user).access_token}'}
+
+    def test_my_marks_revalidates_without_queries(self):
+        etag = self.client.get('/api/my/marks/', **self.auth)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/my/marks/', HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertNotEqual(self.client.get('/api/my/marks/?fields=grade', **self.auth)['ETag'], etag)
+
+        mark = Mark.objects.get(student=self.student)
+        mark.exam_score = 60
+        with self.captureOnCommitCallbacks(execute=True):
+            mark.save()
+        response = self.client.get('/api/my/marks/', HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['total'], 80.0)
+
+    async def test_async_view_answers_304(self):
+        auth = self.auth['HTTP_AUTHORIZATION']
+        first = await AsyncMyMarksView.as_view()(
+            AsyncRequestFactory().get('/api/my/marks/', headers={'Authorization': auth}))
+        second = await AsyncMyMarksView.as_view()(AsyncRequestFactory().get(
+            '/api/my/marks/', headers={'Authorization': auth, 'If-None-Match': first['ETag']}))
+        self.assertEqual(second.status_code, 304)
+
+    def test_catalogue_etag_follows_version_and_url(self):
+        url = f'/api/units/?programme={self.programme.pk}'
+        response = self.client.get(url, **self.auth)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified,
+                                         **self.auth).status_code, 304)
+        self.assertNotEqual(self.client.get('/api/units/', **self.auth)['ETag'], etag)
+
+        Unit.objects.create(code='CS102', name='Maths', programme=self.programme, year=1, semester=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertEqual(self.client.get('/api/programmes/', HTTP_IF_NONE_MATCH=etag,
+                                         **self.auth).status_code, 200)
+
+
+class CatalogueCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programmes = [Programme.objects.create(name=f'Programme {code}', code=code) for code in ('CS', 'IT')]
+        for i in range(7):
+            Unit.objects.create(code=f'U{i}', name=f'Unit {i}', programme=cls.programmes[i % 2],
+                                year=1 + i % 3, semester=1 + i % 2)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def pages(self, url):
+        """Every page of a list, following `next` and then `previous` back."""
+        pages = [self.client.get(url).json()]
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).json())
+        back = pages[-1]
+        while back['previous']:
+            back = self.client.get(back['previous']).json()
+            pages.append(back)
+        return [page['results'] for page in pages]
+
+    def test_same_responses_as_the_database(self):
+        urls = ['/api/units/?page_size=2', f'/api/units/?programme={self.programmes[0].pk}&page_size=2',
+                f'/api/units/?programme={self.programmes[1].pk}&year=2&semester=1', '/api/units/?year=1']
+        cached = {url: self.pages(url) for url in urls}
+        unit = Unit.objects.get(code='U3')
+        single = {url: self.client.get(url).json() for url in ['/api/programmes/', f'/api/units/{unit.pk}/',
+                                                                f'/api/programmes/{self.programmes[1].pk}/']}
+        with override_settings(ERP_CATALOGUE_CACHE=False):
+            self.assertEqual(cached, {url: self.pages(url) for url in urls})
+            self.assertEqual(single, {url: self.client.get(url).json() for url in single})
+        self.assertEqual(self.client.get('/api/units/999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/units/?year=x').status_code, 400)
+
+    def test_served_from_memory_until_a_write(self):
+        self.client.get('/api/units/')
+        with self.assertNumQueries(1):  # the version stamp
+            self.assertEqual(len(self.client.get('/api/units/').json()['results']), 7)
+
+        programme = self.programmes[0]
+        programme.name = 'Renamed'
+        programme.save()
+        Unit.objects.create(code='U9', name='New', programme=programme, year=4, semester=1)
+        units = self.client.get(f'/api/units/?programme={programme.pk}&year=4').json()['results']
+        self.assertEqual([(u['code'], u['programme_name']) for u in units], [('U9', 'Renamed')])
+
+    def test_lookups(self):
+        catalogue = get_catalogue()
+        cs = catalogue.programmes_by_code['CS']
+        self.assertEqual(catalogue.units_by_code['U2'].programme_id, cs.id)
+        self.assertEqual([u.code for u in catalogue.find_units(cs.id, 1, 1)], ['U0', 'U6'])
+        self.assertEqual([u.code for u in catalogue.find_units(year=2)], ['U1', 'U4'])
+        self.assertEqual([u.code for u in catalogue.programme_units(cs.id, 2)], ['U0', 'U4', 'U6'])
+        self.assertIs(get_catalogue(), catalogue)
+
+
+@override_settings(ERP_CHANGES_SETTLE_SECONDS=0)
+class MarkChangeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.units = [Unit.objects.create(code=f'CS10{i}', name=f'Unit {i}', programme=cls.programme,
+                                         year=1, semester=1) for i in range(5)]
+        cls.student = make_student(cls.programme, 'alice', 'MU/CS/001')
+        cls.marks = [Mark.objects.create(student=cls.student, unit=unit, cat_score=20, exam_score=40 + i)
+                     for i, unit in enumerate(cls.units)]
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def feed(self, since=None, **params):
+        response = self.client.get('/api/marks/changes/', {**({'since': since} if since else {}), **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def sync(self, since=None):
+        """Follow the feed to its end: (changes, last cursor)."""
+        seen = []
+        while True:
+            page = self.feed(since, limit=2)
+            seen += page['changes']
+            since = page['next']
+            if not page['has_more']:
+                return seen, since
+
+    def test_full_sync_in_pages(self):
+        seen, cursor = self.sync()
+        self.assertEqual([c['id'] for c in seen], [mark.pk for mark in self.marks])
+        self.assertEqual({c['op'] for c in seen}, {'upsert'})
+        self.assertEqual(seen[0]['total'], 60.0)
+        empty = self.feed(cursor)
+        self.assertEqual((empty['changes'], empty['has_more']), ([], False))
+        self.assertEqual(self.feed(empty['next'])['changes'], [])
+
+    def test_updates_and_deletes_after_the_cursor(self):
+        _, cursor = self.sync()
+        updated, deleted = self.marks[3], self.marks[1]
+        deleted_id = deleted.pk
+        updated.exam_score = 70
+        updated.save()
+        deleted.delete()
+        page = self.feed(cursor)
+        self.assertEqual([(c['op'], c['id']) for c in page['changes']],
+                         [('upsert', updated.pk), ('delete', deleted_id)])
+        self.assertEqual(page['changes'][0]['total'], 90.0)
+        self.assertEqual((page['changes'][1]['student'], page['changes'][1]['unit']),
+                         (self.student.pk, deleted.unit_id))
+        self.assertEqual(self.feed(page['next'])['changes'], [])
+
+    def test_recent_changes_wait_to_settle(self):
+        with override_settings(ERP_CHANGES_SETTLE_SECONDS=60):
+            page = self.feed()
+        self.assertEqual(page['changes'], [])
+        self.assertEqual([c['id'] for c in self.sync(page['next'])[0]], [mark.pk for mark in self.marks])
+
+    def test_quiet_feed_advances_the_cursor(self):
+        _, cursor = self.sync()
+        now = timezone.now()
+
+        def days_later(days):
+            return mock.patch('django.utils.timezone.now', return_value=now + datetime.timedelta(days=days))
+
+        with days_later(100):
+            polled = self.feed(cursor)['next']
+        with days_later(200):  # nothing has changed since the sync
+            self.assertEqual(self.client.get('/api/marks/changes/', {'since': cursor}).status_code, 410)
+            self.assertEqual(self.feed(polled)['changes'], [])
+
+    def test_bad_and_expired_cursors(self):
+        self.assertEqual(self.client.get('/api/marks/changes/', {'since': 'nonsense'}).status_code, 400)
+        old = changes.encode_cursor(timezone.now() - datetime.timedelta(days=400), changes.UPSERT, 1)
+        self.assertEqual(self.client.get('/api/marks/changes/', {'since': old}).status_code, 410)
+        student = APIClient()
+        student.force_authenticate(self.student.user)
+        self.assertEqual(student.get('/api/marks/changes/').status_code, 403)
+
+    def test_purge_keeps_recent_tombstones(self):
+        kept = self.marks[0].pk
+        self.marks[0].delete()
+        MarkTombstone.objects.create(mark_id=999, student_id=1, unit_id=1,
+                                     deleted_at=timezone.now() - datetime.timedelta(days=400))
+        self.assertEqual(changes.purge_tombstones(), 1)
+        self.assertEqual(list(MarkTombstone.objects.values_list('mark_id', flat=True)), [kept])
+
+
+class ResultsStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        programme = Programme.objects.create(name='Computer Science', code='CS')
+        unit = Unit.objects.create(code='CS101', name='Programming', programme=programme,
+                                   year=1, semester=1)
+        cls.student = make_student(programme, 'alice', 'MU/CS/001')
+        cls.other = make_student(programme, 'bob', 'MU/CS/002')
+        cls.mark = Mark.objects.create(student=cls.student, unit=unit, cat_score=20, exam_score=50)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        cache.clear()
+        self.auth = f'Bearer {tokens_for(self.student.user).access_token}'
+        self.urlconf = override_settings(ROOT_URLCONF=(
+            path('api/my/marks/', AsyncMyMarksView.as_view()),
+            path('api/my/marks/stream/', AsyncMyMarksStreamView.as_view())))
+        self.urlconf.enable()
+        self.addCleanup(self.urlconf.disable)
+
+    def save_mark(self, exam_score):
+        self.mark.exam_score = exam_score
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark.save()
+
+    async def open(self, auth=None, **headers):
+        stream = EventStream(ASGIHandler(), '/api/my/marks/stream/',
+                             {'Authorization': auth or self.auth, **headers})
+        while stream.status is None and not stream.task.done():
+            await asyncio.sleep(0)
+        return stream
+
+    async def test_results_then_each_change(self):
+        with keeping_connections():
+            stream = await self.open(**{'Accept-Encoding': 'gzip'})
+            first = await stream.next_event()
+            self.assertEqual(stream.status, 200)
+            self.assertEqual(stream.headers['content-type'], 'text/event-stream')
+            self.assertNotIn('content-encoding', stream.headers)
+            expected = await self.async_client.get('/api/my/marks/', headers={'Authorization': self.auth})
+            self.assertEqual(first['id'], expected['ETag'])
+            self.assertEqual(first['data'].encode(), expected.content)
+
+            await sync_to_async(self.save_mark)(65)
+            second = await stream.next_event()
+            self.assertEqual(json.loads(second['data'])[0]['total'], 85.0)
+            self.assertNotEqual(second['id'], first['id'])
+            self.assertEqual(len(events.hub), 1)
+            await stream.close()
+        self.assertEqual(len(events.hub), 0)
+
+    async def test_reconnect_skips_unchanged_results(self):
+        with keeping_connections(), override_settings(ERP_EVENTS_HEARTBEAT_SECONDS=0):
+            stream = await self.open()
+            etag = (await stream.next_event())['id']
+            await stream.close()
+            stream = await self.open(**{'Last-Event-ID': etag})
+            self.assertIn('retry', await asyncio.wait_for(stream.events.get(), 5))
+            self.assertEqual(await asyncio.wait_for(stream.events.get(), 5), {'comment': 'keep-alive'})
+            await stream.close()
+            self.assertNotIn(b'event: marks', stream.body)
+
+    async def test_only_the_students_own_stream_wakes(self):
+        with keeping_connections():
+            stream = await self.open()
+            await stream.next_event()
+            self.assertEqual(await sync_to_async(events.hub.deliver)([self.other.pk]), 0)
+            self.assertEqual(await sync_to_async(events.hub.deliver)([self.student.pk]), 1)
+            await stream.close()
+
+    async def test_refusals(self):
+        admin = await sync_to_async(lambda: f'Bearer {tokens_for(self.admin).access_token}')()
+        with keeping_connections():
+            for auth, status in [('Bearer nonsense', 401), (admin, 403)]:
+                stream = await self.open(auth)
+                await stream.task
+                self.assertEqual(stream.status, status)
+            with override_settings(ERP_EVENTS_MAX_STREAMS=0):
+                stream = await self.open()
+                await stream.task
+                self.assertEqual((stream.status, stream.headers['retry-after']), (503, '60'))
+
+    async def test_relay_between_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            relay = events.Relay(directory)
+            hub = events.Hub()
+            relay.listen(hub)
+            subscription = hub.subscribe(self.student.pk)
+            # another worker publishing: a datagram to this process's socket
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+                sender.sendto(f'{self.other.pk},{self.student.pk}'.encode(), str(relay.path))
+            self.assertTrue(await subscription.wait(5))
+
+            peer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            peer.bind(os.path.join(directory, '1.sock'))
+            gone = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            gone.bind(os.path.join(directory, '2.sock'))
+            gone.close()  # a worker that exited without removing its socket
+            relay.send([3, 5])
+            self.assertEqual(peer.recv(100), b'3,5')
+            peer.close()
+            self.assertEqual(sorted(os.listdir(directory)), ['1.sock', f'{os.getpid()}.sock'])
+
+    def test_relay_needs_a_shared_cache(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(ERP_EVENTS_SOCKET_DIR=directory):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'LocMemCache is per process'):
+                events.relay()
+            with shared_cache():
+                self.assertEqual(events.relay().directory, Path(directory))
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.units = [Unit.objects.create(code=f'CS10{i}', name=f'Unit {i}', programme=cls.programme,
+                                         year=1, semester=1) for i in range(5)]
+        cls.student = make_student(cls.programme, 'alice', 'MU/CS/001')
+        for unit in cls.units:
+            Mark.objects.create(student=cls.student, unit=unit, cat_score=20, exam_score=40)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_following_next_visits_every_row_once(self):
+        seen, url = [], '/api/marks/?page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen += [mark['id'] for mark in page['results']]
+            url = page['next']
+        self.assertEqual(seen, sorted(Mark.objects.values_list('id', flat=True)))
+
+    def test_page_size_is_capped(self):
+        with mock.patch('erp.pagination.KeysetPagination.max_page_size', 3):
+            page = self.client.get('/api/units/?page_size=100').json()
+        self.assertEqual(len(page['results']), 3)
+        self.assertIsNotNone(page['next'])
+
+    def test_programmes_are_not_paginated(self):
+        self.assertEqual([p['code'] for p in self.client.get('/api/programmes/').json()], ['CS'])
+
+    def test_sparse_fields(self):
+        page = self.client.get('/api/marks/?fields=id,grade,nonsense').json()
+        self.assertEqual({tuple(sorted(mark)) for mark in page['results']}, {('grade', 'id')})
+        student = self.client.get(f'/api/students/{self.student.pk}/?fields=reg_number').json()
+        self.assertEqual(student, {'reg_number': 'MU/CS/001'})
+
+    def test_fields_do_not_trim_write_responses(self):
+        response = self.client.patch(f'/api/marks/{self.student.marks.first().pk}/?fields=id',
+                                     {'exam_score': 45}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('grade', response.json())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SyntheticDatasetTests(TestCase):
+    def seed(self, students, **options):
+        out = StringIO()
+        call_command('seed_data', students=students, marks_per_student=4, programmes=2,
+                     batch_size=7, stdout=out, **options)
+        return out.getvalue()
+
+    def scores(self):
+        return list(Mark.objects.order_by('student__reg_number', 'unit__code')
+                    .values_list('student__reg_number', 'unit__code', 'cat_score', 'exam_score'))
+
+    def test_generates_cohorts_in_batches(self):
+        output = self.seed(20, random_seed=1)
+        self.assertEqual(Student.objects.count(), 20)
+        self.assertEqual(Mark.objects.count(), 80)
+        self.assertEqual(output.count('students/s'), 3)  # batches of 7
+        self.assertEqual(StudentStanding.objects.count(), 20)
+        for student in Student.objects.select_related('programme'):
+            units = set(student.marks.values_list('unit__programme', 'unit__year'))
+            self.assertEqual(units, {(student.programme_id, student.year_of_study)})
+        user = User.objects.get(username='syn0000000')
+        self.assertTrue(user.check_password(synthetic.SYNTHETIC_PASSWORD))
+
+    def test_same_seed_same_dataset(self):
+        self.seed(10, random_seed=3)
+        first = self.scores()
+        Student.objects.all().delete()
+        User.objects.all().delete()
+        self.seed(10, random_seed=3)
+        self.assertEqual(self.scores(), first)
+
+    def test_reruns_add_new_students(self):
+        self.seed(5)
+        User.objects.filter(username='syn0000001').delete()
+        self.seed(5)
+        self.assertEqual(Student.objects.count(), 9)
+        self.assertTrue(User.objects.filter(username='syn0000009').exists())
+        self.assertEqual(Unit.objects.count(), 2 * synthetic.DURATION_YEARS * 4)
+
+
+class FastListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        programme = Programme.objects.create(name='Computer Science', code='CS')
+        units = [Unit.objects.create(code=f'CS10{i}', name=f'Unit {i}', programme=programme,
+                                     year=1, semester=1 + i % 2) for i in range(3)]
+        students = [make_student(programme, f's{i}', f'MU/CS/{i:03d}') for i in range(3)]
+        orphan = make_student(None, 'orphan', 'MU/XX/001')  # programme SET_NULL
+        Mark.objects.create(student=orphan, unit=units[0], cat_score=None, exam_score=None)
+        for i, (student, unit) in enumerate((s, u) for s in students for u in units):
+            Mark.objects.create(student=student, unit=unit, cat_score=10 + i, exam_score=Decimal('30.5'))
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertSameAsSerializer(self, viewset, url):
+        fast = self.client.get(url)
+        with mock.patch.object(viewset, 'fast_list', False):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content, url)
+        return fast.json()
+
+    def test_identical_json(self):
+        for viewset, url in [(MarkViewSet, '/api/marks/'),
+                             (MarkViewSet, '/api/marks/?fields=unit_code,total,grade&grade=e'),
+                             (StudentViewSet, '/api/students/'),
+                             (StudentViewSet, '/api/students/?fields=reg_number,programme_name'),
+                             (UnitViewSet, '/api/units/?semester=1')]:
+            self.assertSameAsSerializer(viewset, url)
+        orphan = self.client.get('/api/students/').json()['results'][-1]
+        self.assertEqual(orphan['programme'], None)
+        self.assertNotIn('programme_name', orphan)  # DRF skips sources through a null FK
+
+    def test_pagination_cursor_matches(self):
+        page = self.assertSameAsSerializer(MarkViewSet, '/api/marks/?page_size=4&fields=grade')
+        self.assertEqual(len(page['results']), 4)
+        self.assertSameAsSerializer(MarkViewSet, page['next'])
+
+    def test_fast_path_avoids_joins_it_does_not_need(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/marks/?fields=id,total')
+        self.assertNotIn('erp_unit', ctx.captured_queries[-1]['sql'])
+
+
+class FastJSONTests(SimpleTestCase):
+    data = [{
+        'total': Decimal('72.50'),
+        'uploaded_at': datetime.datetime(2024, 5, 1, 9, 30, 0, 250, tzinfo=datetime.timezone.utc),
+        'local': timezone.make_aware(datetime.datetime(2024, 5, 1, 12), timezone=datetime.timezone(
+            datetime.timedelta(hours=3))),
+        'naive': datetime.datetime(2024, 5, 1, 12),
+        'date': datetime.date(2024, 5, 1),
+        'label': gettext_lazy('Muranga'),
+        'name': 'Wanjirũ \u2028 Ng\'ang\'a',
+        'big': 2 ** 70,
+        1: None,
+    }]
+
+    def test_renderer_output_matches_drf(self):
+        for media_type in (None, 'application/json', 'application/json; indent=2'):
+            self.assertEqual(FastJSONRenderer().render(self.data, media_type),
+                             JSONRenderer().render(self.data, media_type), media_type)
+        small = self.data[0].copy()
+        del small['big']  # orjson handles this one itself
+        self.assertEqual(FastJSONRenderer().render(small), JSONRenderer().render(small))
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(small), JSONRenderer().render(small))
+
+    def parse(self, parser, body, encoding='utf-8'):
+        return parser.parse(io.BytesIO(body), parser_context={'encoding': encoding})
+
+    def parse_error(self, parser, body):
+        with self.assertRaises(ParseError) as ctx:
+            self.parse(parser, body)
+        return str(ctx.exception)
+
+    def test_parser_matches_drf(self):
+        for body in (b'{"cat_score": 12.5, "student": 3, "name": "Wanjir\xc5\xa9"}',
+                     b'[12345678901234567890123]'):
+            self.assertEqual(self.parse(FastJSONParser(), body), self.parse(JSONParser(), body))
+        self.assertEqual(self.parse(FastJSONParser(), b'"\xfc"', 'latin-1'), '\xfc')
+        for body in (b'{"a": NaN}', b'{"a": 1,}', b''):
+            self.assertEqual(self.parse_error(FastJSONParser(), body),
+                             self.parse_error(JSONParser(), body))
+
+
+@override_settings(ERP_COMPRESS_MIN_BYTES=500)
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        programme = Programme.objects.create(name='Computer Science', code='CS')
+        for i in range(10):
+            Unit.objects.create(code=f'CS1{i:02d}', name=f'Unit {i}', programme=programme,
+                                year=1, semester=1)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_gzip_above_threshold_only(self):
+        plain = self.client.get('/api/units/')
+        response = self.client.get('/api/units/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        revalidated = self.client.get('/api/units/', HTTP_ACCEPT_ENCODING='gzip',
+                                      HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        unit = Unit.objects.first()
+        small = self.client.get(f'/api/units/{unit.id}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertLess(len(small.content), 500)
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+    def test_brotli_preferred_when_available(self):
+        fake_brotli = mock.Mock(compress=lambda data, quality: zlib.compress(data))
+        plain = self.client.get('/api/units/')
+        with mock.patch.object(compression, 'brotli', fake_brotli):
+            response = self.client.get('/api/units/', HTTP_ACCEPT_ENCODING='gzip, br')
+            gzipped = self.client.get('/api/units/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(zlib.decompress(response.content), plain.content)
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+
+
+class JobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.unit = Unit.objects.create(code='CS101', name='Programming', programme=programme,
+                                       year=1, semester=1)
+        cls.students = [make_student(programme, f's{i}', f'MU/CS/{i:03d}') for i in range(3)]
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        self.enterContext(override_settings(ERP_JOB_FILES_DIR=files.name))
+        self.enterContext(shared_cache())
+
+    def run_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('run_worker', processes=0, burst=True, stdout=StringIO())
+
+    def test_background_import(self):
+        rows = [{'reg_number': s.reg_number, 'unit_code': 'CS101', 'cat_score': 20, 'exam_score': 50}
+                for s in self.students] + [{'reg_number': 'MU/XX/999', 'unit_code': 'CS101'}]
+        response = self.client.post('/api/marks/bulk/?background=1', rows, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'queued')
+        self.assertNotIn('params', response.json())
+        self.assertFalse(Mark.objects.exists())
+
+        self.run_worker()
+        job = self.client.get(response['Location']).json()
+        self.assertEqual((job['status'], job['progress'], job['total'], job['percent']),
+                         ('succeeded', 4, 4, 100))
+        self.assertEqual(job['result']['created'], 3)
+        self.assertEqual(job['result']['errors'][0]['row'], 4)
+        self.assertEqual(job['created_by'], 'admin')
+        self.assertEqual(Mark.objects.filter(total=70).count(), 3)
+        self.assertEqual(StudentStanding.objects.count(), 3)
+
+    def test_background_export_download(self):
+        for student in self.students:
+            Mark.objects.create(student=student, unit=self.unit, cat_score=10, exam_score=40)
+        streamed = b''.join(self.client.get(f'/api/marks/export/?unit={self.unit.pk}').streaming_content)
+        response = self.client.get(f'/api/marks/export/?unit={self.unit.pk}&background=1')
+        self.assertEqual(response.status_code, 202)
+        download = f"/api/jobs/{response.json()['id']}/download/"
+        self.assertEqual(self.client.get(download).status_code, 404)  # not run yet
+
+        self.run_worker()
+        self.assertEqual(self.client.get(response['Location']).json()['result']['rows'], 3)
+        file = self.client.get(download)
+        self.assertIn(f'marks-unit{self.unit.pk}.csv', file['Content-Disposition'])
+        self.assertEqual(b''.join(file.streaming_content), streamed)
+
+    def test_failures_are_recorded(self):
+        def boom(job, progress):
+            progress(1, 10)
+            raise RuntimeError('disk full')
+
+        with mock.patch.dict(jobs.HANDLERS, {'boom': boom}):
+            self.assertEqual(self.client.post('/api/jobs/', {'kind': 'nope'}, format='json').status_code, 400)
+            response = self.client.post('/api/jobs/', {'kind': 'boom', 'params': {}}, format='json')
+            self.assertEqual(response.status_code, 202)
+            with self.assertLogs('erp.jobs', 'ERROR'):
+                self.run_worker()
+        job = Job.objects.get(pk=response.json()['id'])
+        self.assertEqual((job.status, job.error), ('failed', 'RuntimeError: disk full'))
+        self.assertEqual([j['id'] for j in self.client.get('/api/jobs/?status=failed').json()['results']],
+                         [job.pk])
+
+    def test_interrupted_jobs_are_not_left_running(self):
+        def interrupted(job, progress):
+            raise KeyboardInterrupt
+
+        with mock.patch.dict(jobs.HANDLERS, {'interrupted': interrupted}):
+            job = jobs.enqueue('interrupted')
+            jobs.claim('a')
+            with self.assertRaises(KeyboardInterrupt):
+                jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'KeyboardInterrupt: '))
+
+    def test_pool_children_leave_ctrl_c_to_the_parent(self):
+        self.addCleanup(signal.signal, signal.SIGINT, signal.getsignal(signal.SIGINT))
+        processes.setup_child()
+        self.assertIs(signal.getsignal(signal.SIGINT), signal.SIG_IGN)
+
+    def test_claiming_is_exclusive(self):
+        queued = [jobs.enqueue('import_marks').pk for _ in range(3)]
+        self.assertEqual(jobs.claim('a', 2), queued[:2])
+        self.assertEqual(jobs.claim('b', 5), queued[2:])
+        self.assertEqual(jobs.claim('c'), [])
+        self.assertEqual(set(Job.objects.values_list('worker', flat=True)), {'a', 'b'})
+
+        Job.objects.filter(pk=queued[0]).update(lease_expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(jobs.requeue_expired(), 1)
+        self.assertEqual(jobs.claim('c'), queued[:1])
+
+    def test_heartbeat_keeps_quiet_jobs_leased(self):
+        jobs.enqueue('admit_students')
+        job_id, = jobs.claim('a', lease=60)
+        long_ago = timezone.now() - datetime.timedelta(hours=1)
+        Job.objects.filter(pk=job_id).update(updated_at=long_ago, lease_expires_at=long_ago)
+        heartbeat = jobs.Heartbeat('a', lease=60)
+        heartbeat.job_ids.add(job_id)
+        heartbeat.beat()  # no progress reported, yet the lease is renewed
+        self.assertEqual(jobs.requeue_expired(), 0)
+        self.assertGreater(Job.objects.get(pk=job_id).lease_expires_at, timezone.now())
+
+        self.assertEqual(jobs.renew('b', [job_id]), 0)  # only the claiming worker renews
+        Job.objects.filter(pk=job_id).update(lease_expires_at=long_ago)
+        self.assertEqual(jobs.requeue_expired(), 1)
+        self.assertEqual(Job.objects.get(pk=job_id).status, Job.QUEUED)
+
+    def test_worker_needs_a_shared_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaisesMessage(CommandError, 'LocMemCache'):
+                call_command('run_worker', processes=0, burst=True, stdout=StringIO())
+
+    def test_admin_only(self):
+        student_client = APIClient()
+        student_client.force_authenticate(self.students[0].user)
+        self.assertEqual(student_client.get('/api/jobs/').status_code, 403)
+
+
+class ResultsSlipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        units = [Unit.objects.create(code=f'CS10{i}', name=f'Unit {i}', programme=cls.programme,
+                                     year=1, semester=1 + i // 2) for i in range(4)]
+        cls.students = [make_student(cls.programme, f's{i}', f'MU/CS/{i:03d}') for i in range(3)]
+        for i, student in enumerate(cls.students):
+            for unit in units:
+                Mark.objects.create(student=student, unit=unit, cat_score=5 + 10 * i, exam_score=30)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        self.files = files.name
+
+    def test_one_streaming_query_per_run(self):
+        output = os.path.join(self.files, 'slips.zip')
+        with self.assertNumQueries(2):  # student count + the marks stream
+            summary = slips.generate({'programme': self.programme.pk, 'year': 1, 'semester': 2},
+                                     output, processes=0, batch_size=2)
+        self.assertEqual(summary['slips'], 3)
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(sorted(archive.namelist()),
+                             ['MU-CS-000.html', 'MU-CS-001.html', 'MU-CS-002.html'])
+            first = archive.read('MU-CS-000.html').decode()
+            top = archive.read('MU-CS-002.html').decode()
+        self.assertIn('CS102', first)
+        self.assertNotIn('CS101', first)  # semester 1 is out of scope
+        self.assertIn('Supplementary examination required in: CS102, CS103', first)
+        self.assertIn('Mean total: 55.00', top)
+        self.assertIn('Pass – proceed', top)
+
+    def test_directory_output(self):
+        slips.generate({}, os.path.join(self.files, 'out'), processes=0)
+        self.assertEqual(len(os.listdir(os.path.join(self.files, 'out'))), 3)
+
+    def test_pool_start_failure_is_raised(self):
+        path = os.path.join(self.files, 'slips.zip')
+        with mock.patch('erp.slips.ProcessPoolExecutor', side_effect=OSError('too many open files')):
+            with self.assertRaisesMessage(OSError, 'too many open files'):
+                slips.generate({}, path, processes=2)
+        with zipfile.ZipFile(path) as archive:  # closed properly, if empty
+            self.assertEqual(archive.namelist(), [])
+
+    def test_endpoint_queues_job_rendered_in_pool(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with override_settings(ERP_JOB_FILES_DIR=self.files), shared_cache():
+            response = client.post(f'/api/programmes/{self.programme.pk}/slips/?year=1&semester=1')
+            self.assertEqual(response.status_code, 202)
+            job = Job.objects.get(pk=response.json()['id'])
+            job.params['processes'] = 2
+            job.save()
+            call_command('run_worker', processes=0, burst=True, stdout=StringIO())
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.result['slips'], job.result['filename']),
+                             ('succeeded', 3, 'slips-CS-y1-s1.zip'))
+            download = client.get(f'/api/jobs/{job.pk}/download/')
+        with zipfile.ZipFile(io.BytesIO(b''.join(download.streaming_content))) as archive:
+            self.assertEqual(len(archive.namelist()), 3)
+
+
+FAST_HASHER = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+
+
+class AdmissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+        make_student(cls.programme, 'taken', 'MU/CS/999')
+
+    def intake(self, count, start=0):
+        return [{'first_name': 'Amina', 'last_name': f'Student{i}', 'email': f's{i}@example.com',
+                 'username': f'student{i}', 'password': f'secret-{i}', 'reg_number': f'MU/CS/{i:03d}',
+                 'programme_code': 'CS', 'year_of_study': '2' if i % 2 else None}
+                for i in range(start, start + count)]
+
+    def test_csv_intake_with_error_report(self):
+        rows = self.intake(2)
+        rows += [{**rows[0], 'username': 'taken', 'reg_number': 'MU/CS/500'},
+                 {**rows[0], 'username': 'fresh'},
+                 {**rows[1], 'username': 'other', 'reg_number': 'MU/CS/501', 'programme_code': 'XX'},
+                 {**rows[1], 'username': 'bad', 'reg_number': 'MU/CS/502', 'email': 'nope'}]
+        header = list(rows[0])
+        body = '\n'.join([','.join(header)] + [','.join(str(row[k] or '') for k in header) for row in rows])
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post('/api/students/bulk/', body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report['created'], 2)
+        self.assertEqual({e['row']: sorted(e['errors']) for e in report['errors']},
+                         {3: ['username'], 4: ['reg_number'], 5: ['programme'], 6: ['email']})
+        self.assertEqual(report['errors'][1]['errors']['reg_number'], ['Reg number repeats row 1.'])
+        student = Student.objects.select_related('user').get(reg_number='MU/CS/001')
+        self.assertEqual((student.year_of_study, student.programme, student.user.role),
+                         (2, self.programme, 'student'))
+        self.assertTrue(student.user.check_password('secret-1'))
+        self.assertEqual(Student.objects.get(reg_number='MU/CS/000').year_of_study, 1)
+
+    @FAST_HASHER
+    def test_rows_taken_while_hashing_are_reported(self):
+        def hash_while_another_intake_commits(passwords, processes):
+            make_student(self.programme, 'quick', 'MU/CS/001')
+            return [make_password(password) for password in passwords]
+
+        with mock.patch('erp.bulk.hash_passwords', hash_while_another_intake_commits):
+            result = admit_students(self.intake(2), processes=0)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [{'row': 2, 'errors': {'reg_number': ['Reg number already exists.']}}])
+
+    @FAST_HASHER
+    def test_conflicting_insert_is_409(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch.object(Student.objects, 'bulk_create', side_effect=IntegrityError('UNIQUE')):
+            response = client.post('/api/students/bulk/', self.intake(2), format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(User.objects.filter(username__startswith='student').exists())
+
+    @FAST_HASHER
+    @override_settings(ERP_ADMIT_INLINE_MAX_ROWS=2)
+    def test_large_intake_is_queued(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.post('/api/students/bulk/', self.intake(2), format='json').status_code, 200)
+        response = client.post('/api/students/bulk/', self.intake(3, start=2), format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get(pk=response.json()['id']).kind, 'admit_students')
+        self.assertFalse(Student.objects.filter(reg_number='MU/CS/002').exists())
+
+    @FAST_HASHER
+    def test_query_count_does_not_grow_with_intake(self):
+        def queries(rows):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(admit_students(rows, processes=0).created, len(rows))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(self.intake(3)), queries(self.intake(60, start=3)))
+
+    def test_pool_hashes_match_inline(self):
+        hashes = hash_passwords(['one', 'two', 'three'], processes=2)
+        self.assertEqual(len(set(hashes)), 3)
+        for password, encoded in zip(['one', 'two', 'three'], hashes):
+            self.assertTrue(check_password(password, encoded))
+
+    @FAST_HASHER
+    def test_background_job_forgets_passwords(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post('/api/students/bulk/?background=1', self.intake(2), format='json')
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()['id'])
+        job.params['processes'] = 0
+        job.save()
+        with shared_cache():
+            call_command('run_worker', processes=0, burst=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result['created'], job.params), ('succeeded', 2, {}))
+
+    def test_import_command_rejects_a_file_that_is_not_utf8(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as f:
+            f.write('first_name,last_name\nAmina,Nyaga\u00e9\n'.encode('latin-1'))
+            f.flush()
+            with self.assertRaisesMessage(CommandError, 'CSV parse error'):
+                call_command('import_students', f.name, processes=0, stdout=StringIO())
+        self.assertFalse(Student.objects.filter(user__first_name='Amina').exists())
+
+
+class StudentSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS')
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+        names = [('Wanjiru', 'Kamau'), ('Kamau', 'Otieno'), ('Zoë', 'Wambui'), ('Brian', 'Wanjala')]
+        cls.students = []
+        for i, (first, last) in enumerate(names):
+            student = make_student(cls.programme, f's{i}', f'MU/CS/{i:03d}')
+            User.objects.filter(pk=student.user_id).update(first_name=first, last_name=last)
+            cls.students.append(student)
+        make_student(cls.programme, 'other', 'MU/IT/000')
+        search.rebuild()  # the names above were set with update(), which sends no signals
+
+    def setUp(self):
+        search._vocabulary.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def found(self, q, **params):
+        response = self.client.get('/api/students/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [student['reg_number'] for student in response.json()['results']]
+
+    def test_reg_number_prefix(self):
+        self.assertEqual(self.found('mu/cs/0'), ['MU/CS/000', 'MU/CS/001', 'MU/CS/002', 'MU/CS/003'])
+        self.assertEqual(self.found('MU/CS/002'), ['MU/CS/002'])
+        self.assertEqual(self.found('MU/EE'), [])
+
+    def test_name_prefix_in_any_order_without_accents(self):
+        self.assertEqual(self.found('kamau wanj'), ['MU/CS/000'])
+        self.assertEqual(self.found('zoe'), ['MU/CS/002'])
+        self.assertEqual(set(self.found('wa')), {'MU/CS/000', 'MU/CS/002', 'MU/CS/003'})
+
+    def test_misspelt_name(self):
+        self.assertEqual(self.found('Wanjru'), ['MU/CS/000'])
+        self.assertEqual(self.found('Qwerty'), [])
+
+    def test_pages(self):
+        response = self.client.get('/api/students/', {'q': 'MU/', 'limit': 2})
+        body = response.json()
+        self.assertEqual(list(body), ['next', 'previous', 'results'])
+        self.assertEqual(len(body['results']), 2)
+        self.assertIsNone(body['previous'])
+        last = self.client.get(body['next'].replace('http://testserver', '')).json()
+        last = self.client.get(last['next'].replace('http://testserver', '')).json()
+        self.assertEqual([s['reg_number'] for s in last['results']], ['MU/IT/000'])
+        self.assertIsNone(last['next'])
+
+    def test_index_follows_signals(self):
+        student = make_student(self.programme, 'new', 'MU/CS/100')
+        student.user.first_name = 'Nyambura'
+        student.user.save()
+        self.assertEqual(self.found('nyamb'), ['MU/CS/100'])
+        self.students[0].user.first_name = 'Akinyi'
+        self.students[0].user.save(update_fields=['first_name'])
+        self.assertEqual(self.found('wanjiru'), [])
+        self.assertEqual(self.found('akinyi kamau'), ['MU/CS/000'])
+        student.user.delete()
+        self.assertEqual(self.found('nyambura'), [])
+
+    def test_bulk_admissions_are_indexed(self):
+        row = {'first_name': 'Jepkosgei', 'last_name': 'Rotich', 'email': 'j@example.com',
+               'username': 'jep', 'password': 'secret', 'reg_number': 'MU/CS/200', 'programme_code': 'CS'}
+        with FAST_HASHER:
+            self.assertEqual(admit_students([row], processes=0).created, 1)
+        self.assertEqual(self.found('jepko'), ['MU/CS/200'])
+
+    def test_without_query_is_the_plain_list(self):
+        body = self.client.get('/api/students/', {'q': ' '}).json()
+        self.assertEqual(len(body['results']), 5)
+        self.assertIn('next', body)
+
+
+class ProgressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programme = Programme.objects.create(name='Computer Science', code='CS', duration_years=2)
+        units = {year: [Unit.objects.create(code=f'CS{year}0{i}', name=f'Unit {i}', programme=cls.programme,
+                                            year=year, semester=1) for i in range(3)]
+                 for year in (1, 2)}
+        # exam scores per required unit, all with a CAT of 20; None = no mark yet
+        cases = {
+            'passer': (1, [30, 20, 50]),
+            'supp': (1, [30, 10, 50]),
+            'repeat': (1, [10, 10, 50]),
+            'pending': (1, [30, 30, None]),
+            'finalist': (2, [40, 40, 40]),
+        }
+        cls.students = {}
+        for i, (name, (year, exams)) in enumerate(cases.items()):
+            student = cls.students[name] = make_student(cls.programme, name, f'MU/CS/{i:03d}', year=year)
+            for unit, exam in zip(units[year], exams):
+                if exam is not None:
+                    Mark.objects.create(student=student, unit=unit, cat_score=20, exam_score=exam)
+        # a failed mark outside the current year does not count against it
+        Mark.objects.create(student=cls.students['passer'], unit=units[2][0], cat_score=0, exam_score=0)
+        cls.admin = User.objects.create_user(username='admin', password='pw', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def statuses(self, result):
+        return {row['reg_number']: row['status'] for row in result['students']}
+
+    def test_report_classifies_with_two_queries(self):
+        with self.assertNumQueries(2):
+            result = progression.report(self.programme)
+        self.assertEqual(self.statuses(result), {
+            'MU/CS/000': 'pass', 'MU/CS/001': 'supplementary', 'MU/CS/002': 'fail',
+            'MU/CS/003': 'incomplete', 'MU/CS/004': 'pass'})
+        self.assertEqual(result['counts'], {'pass': 2, 'supplementary': 1, 'fail': 1, 'incomplete': 1})
+        self.assertEqual((result['promotable'], result['completing']), (1, 1))
+        pending = next(row for row in result['students'] if row['status'] == 'incomplete')
+        self.assertEqual((pending['units'], pending['passed'], pending['missing']), (3, 2, 1))
+        self.assertEqual(len(progression.report(self.programme, year=2)['students']), 1)
+
+    def test_promotion_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = progression.promote(self.programme)
+        self.assertEqual(result['promoted'], 1)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in queries.captured_queries), 1)
+        years = dict(Student.objects.values_list('reg_number', 'year_of_study'))
+        self.assertEqual(years, {'MU/CS/000': 2, 'MU/CS/001': 1, 'MU/CS/002': 1,
+                                 'MU/CS/003': 1, 'MU/CS/004': 2})
+        # now in year 2 with no year-2 marks but the failed one: nothing more to promote
+        self.assertEqual(progression.promote(self.programme)['promoted'], 0)
+
+    def test_endpoint_dry_run_then_apply(self):
+        url = f'/api/programmes/{self.programme.pk}/progression/'
+        response = self.client.get(url, {'status': 'supplementary,fail'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['reg_number'] for row in response.json()['students']], ['MU/CS/001', 'MU/CS/002'])
+        self.assertEqual(self.client.get(url, {'status': 'passed'}).status_code, 400)
+        self.assertEqual(Student.objects.filter(year_of_study=2).count(), 1)
+
+        rankings.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertEqual(response.json()['promoted'], 1)
+        passer = self.students['passer']
+        self.assertEqual(StudentStanding.objects.get(student=passer).year_of_study, 2)
+
+        student = APIClient()
+        student.force_authenticate(passer.user)
+        self.assertEqual(student.get(url).status_code, 403)
+
+    def test_command_writes_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'progression.csv')
+            out = StringIO()
+            call_command('progress_students', programme=self.programme.pk, csv=path, stdout=out)
+            with open(path, newline='') as report:
+                rows = list(csv.DictReader(report))
+        self.assertIn('Dry run', out.getvalue())
+        self.assertEqual([row['status'] for row in rows],
+                         ['pass', 'supplementary', 'fail', 'incomplete', 'pass'])
+        self.assertEqual(Student.objects.filter(year_of_study=2).count(), 1)
+
+
+class ProductionSQLiteTests(SimpleTestCase):
+    """Readers and upsert-style writers racing on one SQLite file."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'erp.sqlite3')
+
+    @override_settings(ERP_DB_PROFILE='production')
+    def test_pragmas_applied(self):
+        handler = sqlite_profile(self.path, production=True)
+        self.addCleanup(handler.close_all)
+        with handler['primary'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_no_lock_errors_under_contention(self):
+        result = contended_sqlite(self.path, production=True)
+        self.assertEqual(result['error_kinds'], [])
+        self.assertEqual(result['rows_written'], result['rows_expected'])
+
+    def test_router_sends_replica_reads_to_read_alias(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Mark), 'default')
+        with read_replica():
+            self.assertEqual(router.db_for_read(Mark), 'read')
+            self.assertEqual(router.db_for_write(Mark), 'default')
+        self.assertFalse(router.allow_migrate('read', 'erp'))
@@ -1,16 +1,22 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     LoginView, LogoutView, MeView,
-    ProgrammeViewSet, StudentViewSet, UnitViewSet, MarkViewSet,
-    MyProfileView, MyMarksView
+    ProgrammeViewSet, StudentViewSet, UnitViewSet, MarkViewSet, JobViewSet,
+    MyProfileView, MyMarksView, MyRankView, MetricsView,
+    AsyncMeView, AsyncMyProfileView, AsyncMyMarksView, AsyncMyMarksStreamView
 )
 
+if settings.ERP_ASYNC_SELF_SERVICE:
+    MeView, MyProfileView, MyMarksView = AsyncMeView, AsyncMyProfileView, AsyncMyMarksView
+
 router = DefaultRouter()
 router.register(r'programmes', ProgrammeViewSet, basename='programme')
 router.register(r'students', StudentViewSet, basename='student')
 router.register(r'units', UnitViewSet, basename='unit')
 router.register(r'marks', MarkViewSet, basename='mark')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
     # Auth
@@ -21,7 +27,15 @@ urlpatterns = [
     # Student self-service
     path('my/profile/', MyProfileView.as_view(), name='my-profile'),
     path('my/marks/', MyMarksView.as_view(), name='my-marks'),
+    path('my/rank/', MyRankView.as_view(), name='my-rank'),
+
+    # Instrumentation (admin)
+    path('_metrics/', MetricsView.as_view(), name='metrics'),
 
     # Router URLs (admin CRUD)
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.ERP_ASYNC_SELF_SERVICE:
+    # results push (server-sent events); under WSGI each open stream would pin a worker thread
+    urlpatterns.append(path('my/marks/stream/', AsyncMyMarksStreamView.as_view(), name='my-marks-stream'))
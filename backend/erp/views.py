@@ -1,15 +1,46 @@
-from rest_framework import viewsets, status, permissions
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from asgiref.sync import ThreadSensitiveContext
+from rest_framework import mixins, viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotAuthenticated, PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.views import APIView
+from rest_framework.views import APIView, exception_handler
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.db.models import Prefetch
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views import View
 
-from .models import User, Programme, Student, Unit, Mark
+from . import events, progression
+from .authentication import (
+    tokens_for, full_user, student_id_for, aauthenticate, afull_user, astudent_id_for
+)
+from .bulk import AdmissionConflict, admit_students, upsert_marks
+from .cache import get_or_build, aget_or_build
+from .catalogue import RowSet
+from .changes import CursorExpired, changes as mark_changes
+from .changes import MAX_PAGE_SIZE as CHANGES_MAX_PAGE_SIZE, PAGE_SIZE as CHANGES_PAGE_SIZE
+from .conditional import CatalogueConditionalMixin, conditional, results_etag
+from .db import read_replica, reads_from_replica
+from .exports import FILTERS as EXPORT_FILTERS, export_filename, export_rows, iter_csv, write_xlsx
+from .fastlists import FastListMixin, flat_reader
+from .jobs import HANDLERS as JOB_HANDLERS, enqueue
+from .metrics import registry as metrics_registry
+from .models import User, Programme, Student, Unit, Mark, StudentStanding, Job
+from .parsers import CSVParser, FastJSONParser, read_csv_bytes
+from .pagination import SearchPagination
+from .renderers import FastJSONRenderer
+from .search import StudentSearch
+from .stats import unit_stats, programme_stats
 from .serializers import (
     LoginSerializer, UserSerializer, ProgrammeSerializer,
     StudentSerializer, StudentCreateSerializer,
-    UnitSerializer, MarkSerializer, MarkUploadSerializer
+    UnitSerializer, MarkSerializer, MarkUploadSerializer, StudentStandingSerializer, JobSerializer
 )
 
 
@@ -32,7 +63,7 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for(user)
         return Response({
             'access': str(refresh.access_token),
             'refresh': str(refresh),
@@ -52,41 +83,219 @@ class LogoutView(APIView):
 
 class MeView(APIView):
     def get(self, request):
-        return Response(UserSerializer(request.user).data)
+        return Response(UserSerializer(full_user(request.user)).data)
+
+
+def results_queryset(student_id):
+    """A student's marks in results-slip order."""
+    return Mark.objects.filter(student_id=student_id).select_related('unit').order_by(
+        'unit__year', 'unit__semester', 'unit__code'
+    )
+
+
+def results_entry(request, student_id, marks):
+    """What the results cache holds for a student: the serialised marks and their ETag."""
+    variant = request.query_params.get('fields', '')
+    return {
+        'etag': results_etag(student_id, marks, variant),
+        'data': MarkSerializer(marks, many=True, context={'request': request}).data,
+    }
+
+
+def student_results(request, student_id):
+    """A student's marks in results-slip order, served from the results cache."""
+    return get_or_build('marks', student_id,
+                        lambda: results_entry(request, student_id, list(results_queryset(student_id))),
+                        variant=request.query_params.get('fields', ''))
+
+
+def results_response(request, entry):
+    """200 with the cached results, or 304 if the client already has them."""
+    return conditional(request, entry['etag'], lambda: Response(entry['data']))
+
+
+def optional_int(params, key):
+    value = params.get(key)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({key: 'A whole number is required.'})
+
+
+def standing_response(student_id):
+    """A student's stored cohort standing; see erp/rankings.py."""
+    standing = StudentStanding.objects.filter(student_id=student_id).first()
+    if standing is None:
+        return Response({'detail': 'No ranked marks yet.'}, status=404)
+    return Response(StudentStandingSerializer(standing).data)
+
+
+def bulk_rows(request):
+    """
+    The rows of a bulk upload: a JSON array (or {"rows": [...]}), a text/csv
+    body, or a multipart upload with a CSV `file`. None if there is no list.
+    """
+    data = request.data
+    if 'file' in request.FILES:
+        data = read_csv_bytes(request.FILES['file'].read())
+    elif isinstance(data, dict):
+        data = data.get('rows')
+    return data if isinstance(data, list) else None
+
+
+def bulk_response(result):
+    """A BulkResult report; 400 only when every row was rejected."""
+    applied = result.created + result.updated
+    return Response(result.as_dict(),
+                    status=status.HTTP_400_BAD_REQUEST if result.errors and not applied
+                    else status.HTTP_200_OK)
+
+
+def job_accepted(job):
+    """202 for a queued job, pointing at its status URL."""
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': reverse('job-detail', args=[job.pk])})
+
+
+# ─── Metrics ─────────────────────────────────────────────────────────────────
+class MetricsView(APIView):
+    """Request histograms and cache counters in the Prometheus text format."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(metrics_registry.render(),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 # ─── Programme ───────────────────────────────────────────────────────────────
-class ProgrammeViewSet(viewsets.ModelViewSet):
+class ProgrammeViewSet(CatalogueConditionalMixin, viewsets.ModelViewSet):
     queryset = Programme.objects.all()
     serializer_class = ProgrammeSerializer
+    pagination_class = None  # a handful of rows; the frontend wants the full list
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [permissions.IsAuthenticated()]
         return [IsAdmin()]
 
+    def list_from_catalogue(self, request, catalogue):
+        return Response(list(catalogue.programme_data.values()))
+
+    def retrieve_from_catalogue(self, request, catalogue, pk):
+        data = catalogue.programme_data.get(int(pk)) if pk.isdigit() else None
+        return None if data is None else Response(data)
+
+    @action(detail=True, methods=['get'], url_path='stats')
+    def stats(self, request, pk=None):
+        """Mark statistics for the programme, optionally narrowed by ?year=&semester=."""
+        programme = self.get_object()
+        year, semester = (optional_int(request.query_params, key) for key in ('year', 'semester'))
+        return Response(programme_stats(programme.pk, year, semester))
+
+    @action(detail=True, methods=['post'], url_path='slips')
+    def slips(self, request, pk=None):
+        """
+        Queue a zip of results slips for every student with marks in the
+        programme, optionally narrowed by ?year=&semester=. `?type=pdf`
+        renders PDFs (needs weasyprint). Returns 202 with the job.
+        """
+        programme = self.get_object()
+        year, semester = (optional_int(request.query_params, key) for key in ('year', 'semester'))
+        params = {'programme': programme.pk, 'year': year, 'semester': semester,
+                  'format': 'pdf' if request.query_params.get('type') == 'pdf' else 'html'}
+        return job_accepted(enqueue('results_slips', params, request.user.pk))
+
+    @action(detail=True, methods=['get', 'post'], url_path='progression')
+    def progression_report(self, request, pk=None):
+        """
+        Year-end progression for the programme's students (only those now in
+        ?year=, if given). GET is a dry run: each student's status and the
+        totals. POST promotes every passing student below the final year and
+        returns the same report with `promoted`. `?status=supplementary,fail`
+        narrows the student list, not the totals.
+        """
+        programme = self.get_object()
+        year = optional_int(request.query_params, 'year')
+        statuses = request.query_params.get('status')
+        statuses = set(statuses.split(',')) if statuses else None
+        if statuses and not statuses <= set(progression.STATUSES):
+            raise ValidationError({'status': f"Choose from {', '.join(progression.STATUSES)}."})
+        result = (progression.promote(programme, year) if request.method == 'POST'
+                  else progression.report(programme, year))
+        if statuses:
+            result['students'] = [row for row in result['students'] if row['status'] in statuses]
+        return Response(result)
+
 
 # ─── Student ─────────────────────────────────────────────────────────────────
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Student.objects.select_related('user', 'programme').all()
     serializer_class = StudentSerializer
     permission_classes = [IsAdmin]
 
+    def list(self, request, *args, **kwargs):
+        """`?q=` searches by reg number prefix or by name, best match first (see erp/search.py)."""
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return super().list(request, *args, **kwargs)
+        paginator = SearchPagination()
+        ids = paginator.paginate_queryset(StudentSearch(q), request, view=self)
+        queryset = self.filter_queryset(self.get_queryset()).filter(pk__in=ids)
+        reader = flat_reader(self.get_serializer(), queryset)
+        if reader is None:
+            found = queryset.in_bulk(ids)
+            data = self.get_serializer([found[pk] for pk in ids if pk in found], many=True).data
+        else:
+            found = {row['id']: row for row in reader.rows(queryset, extra=['id'])}
+            data = reader.render([found[pk] for pk in ids if pk in found])
+        return paginator.get_paginated_response(data)
+
     def create(self, request):
         serializer = StudentCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         student = serializer.save()
         return Response(StudentSerializer(student).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='bulk',
+            parser_classes=[FastJSONParser, CSVParser, MultiPartParser])
+    def bulk_admit(self, request):
+        """
+        Admit an intake at once: rows with first_name, last_name, email,
+        username, password, reg_number, programme (id) or programme_code,
+        year_of_study and phone, sent like marks/bulk/. Returns a per-row
+        error report. Intakes of more than ERP_ADMIT_INLINE_MAX_ROWS rows,
+        or any with `?background=1`, are queued as a job instead (202): each
+        password hash takes a deliberate half second or so. 409 if another
+        admission takes one of the usernames or reg numbers meanwhile.
+        """
+        data = bulk_rows(request)
+        if data is None:
+            return Response({'detail': 'Expected a list of student rows.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if (request.query_params.get('background')
+                or len(data) > getattr(settings, 'ERP_ADMIT_INLINE_MAX_ROWS', 20)):
+            return job_accepted(enqueue('admit_students', {'rows': data}, request.user.pk))
+        try:
+            # a small intake, hashed in this process rather than a pool forked per request
+            return bulk_response(admit_students(data, processes=0))
+        except AdmissionConflict as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+
     @action(detail=True, methods=['get'], url_path='marks')
     def student_marks(self, request, pk=None):
         student = self.get_object()
-        marks = Mark.objects.filter(student=student).select_related('unit')
-        return Response(MarkSerializer(marks, many=True).data)
+        return results_response(request, student_results(request, student.pk))
+
+    @action(detail=True, methods=['get'], url_path='rank')
+    def rank(self, request, pk=None):
+        student = self.get_object()
+        return standing_response(student.pk)
 
 
 # ─── Unit ────────────────────────────────────────────────────────────────────
-class UnitViewSet(viewsets.ModelViewSet):
+class UnitViewSet(CatalogueConditionalMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Unit.objects.select_related('programme').all()
     serializer_class = UnitSerializer
 
@@ -108,9 +317,28 @@ class UnitViewSet(viewsets.ModelViewSet):
             qs = qs.filter(semester=semester)
         return qs
 
+    def list_from_catalogue(self, request, catalogue):
+        programme, year, semester = (optional_int(request.query_params, key)
+                                     for key in ('programme', 'year', 'semester'))
+        rows = [catalogue.unit_data[unit.id] for unit in catalogue.find_units(programme, year, semester)]
+        page = self.paginate_queryset(RowSet(rows))
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)
+
+    def retrieve_from_catalogue(self, request, catalogue, pk):
+        data = catalogue.unit_data.get(int(pk)) if pk.isdigit() else None
+        return None if data is None else Response(data)
+
+    @action(detail=True, methods=['get'], url_path='stats')
+    def stats(self, request, pk=None):
+        """Mean, median, spread, pass rate and grade distribution of the unit's marks."""
+        unit = self.get_object()
+        return Response(unit_stats(unit.pk))
+
 
 # ─── Mark ────────────────────────────────────────────────────────────────────
-class MarkViewSet(viewsets.ModelViewSet):
+class MarkViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Mark.objects.select_related('student', 'unit').all()
     serializer_class = MarkSerializer
 
@@ -130,25 +358,144 @@ class MarkViewSet(viewsets.ModelViewSet):
                 'exam_score': serializer.validated_data.get('exam_score'),
             }
         )
+        mark.refresh_from_db(fields=['total', 'grade'])  # computed by the database
         return Response(MarkSerializer(mark).data,
                         status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
+    def perform_update(self, serializer):
+        serializer.save().refresh_from_db(fields=['total', 'grade'])  # computed by the database
+
+    @action(detail=False, methods=['post'], url_path='bulk',
+            parser_classes=[FastJSONParser, CSVParser, MultiPartParser])
+    def bulk_upload(self, request):
+        """
+        Upsert many marks at once. Accepts a JSON array (or {"rows": [...]}),
+        a text/csv body, or a multipart upload with a CSV `file`. Rows name the
+        student by `student` id or `reg_number` and the unit by `unit` id or
+        `unit_code`. `?background=1` queues the upload as a job and returns 202.
+        """
+        data = bulk_rows(request)
+        if data is None:
+            return Response({'detail': 'Expected a list of mark rows.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('background'):
+            return job_accepted(enqueue('import_marks', {'rows': data}, request.user.pk))
+        return bulk_response(upsert_marks(data))
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        """
+        Marks created, updated or deleted after the opaque `?since=` cursor
+        (omit it for everything), oldest first, at most `?limit=` per page.
+        Store `next` and pass it back while `has_more` is true. A cursor
+        past the retention period gets 410: start again without one.
+        """
+        limit = min(optional_int(request.query_params, 'limit') or CHANGES_PAGE_SIZE, CHANGES_MAX_PAGE_SIZE)
+        try:
+            feed = mark_changes(request.query_params.get('since') or None, max(limit, 1))
+        except CursorExpired as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_410_GONE)
+        except ValueError as exc:
+            raise ValidationError({'since': str(exc)})
+        return Response(feed)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream a marks sheet. Filters: programme, year, semester, unit.
+        `?type=xlsx` returns a spreadsheet instead of CSV (needs openpyxl).
+        `?background=1` writes the file in a job instead (download it from the job).
+        """
+        filters = {key: optional_int(request.query_params, key) for key in EXPORT_FILTERS}
+        file_type = request.query_params.get('type', 'csv')
+        if request.query_params.get('background'):
+            return job_accepted(enqueue('export_marks', {**filters, 'type': file_type}, request.user.pk))
+        rows = export_rows(filters)
+
+        if file_type == 'xlsx':
+            try:
+                output = write_xlsx(rows)
+            except ImportError:
+                return Response({'detail': 'XLSX export needs openpyxl installed.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return FileResponse(output, as_attachment=True, filename=export_filename(filters, 'xlsx'))
+
+        response = StreamingHttpResponse(iter_csv(rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(filters, "csv")}"'
+        return response
+
     def get_queryset(self):
         qs = super().get_queryset()
-        student_id = self.request.query_params.get('student')
+        params = self.request.query_params
+        student_id = params.get('student')
+        unit_id = optional_int(params, 'unit')
+        grade = params.get('grade')
+        min_total = params.get('min_total')
         if student_id:
             qs = qs.filter(student_id=student_id)
+        if unit_id is not None:
+            qs = qs.filter(unit_id=unit_id)
+        if grade:
+            qs = qs.filter(grade=grade.upper())
+        if min_total:
+            try:
+                min_total = Decimal(min_total)
+            except InvalidOperation:
+                min_total = None
+            if min_total is None or not min_total.is_finite():  # NaN and Infinity parse too
+                raise ValidationError({'min_total': 'A number is required.'})
+            qs = qs.filter(total__gte=min_total)
         return qs
 
 
+# ─── Jobs ────────────────────────────────────────────────────────────────────
+class JobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    """Queue and poll background jobs; `manage.py run_worker` runs them."""
+    queryset = Job.objects.select_related('created_by')
+    serializer_class = JobSerializer
+    permission_classes = [IsAdmin]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        for key in ('status', 'kind'):
+            value = self.request.query_params.get(key)
+            if value:
+                qs = qs.filter(**{key: value})
+        return qs
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kind = serializer.validated_data['kind']
+        if kind not in JOB_HANDLERS:
+            choices = ', '.join(sorted(JOB_HANDLERS))
+            raise ValidationError({'kind': [f'Unknown job kind. Choose from: {choices}.']})
+        job = enqueue(kind, serializer.validated_data.get('params'), request.user.pk)
+        return job_accepted(job)
+
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        """The file a finished export job wrote."""
+        job = self.get_object()
+        name = (job.result or {}).get('file') if job.status == Job.SUCCEEDED else None
+        path = Path(settings.ERP_JOB_FILES_DIR) / name if name else None
+        if path is None or not path.is_file():
+            return Response({'detail': 'This job has no file to download.'}, status=404)
+        return FileResponse(open(path, 'rb'), as_attachment=True,
+                            filename=job.result.get('filename', path.name))
+
+
 # ─── Student self-service ────────────────────────────────────────────────────
 class MyProfileView(APIView):
     permission_classes = [IsStudent]
 
+    @reads_from_replica
     def get(self, request):
         try:
-            student = Student.objects.select_related('user', 'programme').get(user=request.user)
-            return Response(StudentSerializer(student).data)
+            student = Student.objects.select_related('user', 'programme').get(
+                pk=student_id_for(request.user))
+            return Response(StudentSerializer(student, context={'request': request}).data)
         except Student.DoesNotExist:
             return Response({'detail': 'Profile not found.'}, status=404)
 
@@ -156,13 +503,131 @@ class MyProfileView(APIView):
 class MyMarksView(APIView):
     permission_classes = [IsStudent]
 
+    @reads_from_replica
     def get(self, request):
+        student_id = student_id_for(request.user)
+        if student_id is None:
+            return Response({'detail': 'Student not found.'}, status=404)
+
+        return results_response(request, student_results(request, student_id))
+
+
+class MyRankView(APIView):
+    permission_classes = [IsStudent]
+
+    @reads_from_replica
+    def get(self, request):
+        student_id = student_id_for(request.user)
+        if student_id is None:
+            return Response({'detail': 'Student not found.'}, status=404)
+        return standing_response(student_id)
+
+
+# ─── Student self-service (async) ────────────────────────────────────────────
+# Native async versions of MeView, MyProfileView and MyMarksView, routed in
+# place of the sync ones when ERP_ASYNC_SELF_SERVICE is on (the default under
+# backend/asgi.py). They return the same JSON as their DRF counterparts.
+class AsyncSelfServiceView(View):
+    """
+    Authenticates from the JWT claims, applies the IsStudent check (or just
+    IsAuthenticated with `student_only = False`) and renders the handler's
+    DRF Response with the JSON renderer, all without a thread hop unless a
+    handler has to query the database.
+    """
+    http_method_names = ['get']
+    student_only = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method.lower() not in self.http_method_names:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+        drf_request = Request(request)
         try:
-            student = Student.objects.get(user=request.user)
+            credentials = await aauthenticate(request)
+            if credentials is None:
+                raise NotAuthenticated()
+            drf_request.user, drf_request.auth = credentials
+            if self.student_only and drf_request.user.role != 'student':
+                raise PermissionDenied()
+            response = await self.get(drf_request, *args, **kwargs)
+        except APIException as exc:
+            response = exception_handler(exc, {'request': drf_request})
+            if response.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = 'Bearer realm="api"'
+        if not isinstance(response, Response):
+            return response  # e.g. 304 Not Modified
+        response.accepted_renderer = FastJSONRenderer()
+        response.accepted_media_type = 'application/json'
+        response.renderer_context = {'request': drf_request, 'response': response, 'view': self}
+        return response.render()
+
+
+class AsyncMeView(AsyncSelfServiceView):
+    student_only = False
+
+    async def get(self, request):
+        return Response(UserSerializer(await afull_user(request.user)).data)
+
+
+class AsyncMyProfileView(AsyncSelfServiceView):
+    @reads_from_replica
+    async def get(self, request):
+        try:
+            student = await Student.objects.select_related('user', 'programme').aget(
+                pk=await astudent_id_for(request.user))
+            return Response(StudentSerializer(student, context={'request': request}).data)
         except Student.DoesNotExist:
+            return Response({'detail': 'Profile not found.'}, status=404)
+
+
+async def astudent_results(request, student_id):
+    """student_results() for async views."""
+    async def build():
+        return results_entry(request, student_id,
+                             [mark async for mark in results_queryset(student_id)])
+
+    return await aget_or_build('marks', student_id, build,
+                               variant=request.query_params.get('fields', ''))
+
+
+class AsyncMyMarksView(AsyncSelfServiceView):
+    @reads_from_replica
+    async def get(self, request):
+        student_id = await astudent_id_for(request.user)
+        if student_id is None:
             return Response({'detail': 'Student not found.'}, status=404)
 
-        marks = Mark.objects.filter(student=student).select_related('unit').order_by(
-            'unit__year', 'unit__semester', 'unit__code'
-        )
-        return Response(MarkSerializer(marks, many=True).data)
\ No newline at end of file
+        return results_response(request, await astudent_results(request, student_id))
+
+
+class AsyncMyMarksStreamView(AsyncSelfServiceView):
+    """
+    The student's results as server-sent events: a `marks` event carrying
+    what GET my/marks/ returns (with its ETag as the event id) when the
+    stream opens, and again each time one of their marks changes; see
+    erp/events.py. A client reconnecting with Last-Event-ID skips the
+    first event if nothing changed. Only routed under ASGI, where an idle
+    stream costs no thread.
+    """
+
+    async def get(self, request):
+        student_id = await astudent_id_for(request.user)
+        if student_id is None:
+            return Response({'detail': 'Student not found.'}, status=404)
+        if events.full():
+            return Response({'detail': 'Too many open streams; poll my/marks/ instead.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '60'})
+
+        async def load():
+            # a context of its own, so the thread that serves the query exits with it
+            # rather than staying parked for as long as the stream is open
+            async with ThreadSensitiveContext():
+                with read_replica():
+                    entry = await astudent_results(request, student_id)
+            return entry['etag'], FastJSONRenderer().render(entry['data'])
+
+        response = StreamingHttpResponse(
+            events.stream(student_id, load, request._request.headers.get('Last-Event-ID')),
+            content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx: pass events through as they are written
+        return response
@@ -3,7 +3,7 @@ import { useState, useEffect } from 'react';
 import Navbar from '../components/Navbar';
 import { Card, Loader, Alert, StatCard } from '../components/UI';
 import {
-  getStudents, createStudent, deleteStudent,
+  getStudents, searchStudents, createStudent, deleteStudent,
   getProgrammes, createProgramme,
   getUnits, createUnit,
   uploadMark, getStudentMarks
@@ -98,10 +98,21 @@ export default function AdminDashboard() {
 
 function StudentsTable({ students, onDelete }) {
   const [search, setSearch] = useState('');
-  const filtered = students.filter(s =>
-    s.reg_number.toLowerCase().includes(search.toLowerCase()) ||
-    `${s.user.first_name} ${s.user.last_name}`.toLowerCase().includes(search.toLowerCase())
-  );
+  const [matches, setMatches] = useState(null);
+
+  useEffect(() => {
+    const q = search.trim();
+    if (!q) { setMatches(null); return; }
+    let current = true;
+    const timer = setTimeout(() => {
+      searchStudents(q).then(results => { if (current) setMatches(results); }).catch(() => {});
+    }, 250);
+    return () => { current = false; clearTimeout(timer); };
+  }, [search]);
+
+  // drop matches deleted since the search ran
+  const ids = new Set(students.map(s => s.id));
+  const filtered = matches === null ? students : matches.filter(s => ids.has(s.id));
   return (
     <Card title={`All Students (${students.length})`}>
       <input style={styles.search} placeholder="Search by name or reg number…"
@@ -2,7 +2,7 @@
 import { useState, useEffect } from 'react';
 import Navbar from '../components/Navbar';
 import { Card, Badge, Loader, StatCard } from '../components/UI';
-import { getMyProfile, getMyMarks } from '../services/api';
+import { getMyProfile, getMyMarks, streamMyMarks } from '../services/api';
 
 export default function StudentDashboard() {
   const [profile, setProfile] = useState(null);
@@ -25,6 +25,9 @@ export default function StudentDashboard() {
     load();
   }, []);
 
+  // Results are pushed as they are published, so there is no need to refresh.
+  useEffect(() => streamMyMarks(setMarks), []);
+
   if (loading) return <><Navbar /><Loader /></>;
 
   // Build semester groups
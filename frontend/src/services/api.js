@@ -35,6 +35,17 @@ const request = async (method, endpoint, body = null) => {
   return data;
 };
 
+// List endpoints are cursor-paginated; follow `next` until the last page.
+const requestAll = async (endpoint) => {
+  let page = await request('GET', endpoint);
+  const results = [...page.results];
+  while (page.next) {
+    page = await request('GET', page.next.slice(page.next.indexOf('/api') + 4));
+    results.push(...page.results);
+  }
+  return results;
+};
+
 const refreshAccessToken = async () => {
   const refresh = localStorage.getItem('refresh_token');
   if (!refresh) return false;
@@ -66,8 +77,68 @@ export const getMe = () => request('GET', '/auth/me/');
 export const getMyProfile = () => request('GET', '/my/profile/');
 export const getMyMarks = () => request('GET', '/my/marks/');
 
+// Live results: server-sent events read through fetch, so the token travels in
+// the Authorization header. Calls onMarks(marks) with the full list whenever it
+// changes and reconnects after drops; returns a function that stops the stream.
+export const streamMyMarks = (onMarks) => {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let retryMs = 5000;
+
+  const connect = async () => {
+    const res = await fetch(`${BASE_URL}/my/marks/stream/`, {
+      headers: {
+        ...headers(),
+        Accept: 'text/event-stream',
+        ...(lastEventId ? { 'Last-Event-ID': lastEventId } : {}),
+      },
+      signal: controller.signal,
+    });
+    if (res.status === 401) return refreshAccessToken();
+    if (res.status === 404) return false;  // not served (WSGI deployment)
+    if (!res.ok) return true;              // e.g. 503 while the server is full
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) return true;
+      const frames = (buffer + value).split('\n\n');
+      buffer = frames.pop();
+      for (const frame of frames) {
+        const event = {};
+        for (const line of frame.split('\n')) {
+          const i = line.indexOf(':');
+          if (i > 0) event[line.slice(0, i)] = line.slice(i + 1).trim();
+        }
+        if (event.retry) retryMs = Number(event.retry);
+        if (event.event === 'marks') {
+          lastEventId = event.id;
+          onMarks(JSON.parse(event.data));
+        }
+      }
+    }
+  };
+
+  (async () => {
+    while (!controller.signal.aborted) {
+      let again = true;
+      try {
+        again = await connect();
+      } catch {
+        // dropped connection or aborted; retried below unless aborted
+      }
+      if (!again || controller.signal.aborted) return;
+      await new Promise(resolve => setTimeout(resolve, retryMs));
+    }
+  })();
+  return () => controller.abort();
+};
+
 // ─── Admin – Students ────────────────────────────────────────────────────────
-export const getStudents = () => request('GET', '/students/');
+export const getStudents = () => requestAll('/students/');
+// Server-side search: reg number prefix or (misspelt) name, best match first
+export const searchStudents = (q, limit = 50) =>
+  request('GET', `/students/?q=${encodeURIComponent(q)}&limit=${limit}`).then(page => page.results);
 export const getStudent = (id) => request('GET', `/students/${id}/`);
 export const createStudent = (data) => request('POST', '/students/', data);
 export const deleteStudent = (id) => request('DELETE', `/students/${id}/`);
@@ -80,11 +151,11 @@ export const createProgramme = (data) => request('POST', '/programmes/', data);
 // ─── Admin – Units ───────────────────────────────────────────────────────────
 export const getUnits = (params = {}) => {
   const q = new URLSearchParams(params).toString();
-  return request('GET', `/units/${q ? '?' + q : ''}`);
+  return requestAll(`/units/${q ? '?' + q : ''}`);
 };
 export const createUnit = (data) => request('POST', '/units/', data);
 
 // ─── Admin – Marks ───────────────────────────────────────────────────────────
 export const uploadMark = (data) => request('POST', '/marks/', data);
 export const getMarks = (studentId) =>
-  request('GET', `/marks/?student=${studentId}`);
\ No newline at end of file
+  requestAll(`/marks/?student=${studentId}`);
\ No newline at end of file